@@ -1,30 +1,94 @@
+import numpy as np
+
+from DangerZones import DangerZones
+from Pipeline import GridMasks
+
+HISTORY_LIMIT_BYTES = 64 * 1024 ** 2
+# The grid and the placement on it; a crop saves these so that undoing it restores a matching grid
+GRID_FIELDS = ('ppm_x', 'ppm_y', 'grid_w', 'grid_h', 'target_centers', 'grid_origin', 'real_size', 'feasible_mask',
+               'beacon_indices', 'coverage')
+
 class AppState:
     """A model class to hold all application state variables."""
     def __init__(self):
         # Image and history state
-        self.cv_img = None
-        self.original_pil_img = None
-        self.history = []
+        self.source_img = None  # The single decoded image buffer (possibly a read-only memory map)
+        self.image_path = None  # File source_img was loaded from; saved in project files
+        self.crop_rect = None  # (x0, y0, x1, y1) of cv_img in source_img coordinates
+        self.cv_img = None  # View of source_img inside crop_rect; never written to
+        self.history = []  # Command log of crops and danger-zone edits
+        self.history_limit_bytes = HISTORY_LIMIT_BYTES
 
         # Zoom and view state
         self.zoom_level = 1.0
         self.min_zoom = 0.1
         self.max_zoom = 5.0
+        self.layer_visibility = {'danger': True, 'candidates': False, 'coverage': True, 'grid': True, 'beacons': True}
         
         # Interactive editing state
         self.mode = None  # Can be 'crop', 'danger', or None
         self.crop_coords = None
         self.danger_coords = None
+        self.editing_zone = None  # Index of the danger zone being edited, or None when adding one
         
         # GA and Grid state
-        self.danger_mask = None
-        self.building_mask = None
+        self.danger_zones = DangerZones()  # Rectangles and polygons in source_img coordinates
+        self.grid_masks = GridMasks()  # Grid-resolution building/danger masks shared by estimation and export
+        self.feasible_mask = None
         self.ppm_x = None
         self.ppm_y = None
         self.grid_w = None
         self.grid_h = None
-        self.target_centers = []
+        self.target_centers = None  # (grid_h * grid_w, 2) array of cell centers
+        self.grid_origin = None  # crop_rect[:2] when the grid was set; target_centers are relative to it
+        self.real_size = None  # (width, height) in meters the grid was set from
         self.beacon_indices = []
+        self.coverage = None  # coverage_summary() of the run that placed beacon_indices, recorded on export
 
     def reset(self):
-        self.__init__()
\ No newline at end of file
+        # View preferences survive loading a new image
+        layer_visibility, history_limit_bytes = self.layer_visibility, self.history_limit_bytes
+        self.__init__()
+        self.layer_visibility, self.history_limit_bytes = layer_visibility, history_limit_bytes
+
+    def grid_state(self):
+        """The current grid and placement, for restore_grid_state()."""
+        grid = {name: getattr(self, name) for name in GRID_FIELDS}
+        grid['beacon_indices'] = list(self.beacon_indices)
+        return grid
+
+    def restore_grid_state(self, grid=None):
+        """Restores grid_state() output; None clears the grid and the placement."""
+        for name in GRID_FIELDS:
+            setattr(self, name, grid[name] if grid is not None else None)
+        self.beacon_indices = list(self.beacon_indices or ())
+
+    @staticmethod
+    def command_bytes(command):
+        """
+        Approximate memory held by a history command: its rectangles, the vertex arrays of its polygon
+        zones, and the arrays of the grid a crop saved.
+        """
+        nbytes = sum(value.nbytes for value in (command.get('grid') or {}).values() if isinstance(value, np.ndarray))
+        for zone in command['zones'] if 'zones' in command else [command.get('zone')]:
+            if zone is not None and zone[0] == 'polygon':
+                nbytes += np.asarray(zone[1]).nbytes
+            else:
+                nbytes += 4 * np.dtype(np.int64).itemsize  # A crop rectangle or a rectangular zone
+        return nbytes
+
+    def history_bytes(self):
+        return sum(self.command_bytes(command) for command in self.history)
+
+    def push_history(self, command):
+        """Records an undoable command, dropping the oldest ones while the log exceeds history_limit_bytes."""
+        self.history.append(command)
+        total = self.history_bytes()
+        while len(self.history) > 1 and total > self.history_limit_bytes:
+            total -= self.command_bytes(self.history.pop(0))
+
+    def set_crop_rect(self, rect):
+        """Makes cv_img the given region of source_img without copying pixels."""
+        x0, y0, x1, y1 = rect
+        self.crop_rect = rect
+        self.cv_img = self.source_img[y0:y1, x0:x1]
@@ -0,0 +1,227 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Coverage import SharedCoverage, as_coverage, attach_coverage, feasible_fraction
+from Genetic import GeneticAlgorithm
+from Greedy import GreedySolver
+
+TARGET_COVERAGE = 0.95
+MAX_BEACONS = 50
+SEARCH_METHOD = "sweep"  # "sweep" または "bisect"
+NUM_WORKERS = 1
+
+# テンプレートのGeneticAlgorithmから各kのGAへ引き継ぐパラメータ
+GA_PARAMS = ("population_size", "num_generations", "mutation_rate", "elitism_rate", "num_islands",
+             "migration_interval", "migration_size", "seed", "greedy_seed_rate", "warm_start_rate",
+             "patience", "time_limit", "fitness_cache_size", "deduplicate")
+
+class BeaconCountSearch:
+    """
+    設置可能領域（候補セル）のうちtarget_coverageの割合をカバーできる最小のビーコン数kを探すクラス。
+    GeneticAlgorithmやGreedySolverと同じrun()を持つため、そのままソルバーとして使える。
+
+    まず貪欲法をmax_beacons個まで1回だけ解く。貪欲法の解は入れ子になっているため、
+    その先頭k個がすべてのkの解となり、目標に届いた最初のkが探索範囲の上限になる。
+    solverにGeneticAlgorithmを渡した場合は、上限より小さいkをGAで解き直して改善を試みる。
+    各kのGAはk-1個の最良解に利得最大の候補を1つ加えた配置からウォームスタートする。
+    カバレッジ構造はすべてのkで共有し、workers > 1の場合は複数のkを共有メモリ経由で並列に解く。
+    """
+    def __init__(self, solver=None, target_coverage=TARGET_COVERAGE, max_beacons=MAX_BEACONS,
+                 method=SEARCH_METHOD, workers=NUM_WORKERS, callback=None):
+        if method not in ("sweep", "bisect"):
+            raise ValueError(f"Unknown search method: {method}")
+        self.solver = solver
+        self.target_coverage = target_coverage
+        self.max_beacons = max_beacons
+        self.method = method
+        self.workers = workers
+        self.callback = callback
+        self.curve = []
+        self.num_beacons = None
+        self.coverage = None
+        self.reached = False
+        self.stop_reason = None
+        self.counters = {}
+
+    def run(self, placement, center, coverage_set, ble_px, initial=None):
+        """
+        目標に届いた最小のkの配置（セル番号のリスト）を返す。届かなかった場合はmax_beacons個までで
+        最もカバレッジの高い配置を返す。kごとのカバレッジはcurve、選ばれたkはnum_beaconsに記録する。
+        initial（前回の配置）はビーコン数が一致するとは限らないため使わない。
+        """
+        started = time.perf_counter()
+        coverage = as_coverage(coverage_set, len(center))
+        positions = np.asarray(center, dtype=float)[placement]
+        self.stop_reason = None
+        self._solves = 0
+        max_beacons = min(self.max_beacons, len(placement))
+
+        greedy = GreedySolver(max_beacons).solve(coverage, positions, ble_px)
+        best = self._prefix_curve(coverage, greedy, placement)
+        sources = {k: "greedy" for k in best}
+        upper = next((k for k, (fraction, _) in best.items() if fraction >= self.target_coverage), max_beacons + 1)
+
+        if isinstance(self.solver, GeneticAlgorithm) and self.workers > 1:
+            params = dict(self._ga_params(), num_islands=1)
+            with SharedCoverage(coverage, positions=positions) as shared, \
+                    ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(params, shared.spec, ble_px)) as executor:
+                solve = lambda ks, warm: self._solve_parallel(ks, warm, placement, coverage, executor)
+                upper = self._refine(best, sources, upper, solve, placement, positions, coverage, ble_px)
+        elif isinstance(self.solver, GeneticAlgorithm):
+            solve = lambda ks, warm: self._solve_sequential(ks, warm, placement, positions, coverage, ble_px)
+            upper = self._refine(best, sources, upper, solve, placement, positions, coverage, ble_px)
+
+        if upper <= max_beacons:
+            chosen = upper
+        else:
+            chosen = max(best, key=lambda k: (best[k][0], -k))
+        self.num_beacons = chosen
+        self.coverage, solution = best[chosen]
+        self.reached = self.coverage >= self.target_coverage
+        if self.stop_reason is None:
+            self.stop_reason = "target" if self.reached else "max_beacons"
+        self.curve = [{"k": k, "coverage": best[k][0], "solver": sources[k]} for k in sorted(best)]
+        elapsed = time.perf_counter() - started
+        self.counters = {"solves": self._solves, "num_beacons": chosen, "coverage": self.coverage, "elapsed_s": elapsed}
+        return [placement[i] for i in solution]
+
+    def _refine(self, best, sources, upper, solve, placement, positions, coverage, ble_px):
+        """
+        下限からupper未満のkをGAで解き、bestとsourcesを更新して、目標に届いた最小のkを返す
+        （届かなければupperのまま）。kに対してカバレッジが単調に増えると仮定して範囲を狭める。
+        GAの適応度は間隔を守らない解にもペナルティを引いた値を与えるため、bestには間隔を守る解だけを入れる。
+        """
+        feasible = np.zeros(coverage.num_cells, dtype=bool)
+        feasible[placement] = True
+        lower = self._lower_bound(coverage, feasible, len(placement))
+        while lower < upper and self.stop_reason is None:
+            ks = self._probes(lower, upper)
+            warm = {k: self._warm_start(best, k, coverage, positions, ble_px, feasible) for k in ks}
+            solved = []
+            for k, solution in solve(ks, warm):
+                solved.append(k)
+                if not well_spaced(positions, solution, ble_px):
+                    continue  # 間隔のペナルティを受けた解は配置として使えないので、そのkは届かなかったものとする
+                fraction = feasible_fraction(coverage, placement, solution)
+                if k not in best or fraction > best[k][0]:
+                    best[k], sources[k] = (fraction, solution), "genetic"
+            reached = [k for k in solved if k in best and best[k][0] >= self.target_coverage]
+            upper = min(reached + [upper])
+            failed = [k for k in solved if k < upper]
+            lower = max(failed) + 1 if failed else lower
+        return upper
+
+    def _prefix_curve(self, coverage, greedy, placement):
+        """
+        貪欲法の解の先頭k個について {k: (カバレッジ, 解)} を返す。
+        """
+        best = {}
+        for k in range(1, len(greedy) + 1):
+            best[k] = (feasible_fraction(coverage, placement, greedy[:k]), greedy[:k])
+        return best
+
+    def _lower_bound(self, coverage, feasible, num_feasible):
+        """
+        1台が覆える設置可能セル数の最大値から求めた、目標に届くkの下限を返す。
+        """
+        per_beacon = int(coverage.gains(~feasible).max())
+        if per_beacon == 0:
+            return 1
+        return max(1, math.ceil(self.target_coverage * num_feasible / per_beacon - 1e-9))
+
+    def _probes(self, lower, upper):
+        """
+        次に解くkのリストを返す。sweepはlowerから順にworkers個、bisectは [lower, upper) を
+        workers + 1等分する点を選ぶ（workers = 1なら二分探索）。
+        """
+        if self.method == "sweep":
+            return list(range(lower, min(lower + self.workers, upper)))
+        return sorted({lower + (upper - lower) * (i + 1) // (self.workers + 1) for i in range(self.workers)})
+
+    def _warm_start(self, best, k, coverage, positions, ble_px, feasible):
+        """
+        kより小さい最大のk'の最良解に、未カバーの設置可能セルを最も多く覆う候補を
+        （ほかのビーコンからble_px / 4以上離れたものを優先して）1つずつ加え、k個の初期解を作る。
+        既に選んだ候補は選ばないため、離れた候補がなくなっても解に重複は生じない。
+        """
+        known = [j for j in best if j < k]
+        solution = list(best[max(known)][1]) if known else []
+        covered = coverage.covered(solution) | ~feasible
+        while len(solution) < k:
+            gains = coverage.gains(covered).astype(float)
+            gains[solution] = -np.inf
+            if solution:
+                # 近すぎる候補から利得の最大値+1を引き、離れた候補がどれも先に選ばれるようにする
+                too_close = np.linalg.norm(positions[:, None, :] - positions[solution][None, :, :], axis=2).min(axis=1) < ble_px / 4
+                gains[too_close] -= gains.max() + 1
+            candidate = int(np.argmax(gains))
+            solution.append(candidate)
+            covered[coverage.cells(candidate)] = True
+        return solution
+
+    def _ga_params(self):
+        return {name: getattr(self.solver, name) for name in GA_PARAMS}
+
+    def _solve_sequential(self, ks, warm, placement, positions, coverage, ble_px):
+        """
+        kを1つずつGAで解く。GAの世代ごとのコールバックはcallbackへ中継し、中断されたら探索を打ち切る。
+        """
+        for k in ks:
+            ga = GeneticAlgorithm(**dict(self._ga_params(), seed=self.solver.seed + k), num_beacons=k)
+            if self.callback is not None:
+                ga.callback = lambda generation, best, mean, solution: self.callback(
+                    generation, best, mean, [placement[i] for i in solution])
+            solution = ga.run(range(len(positions)), positions, coverage, ble_px, initial=warm[k])
+            self._solves += 1
+            yield k, solution
+            if ga.stop_reason == "cancelled":
+                self.stop_reason = "cancelled"
+                return
+
+    def _solve_parallel(self, ks, warm, placement, coverage, executor):
+        """
+        複数のkをワーカープロセスで同時にGAで解く。ワーカーは探索の開始時に一度だけ共有メモリの
+        カバレッジと候補座標を参照し、各GAは島を1つに固定する。kをまとめて解き終えるたびに
+        callbackを呼び、Trueなら探索を打ち切る。
+        """
+        results = list(executor.map(_solve_k, [(k, warm[k]) for k in ks]))
+        self._solves += len(results)
+        yield from zip(ks, results)
+        if self.callback is not None:
+            fraction, k, solution = max((feasible_fraction(coverage, placement, solution), k, solution)
+                                        for k, solution in zip(ks, results))
+            if self.callback(k, fraction, fraction, [placement[i] for i in solution]):
+                self.stop_reason = "cancelled"
+
+
+def well_spaced(positions, solution, ble_px):
+    """
+    解のどのビーコンの組もble_px / 4以上離れている場合にTrueを返す（GAの適応度でペナルティを受けない解）。
+    """
+    points = positions[list(solution)]
+    distances = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+    distances[np.diag_indices(len(points))] = np.inf
+    return len(points) < 2 or distances.min() >= ble_px / 4
+
+
+_WORKER = {}
+
+
+def _init_worker(params, spec, ble_px):
+    """
+    探索ワーカーの初期化。共有メモリ上のカバレッジと候補座標を参照する。
+    """
+    coverage, arrays = attach_coverage(spec)
+    _WORKER.update(params=params, coverage=coverage, positions=arrays["positions"], ble_px=ble_px)
+
+
+def _solve_k(task):
+    """
+    ビーコン数kのGAを初期解から解き、候補番号のリストを返す。乱数はseed + kで初期化するため、
+    逐次実行と同じ結果になる。
+    """
+    k, initial = task
+    params, positions = _WORKER["params"], _WORKER["positions"]
+    ga = GeneticAlgorithm(**dict(params, seed=params["seed"] + k), num_beacons=k)
+    return ga.run(range(len(positions)), positions, _WORKER["coverage"], _WORKER["ble_px"], initial=initial)
@@ -1,13 +1,27 @@
 import customtkinter as ctk
+from collections import OrderedDict
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
+from Coverage import coverage_counts
+from DangerZones import DangerZones
+from Pipeline import COVERAGE, GRID_PITCH
+from Profiler import Profiler
+
+PYRAMID_MIN_SIZE = 256
+HQ_REDRAW_DELAY_MS = 150
+FRAME_INTERVAL_MS = 16
+TILE_SIZE = 256
+DANGER_RGBA = (255, 0, 0, 77)  # Red at 30% opacity
+MAX_CACHED_TILES = 256
+LAYER_ORDER = ('danger', 'candidates', 'coverage', 'grid', 'beacons')
 
 class ImageCanvasView(ctk.CTkFrame):
     """The view class for the main image canvas and its interactions."""
-    def __init__(self, master, app_state):
+    def __init__(self, master, app_state, profiler=None):
         super().__init__(master)
         self.app_state = app_state
+        self.profiler = profiler or Profiler()
 
         # Local view state
         self.image_tk = None
@@ -15,6 +29,20 @@ class ImageCanvasView(ctk.CTkFrame):
         self.resizing = False
         self.moving = False
         self.resize_dir = None
+        self._pyramid = {}  # scale -> downsampled cv_img, built lazily
+        self._pyramid_source = None
+        self._hq_job = None
+
+        # Retained scene: persistent canvas items updated in place
+        self._image_item = None
+        self._layer_items = {}
+        self._layer_images = {}
+        self._layer_versions = {}
+        self._tiles = OrderedDict()
+        self._zone_bounds = (None, None)  # (danger_zones.version, (N, 4) array of zone bounding boxes)
+        self._coverage_counts = None
+        self._rect_items = {}
+        self._drag_job = None
 
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -22,9 +50,9 @@ class ImageCanvasView(ctk.CTkFrame):
         self.canvas = ctk.CTkCanvas(self, bg="black")
         self.canvas.grid(row=0, column=0, sticky="nsew")
 
-        v_scroll = ctk.CTkScrollbar(self, orientation="vertical", command=self.canvas.yview)
+        v_scroll = ctk.CTkScrollbar(self, orientation="vertical", command=self.on_yview)
         v_scroll.grid(row=0, column=1, sticky="ns")
-        h_scroll = ctk.CTkScrollbar(self, orientation="horizontal", command=self.canvas.xview)
+        h_scroll = ctk.CTkScrollbar(self, orientation="horizontal", command=self.on_xview)
         h_scroll.grid(row=1, column=0, sticky="ew")
         self.canvas.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
         
@@ -33,64 +61,271 @@ class ImageCanvasView(ctk.CTkFrame):
         self.canvas.bind('<ButtonPress-1>', self.on_press)
         self.canvas.bind('<B1-Motion>', self.on_drag)
         self.canvas.bind('<ButtonRelease-1>', self.on_release)
+        self.canvas.bind('<Configure>', lambda e: self.update_display())
+
+    def _get_level(self, zoom):
+        """
+        Returns (scale, image) for the coarsest power-of-two level with at least `zoom` resolution.
+        Level 0 is cv_img itself; smaller levels are built on first use from the nearest finer
+        cached level, so only the zoom levels actually viewed are ever held in memory.
+        """
+        cv_img = self.app_state.cv_img
+        if self._pyramid_source is not cv_img:
+            self._pyramid = {1.0: cv_img}
+            self._pyramid_source = cv_img
+
+        scale, (h, w) = 1.0, cv_img.shape[:2]
+        while scale / 2 >= zoom and max(h, w) > PYRAMID_MIN_SIZE:
+            scale, h, w = scale / 2, (h + 1) // 2, (w + 1) // 2
+        if scale not in self._pyramid:
+            finer = min(s for s in self._pyramid if s > scale)
+            self._pyramid[scale] = cv2.resize(self._pyramid[finer], (w, h), interpolation=cv2.INTER_AREA)
+        return scale, self._pyramid[scale]
+
+    def _render_viewport(self, x0, y0, x1, y1, high_quality):
+        """Renders canvas region (x0, y0)-(x1, y1) at the current zoom as an RGB array."""
+        zoom = self.app_state.zoom_level
+        scale, level = self._get_level(zoom)
+        lh, lw = level.shape[:2]
+        lx0, ly0 = int(x0 / zoom * scale), int(y0 / zoom * scale)
+        lx1 = min(lw, int(np.ceil(x1 / zoom * scale)) + 1)
+        ly1 = min(lh, int(np.ceil(y1 / zoom * scale)) + 1)
+        crop = level[ly0:ly1, lx0:lx1]
+
+        # Map the crop back to canvas pixels so partial source pixels at the edges stay aligned.
+        out_w = max(1, int(round((lx1 - lx0) / scale * zoom)))
+        out_h = max(1, int(round((ly1 - ly0) / scale * zoom)))
+        if high_quality:
+            interpolation = cv2.INTER_AREA if scale > zoom else cv2.INTER_LANCZOS4
+        else:
+            interpolation = cv2.INTER_LINEAR if scale > zoom else cv2.INTER_NEAREST
+        view = cv2.resize(crop, (out_w, out_h), interpolation=interpolation)
+
+        return cv2.cvtColor(view, cv2.COLOR_BGR2RGB), lx0 / scale * zoom, ly0 / scale * zoom
 
-    def update_display(self):
-        if self.app_state.original_pil_img is None: 
+    def update_display(self, high_quality=False):
+        if self.app_state.cv_img is None: 
             return
 
-        display_pil = self.app_state.original_pil_img.copy()
-        if self.app_state.danger_mask is not None:
-            display_cv = cv2.cvtColor(np.array(display_pil), cv2.COLOR_RGB2BGR)
-            red_layer = np.zeros_like(display_cv, np.uint8)
-            red_layer[:] = (0, 0, 255)
+        with self.profiler.span('update_display', high_quality=high_quality):
+            h, w = self.app_state.cv_img.shape[:2]
+            zoom = self.app_state.zoom_level
+            new_w, new_h = int(w * zoom), int(h * zoom)
+            self.canvas.configure(scrollregion=(0, 0, new_w, new_h))
+
+            view_x0, view_y0 = max(0, self.canvas.canvasx(0)), max(0, self.canvas.canvasy(0))
+            view_x1 = min(new_w, view_x0 + max(1, self.canvas.winfo_width()))
+            view_y1 = min(new_h, view_y0 + max(1, self.canvas.winfo_height()))
+            with self.profiler.span('render_viewport'):
+                rgb, image_x, image_y = self._render_viewport(view_x0, view_y0, view_x1, view_y1, high_quality)
+                self.image_tk = ImageTk.PhotoImage(Image.fromarray(rgb))
+
+            if self._hq_job is not None:
+                self.after_cancel(self._hq_job)
+                self._hq_job = None
+            if not high_quality:
+                self._hq_job = self.after(HQ_REDRAW_DELAY_MS, self._redraw_high_quality)
+
+            if self._image_item is None:
+                self._image_item = self.canvas.create_image(image_x, image_y, anchor='nw', image=self.image_tk)
+            else:
+                self.canvas.coords(self._image_item, image_x, image_y)
+                self.canvas.itemconfigure(self._image_item, image=self.image_tk)
+
+            with self.profiler.span('sync_layers'):
+                self._sync_layers(view_x0, view_y0, view_x1, view_y1)
+            self._sync_edit_rects()
+
+    def _layer_source(self, name):
+        """Returns the data a layer is drawn from; a layer's tiles are reused while this is unchanged."""
+        state = self.app_state
+        grid = (state.grid_w, state.grid_h, state.ppm_x, state.ppm_y)
+        if name == 'danger':
+            return (state.crop_rect,)  # Zone edits are handled per tile; see _tile_zones()
+        if name == 'grid':
+            return (grid,)
+        if name == 'candidates':
+            return (grid, state.feasible_mask)
+        return (grid, tuple(state.beacon_indices or ()))
+
+    def _layer_version(self, name):
+        source = self._layer_source(name)
+        previous, version = self._layer_versions.get(name, (None, 0))
+        same = previous is not None and previous[0] == source[0] and all(
+            a is b or (not isinstance(a, np.ndarray) and a == b) for a, b in zip(previous[1:], source[1:]))
+        if not same:
+            version += 1
+            self._layer_versions[name] = (source, version)
+            if name == 'coverage':
+                self._coverage_counts = None
+        return version
+
+    def _cell_lookup(self, x0, x1, step, zoom, count):
+        """Maps canvas pixel columns x0..x1 to grid cell indices (-1 outside the grid)."""
+        cells = np.floor((np.arange(x0, x1) + 0.5) / zoom / step).astype(np.int64)
+        cells[(cells < 0) | (cells >= count)] = -1
+        return cells
 
-            h, w, _ = display_cv.shape
-            mask_resized = cv2.resize(self.app_state.danger_mask, (w, h))
-            bool_mask = mask_resized.astype(bool)
-            
-            display_cv[bool_mask] = cv2.addWeighted(display_cv[bool_mask], 0.7, red_layer[bool_mask], 0.3, 0)
-            display_pil = Image.fromarray(cv2.cvtColor(display_cv, cv2.COLOR_BGR2RGB))
+    def _tile_zones(self, tx, ty, zoom):
+        """The danger zones whose bounding boxes reach a tile; a danger tile is redrawn only when these change."""
+        zones = self.app_state.danger_zones
+        version, bounds = self._zone_bounds
+        if version != zones.version:
+            bounds = np.array([DangerZones.bounds(zone) for zone in zones], dtype=np.float64).reshape(-1, 4)
+            self._zone_bounds = (zones.version, bounds)
+        ox, oy = self.app_state.crop_rect[:2]
+        # Source pixels sampled by the tile, widened by one pixel against rounding at the edges.
+        sx0, sy0 = ox + tx * TILE_SIZE / zoom - 1, oy + ty * TILE_SIZE / zoom - 1
+        sx1, sy1 = ox + (tx + 1) * TILE_SIZE / zoom + 1, oy + (ty + 1) * TILE_SIZE / zoom + 1
+        hits = (bounds[:, 0] <= sx1) & (bounds[:, 2] >= sx0) & (bounds[:, 1] <= sy1) & (bounds[:, 3] >= sy0)
+        return tuple(zone for zone, hit in zip(zones, hits) if hit)
 
-        w, h = display_pil.size
+    def _render_tile(self, name, tx, ty, zoom, zones=()):
+        """Rasterizes one TILE_SIZE x TILE_SIZE RGBA tile of a layer in canvas coordinates."""
+        state = self.app_state
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        tile = np.zeros((TILE_SIZE, TILE_SIZE, 4), np.uint8)
+        if name == 'danger':
+            # Zones are vectors in source_img coordinates; rasterize the ones reaching this tile at canvas resolution.
+            h, w = state.cv_img.shape[:2]
+            ox, oy = state.crop_rect[:2]
+            mask = DangerZones(zones).rasterize(ox + x0 / zoom, oy + y0 / zoom, 1 / zoom, 1 / zoom, TILE_SIZE, TILE_SIZE)
+            in_x = (np.arange(x0, x0 + TILE_SIZE) + 0.5) / zoom < w
+            in_y = (np.arange(y0, y0 + TILE_SIZE) + 0.5) / zoom < h
+            tile[mask & in_y[:, None] & in_x[None, :]] = DANGER_RGBA
+            return tile
+
+        step_x, step_y = state.ppm_x * GRID_PITCH, state.ppm_y * GRID_PITCH
+        cols = self._cell_lookup(x0, x0 + TILE_SIZE, step_x, zoom, state.grid_w)
+        rows = self._cell_lookup(y0, y0 + TILE_SIZE, step_y, zoom, state.grid_h)
+        inside = (rows[:, None] >= 0) & (cols[None, :] >= 0)
+
+        if name == 'grid':
+            # Dashed lines wherever the cell index changes between neighbouring pixels.
+            col_edge = np.zeros(TILE_SIZE, bool)
+            col_edge[1:] = cols[1:] != cols[:-1]
+            row_edge = np.zeros(TILE_SIZE, bool)
+            row_edge[1:] = rows[1:] != rows[:-1]
+            dash_y = (np.arange(y0, y0 + TILE_SIZE) // 2) % 2 == 0
+            dash_x = (np.arange(x0, x0 + TILE_SIZE) // 2) % 2 == 0
+            lines = (col_edge[None, :] & dash_y[:, None]) | (row_edge[:, None] & dash_x[None, :])
+            tile[lines & inside] = (128, 128, 128, 255)
+        elif name == 'candidates' and state.feasible_mask is not None:
+            values = np.zeros(inside.shape, bool)
+            values[inside] = state.feasible_mask[np.broadcast_to(rows[:, None], inside.shape)[inside],
+                                                 np.broadcast_to(cols[None, :], inside.shape)[inside]]
+            tile[values] = (40, 200, 80, 70)
+        elif name == 'coverage' and state.beacon_indices:
+            counts = self._get_coverage_counts()
+            values = np.zeros(inside.shape, np.int64)
+            values[inside] = counts[np.broadcast_to(rows[:, None], inside.shape)[inside],
+                                    np.broadcast_to(cols[None, :], inside.shape)[inside]]
+            covered = values > 0
+            if covered.any():
+                levels = (np.minimum(values, len(state.beacon_indices)) * 255 // len(state.beacon_indices)).astype(np.uint8)
+                colors = cv2.applyColorMap(levels, cv2.COLORMAP_JET)
+                tile[covered, :3] = colors[covered][:, ::-1]
+                tile[covered, 3] = 90
+        elif name == 'beacons':
+            r = 10  # Beacon radius in pixels
+            for idx in state.beacon_indices or ():
+                x, y = state.target_centers[idx]
+                cx, cy = int(round(x * zoom)) - x0, int(round(y * zoom)) - y0
+                if -r - 3 <= cx < TILE_SIZE + r + 3 and -r - 3 <= cy < TILE_SIZE + r + 3:
+                    cv2.circle(tile, (cx, cy), r, (0, 255, 255, 255), 3, lineType=cv2.LINE_AA)
+        return tile
+
+    def _get_coverage_counts(self):
+        if self._coverage_counts is None:
+            state = self.app_state
+            self._coverage_counts = coverage_counts(
+                list(state.beacon_indices), state.grid_w, state.grid_h,
+                state.ppm_x * GRID_PITCH, state.ppm_y * GRID_PITCH, COVERAGE * state.ppm_x)
+        return self._coverage_counts
+
+    def _get_tile(self, name, version, tx, ty, zoom):
+        key = (name, version, zoom, tx, ty)
+        zones = ()
+        if name == 'danger':
+            # Keyed on the identities of the zones drawn; the cached entry holds them, so an id is never reused while cached.
+            zones = self._tile_zones(tx, ty, zoom)
+            key += tuple(id(zone) for zone in zones)
+        entry = self._tiles.get(key)
+        if entry is None:
+            entry = (self._render_tile(name, tx, ty, zoom, zones), zones)
+            self._tiles[key] = entry
+            if len(self._tiles) > MAX_CACHED_TILES:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return entry[0]
+
+    def _sync_layers(self, view_x0, view_y0, view_x1, view_y1):
+        """Composes each visible overlay layer for the viewport from cached tiles: one image item per layer."""
         zoom = self.app_state.zoom_level
-        new_w, new_h = int(w * zoom), int(h * zoom)
-        
-        scaled_pil = display_pil.resize((new_w, new_h), Image.LANCZOS)
-        self.image_tk = ImageTk.PhotoImage(scaled_pil)
+        has_grid = bool(self.app_state.grid_w and self.app_state.grid_h)
+        tx0, ty0 = int(view_x0 // TILE_SIZE), int(view_y0 // TILE_SIZE)
+        tx1, ty1 = int((view_x1 - 1) // TILE_SIZE) + 1, int((view_y1 - 1) // TILE_SIZE) + 1
 
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor='nw', image=self.image_tk)
-        self.canvas.configure(scrollregion=(0, 0, new_w, new_h))
+        for name in LAYER_ORDER:
+            item = self._layer_items.get(name)
+            if (not has_grid and name != 'danger') or not self.app_state.layer_visibility.get(name):
+                if item is not None:
+                    self.canvas.itemconfigure(item, state='hidden')
+                continue
 
-        if self.app_state.crop_coords:
-            x0, y0, x1, y1 = [c * zoom for c in self.app_state.crop_coords]
-            self.canvas.create_rectangle(x0, y0, x1, y1, outline='dodgerblue', width=2)
+            version = self._layer_version(name)
+            layer = np.zeros(((ty1 - ty0) * TILE_SIZE, (tx1 - tx0) * TILE_SIZE, 4), np.uint8)
+            for ty in range(ty0, ty1):
+                for tx in range(tx0, tx1):
+                    layer[(ty - ty0) * TILE_SIZE:(ty - ty0 + 1) * TILE_SIZE,
+                          (tx - tx0) * TILE_SIZE:(tx - tx0 + 1) * TILE_SIZE] = self._get_tile(name, version, tx, ty, zoom)
+            self._layer_images[name] = ImageTk.PhotoImage(Image.fromarray(layer, 'RGBA'))
 
-        if self.app_state.danger_coords:
-            x0, y0, x1, y1 = [c * zoom for c in self.app_state.danger_coords]
-            self.canvas.create_rectangle(x0, y0, x1, y1, outline='red', width=2)
-        
-        r = 10  # Beacon radius in pixels
-        if self.app_state.beacon_indices:
-            for idx in self.app_state.beacon_indices:
-                x, y = self.app_state.target_centers[idx]
-                x_scaled, y_scaled = x * zoom, y * zoom
-                self.canvas.create_oval(x_scaled - r, y_scaled - r, x_scaled + r, y_scaled + r, outline='cyan', width=3)
-        
-        if self.app_state.grid_w and self.app_state.grid_h:
-            step_x_px = (w/self.app_state.grid_w)*zoom
-            step_y_px = (h/self.app_state.grid_h)*zoom
+            if item is None:
+                self._layer_items[name] = self.canvas.create_image(tx0 * TILE_SIZE, ty0 * TILE_SIZE, anchor='nw',
+                                                                   image=self._layer_images[name], tags=('layer',))
+            else:
+                self.canvas.coords(item, tx0 * TILE_SIZE, ty0 * TILE_SIZE)
+                self.canvas.itemconfigure(item, image=self._layer_images[name], state='normal')
+        for name in LAYER_ORDER:
+            if name in self._layer_items:
+                self.canvas.tag_raise(self._layer_items[name])
 
-            # draw vertical lines
-            for i in range(1, self.app_state.grid_w):
-                x = i * step_x_px
-                self.canvas.create_line(x, 0, x, new_h, fill='gray', dash=(2, 2))
+    def _sync_edit_rects(self):
+        """Shows, hides or moves the crop and danger edit rectangles."""
+        zoom = self.app_state.zoom_level
+        for kind, coords, color in (('crop', self.app_state.crop_coords, 'dodgerblue'),
+                                    ('danger', self.app_state.danger_coords, 'red')):
+            item = self._rect_items.get(kind)
+            if not coords:
+                if item is not None:
+                    self.canvas.itemconfigure(item, state='hidden')
+                continue
+            x0, y0, x1, y1 = [c * zoom for c in coords]
+            if item is None:
+                self._rect_items[kind] = self.canvas.create_rectangle(x0, y0, x1, y1, outline=color, width=2, tags=('edit',))
+            else:
+                self.canvas.coords(item, x0, y0, x1, y1)
+                self.canvas.itemconfigure(item, state='normal')
+        self.canvas.tag_raise('edit')
+
+    def _redraw_high_quality(self):
+        self._hq_job = None
+        self.update_display(high_quality=True)
 
-            for i in range(1, self.app_state.grid_h):
-                y = i * step_y_px
-                self.canvas.create_line(0, y, new_w, y, fill='gray', dash=(2, 2))
+    def on_xview(self, *args):
+        self.canvas.xview(*args)
+        self.update_display()
+
+    def on_yview(self, *args):
+        self.canvas.yview(*args)
+        self.update_display()
 
     def on_mouse_wheel(self, event):
+        # canvas.scale() would only move the retained items: Tk does not resample image items, and the
+        # image and every layer are image items. A zoom step therefore redraws the viewport quickly from
+        # the pyramid and cached tiles, and the delayed high-quality pass follows once zooming pauses.
         factor = 1.1 if event.delta > 0 else 0.9
         new_zoom = self.app_state.zoom_level * factor
         
@@ -152,8 +387,17 @@ class ImageCanvasView(ctk.CTkFrame):
             coords[3] += dy_img
 
         self.drag_data = {'x': mx_img, 'y': my_img}
-        self.update_display()
+        if self._drag_job is None:
+            self._drag_job = self.after(FRAME_INTERVAL_MS, self._flush_drag)
+
+    def _flush_drag(self):
+        """Applies coalesced motion events: only the edit rectangle item moves."""
+        self._drag_job = None
+        self._sync_edit_rects()
 
     def on_release(self, e):
+        if self._drag_job is not None:
+            self.after_cancel(self._drag_job)
+            self._flush_drag()
         self.resizing = self.moving = False
         self.resize_dir = None
\ No newline at end of file
@@ -21,11 +21,26 @@ class ControlPanel(ctk.CTkFrame):
         ctk.CTkButton(zoom_frame, text="Zoom In (+)", command=self.controller.zoom_in).grid(row=0, column=0, padx=(0,2), sticky="ew")
         ctk.CTkButton(zoom_frame, text="Zoom Out (-)", command=self.controller.zoom_out).grid(row=0, column=1, padx=(2,0), sticky="ew")
         
+        # overlay layers
+        ctk.CTkLabel(self.scrollable_frame, text="Layers", font=ctk.CTkFont(weight="bold")).pack(pady=(10, 5), padx=10, anchor="w")
+        for name, label in (('danger', 'Danger Zones'), ('grid', 'Grid'), ('candidates', 'Candidate Cells'), ('coverage', 'Coverage Heatmap'), ('beacons', 'Beacons')):
+            var = ctk.BooleanVar(value=self.controller.state.layer_visibility[name])
+            ctk.CTkCheckBox(self.scrollable_frame, text=label, variable=var,
+                            command=lambda n=name, v=var: self.controller.set_layer_visible(n, v.get())).pack(padx=10, pady=2, anchor="w")
+
         # file & undo
         ctk.CTkLabel(self.scrollable_frame, text="File Operations", font=ctk.CTkFont(weight="bold")).pack(pady=(10, 5), padx=10, anchor="w")
         ctk.CTkButton(self.scrollable_frame, text="Open Image", command=self.controller.browse_image).pack(fill="x", padx=10, pady=2)
+        project_frame = ctk.CTkFrame(self.scrollable_frame)
+        project_frame.pack(fill="x", padx=10, pady=2)
+        project_frame.grid_columnconfigure((0, 1), weight=1)
+        ctk.CTkButton(project_frame, text="Open Project", command=self.controller.open_project).grid(row=0, column=0, padx=(0,2), sticky="ew")
+        ctk.CTkButton(project_frame, text="Save Project", command=self.controller.save_project).grid(row=0, column=1, padx=(2,0), sticky="ew")
         ctk.CTkButton(self.scrollable_frame, text="Export JSON", command=self.controller.export_json).pack(fill="x", padx=10, pady=2)
+        self.compact_export = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.scrollable_frame, text="Compact export (bit-packed mask)", variable=self.compact_export).pack(padx=10, pady=2, anchor="w")
         ctk.CTkButton(self.scrollable_frame, text="Undo", command=self.controller.undo).pack(fill="x", padx=10, pady=2)
+        ctk.CTkButton(self.scrollable_frame, text="Save Trace...", command=self.controller.save_trace).pack(fill="x", padx=10, pady=2)
 
         # grid settings
         ctk.CTkLabel(self.scrollable_frame, text="Grid Settings", font=ctk.CTkFont(weight="bold")).pack(pady=(20, 5), padx=10, anchor="w")
@@ -46,20 +61,63 @@ class ControlPanel(ctk.CTkFrame):
         ctk.CTkLabel(self.scrollable_frame, text="Danger Zone Tool", font=ctk.CTkFont(weight="bold")).pack(pady=(20, 5), padx=10, anchor="w")
         ctk.CTkButton(self.scrollable_frame, text="Toggle Danger Zone", command=self.controller.toggle_danger_region).pack(fill="x", padx=10, pady=2)
         ctk.CTkButton(self.scrollable_frame, text="Apply Danger Zone", command=self.controller.apply_danger_overlay).pack(fill="x", padx=10, pady=2)
+        self.zone_labels = []
+        self.zone_menu = ctk.CTkOptionMenu(self.scrollable_frame, values=["No zones"])
+        self.zone_menu.pack(fill="x", padx=10, pady=2)
+        zone_frame = ctk.CTkFrame(self.scrollable_frame)
+        zone_frame.pack(fill="x", padx=10, pady=2)
+        zone_frame.grid_columnconfigure((0, 1), weight=1)
+        ctk.CTkButton(zone_frame, text="Edit Zone", command=self.controller.edit_danger_zone).grid(row=0, column=0, padx=(0,2), sticky="ew")
+        ctk.CTkButton(zone_frame, text="Remove Zone", command=self.controller.remove_danger_zone).grid(row=0, column=1, padx=(2,0), sticky="ew")
 
         # GA
         ctk.CTkLabel(self.scrollable_frame, text="Beacon Placement", font=ctk.CTkFont(weight="bold")).pack(pady=(20, 5), padx=10, anchor="w")
+        ctk.CTkLabel(self.scrollable_frame, text="Solver:").pack(padx=10, anchor="w")
+        self.solver_menu = ctk.CTkOptionMenu(self.scrollable_frame, values=list(self.controller.solvers), command=self.controller.select_solver)
+        self.solver_menu.pack(fill="x", padx=10, pady=2)
+        ctk.CTkLabel(self.scrollable_frame, text="Target coverage (%, Minimum Beacons):").pack(padx=10, anchor="w")
+        self.e_target_coverage = ctk.CTkEntry(self.scrollable_frame)
+        self.e_target_coverage.pack(fill="x", padx=10, pady=2)
+        if self.controller.count_search is not None:
+            self.e_target_coverage.insert(0, f"{self.controller.count_search.target_coverage * 100:g}")
         ctk.CTkButton(self.scrollable_frame, text="Run Estimation", command=self.controller.run_ga, fg_color="#28a745", hover_color="#218838").pack(fill="x", padx=10, pady=2)
+        ctk.CTkButton(self.scrollable_frame, text="Cancel", command=self.controller.cancel_estimation, fg_color="#dc3545", hover_color="#c82333").pack(fill="x", padx=10, pady=2)
 
         self.status_label = ctk.CTkLabel(self, text="Open an image to start.", wraplength=230, justify="left")
         self.status_label.grid(row=1, column=0, padx=10, pady=10, sticky="sw")
 
     def get_grid_entries(self):
         return self.e_real_w.get(), self.e_real_h.get()
+
+    def get_target_coverage(self):
+        return self.e_target_coverage.get()
+
+    def get_compact_export(self):
+        return self.compact_export.get()
     
     def set_status(self, message):
         self.status_label.configure(text=message)
 
+    def set_danger_zones(self, labels):
+        selected = self.get_selected_zone()
+        self.zone_labels = labels
+        self.zone_menu.configure(values=labels or ["No zones"])
+        if not labels:
+            self.zone_menu.set("No zones")
+        elif selected is None or selected >= len(labels):
+            self.zone_menu.set(labels[-1])
+        else:
+            self.zone_menu.set(labels[selected])
+
+    def get_selected_zone(self):
+        """Index of the danger zone selected in the menu, or None."""
+        value = self.zone_menu.get()
+        return self.zone_labels.index(value) if value in self.zone_labels else None
+
+    def set_grid_entries(self, real_w, real_h):
+        self.e_real_w.insert(0, f"{real_w:g}")
+        self.e_real_h.insert(0, f"{real_h:g}")
+
     def clear_grid_entries(self):
         self.e_real_w.delete(0, 'end')
         self.e_real_h.delete(0, 'end')
\ No newline at end of file
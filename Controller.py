@@ -1,17 +1,33 @@
 from tkinter import filedialog, messagebox
-from PIL import Image
-import cv2
-import numpy as np
-import json
+import queue
+import threading
+from DangerZones import DangerZones
+from ImageLoader import load_image
+from Pipeline import ESTIMATION_STAGES, EstimationCancelled, build_export, cells_at, make_grid, run_estimation, write_json
+from Profiler import MemorySampler, Profiler
+from Project import load_project, save_project
 
-COVERAGE = 5
+POLL_INTERVAL_MS = 50
 
 class AppController:
     """The controller class holding all application logic."""
-    def __init__(self, app_state, image_processor, ga_solver):
+    def __init__(self, app_state, image_processor, ga_solver, greedy_solver=None, image_cache_dir=None,
+                 profiler=None, count_search=None):
         self.state = app_state
+        self.profiler = profiler or Profiler()
+        self.image_cache_dir = image_cache_dir
         self.image_processor = image_processor
         self.ga_solver = ga_solver
+        self.solvers = {'Genetic Algorithm': ga_solver}
+        if greedy_solver is not None:
+            self.solvers['Greedy'] = greedy_solver
+        self.count_search = count_search  # BeaconCountSearch; its target comes from the control panel
+        if count_search is not None:
+            self.solvers['Minimum Beacons'] = count_search
+        self.solver = ga_solver
+        self._worker = None
+        self._events = queue.Queue()
+        self._cancel_event = threading.Event()
         self.canvas_view = None
         self.control_panel = None
 
@@ -22,17 +38,23 @@ class AppController:
         if not path:
             return
         
+        source_img = load_image(path, self.image_cache_dir)
+        if source_img is None:
+            messagebox.showerror('Error', f'Could not read image: {path}')
+            return
+
+        # The decoded buffer is the only full-size copy; cv_img and the canvas work on views of it.
         self.state.history.clear()
-        self.state.cv_img = cv2.imread(path)
-        rgb_img = cv2.cvtColor(self.state.cv_img, cv2.COLOR_BGR2RGB)
-        self.state.original_pil_img = Image.fromarray(rgb_img)
+        self.state.source_img = source_img
+        self.state.image_path = path
+        h, w = self.state.source_img.shape[:2]
+        self.state.set_crop_rect((0, 0, w, h))
         
         self.state.zoom_level = 1.0
         self.state.mode = None
-        self.state.danger_mask = None
-        self.state.building_mask = None
         self.state.beacon_indices.clear()
         
+        self._refresh_zone_list()
         self.canvas_view.update_display()
         self.control_panel.set_status(f"Loaded: {path.split('/')[-1]}")
 
@@ -41,16 +63,17 @@ class AppController:
             messagebox.showwarning('Warning', 'Please toggle and position a crop region first.')
             return
         
+        h, w = self.state.cv_img.shape[:2]
         x0, y0, x1, y1 = map(int, self.state.crop_coords)
+        x0, y0, x1, y1 = max(0, x0), max(0, y0), min(w, x1), min(h, y1)
         if x1 <= x0 or y1 <= y0:
             return
 
-        self.state.history.append(self.state.cv_img.copy())
-        
-        self.state.cv_img = self.state.cv_img[y0:y1, x0:x1]
+        # A crop is a slice of its parent, so only the rectangle is recorded, with the grid for undo.
+        self.state.push_history({'kind': 'crop', 'rect': self.state.crop_rect, 'grid': self.state.grid_state()})
+        ox, oy = self.state.crop_rect[:2]
+        self.state.set_crop_rect((ox + x0, oy + y0, ox + x1, oy + y1))
         
-        rgb_img = cv2.cvtColor(self.state.cv_img, cv2.COLOR_BGR2RGB)
-        self.state.original_pil_img = Image.fromarray(rgb_img)
         self.state.zoom_level = 1.0
         self.state.mode = None
         self.state.crop_coords = None
@@ -59,7 +82,7 @@ class AppController:
         self.control_panel.set_status(f'Image cropped to {x1-x0}x{y1-y0}.')
     
     def _toggle_region(self, region_type):
-        if self.state.original_pil_img is None:
+        if self.state.cv_img is None:
             return
 
         canvas = self.canvas_view.canvas
@@ -78,6 +101,7 @@ class AppController:
         elif region_type == 'danger':
             rect_size = 50
             self.state.danger_coords = [center_x - rect_size, center_y - rect_size, center_x + rect_size, center_y + rect_size]
+            self.state.editing_zone = None
             self.state.mode = 'danger'
             self.control_panel.set_status('Danger zone edit mode.')
         
@@ -94,23 +118,65 @@ class AppController:
             messagebox.showwarning('Warning', 'Please toggle a danger region first.')
             return
             
+        # Zones are kept in source_img coordinates so they survive crops and their undo.
         x0, y0, x1, y1 = map(int, self.state.danger_coords)
-        h, w, _ = self.state.cv_img.shape
-        
-        if self.state.danger_mask is None:
-            self.state.danger_mask = np.zeros((h, w), dtype=np.uint8)
-
-        if self.state.danger_mask.shape[0] != h or self.state.danger_mask.shape[1] != w:
-            self.state.danger_mask = cv2.resize(self.state.danger_mask, (w, h))
-            
-        cv2.rectangle(self.state.danger_mask, (x0, y0), (x1, y1), 255, thickness=-1)
+        ox, oy = self.state.crop_rect[:2]
+        zone = DangerZones.rect(ox + x0, oy + y0, ox + x1, oy + y1)
+        index = self.state.editing_zone
+        if index is None:
+            self.state.danger_zones.add(zone)
+            self.state.push_history({'kind': 'danger', 'action': 'add', 'zone': zone})
+        else:
+            previous = self.state.danger_zones.replace(index, zone)
+            self.state.push_history({'kind': 'danger', 'action': 'replace', 'index': index, 'zone': previous})
         
         self.state.mode = None
         self.state.danger_coords = None
+        self.state.editing_zone = None
         
+        self._refresh_zone_list()
         self.canvas_view.update_display()
         self.control_panel.set_status('Danger zone applied and visualized.')
 
+    def edit_danger_zone(self):
+        index = self.control_panel.get_selected_zone()
+        if index is None:
+            return
+        kind, data = self.state.danger_zones[index]
+        if kind != 'rect':
+            messagebox.showwarning('Warning', 'Only rectangular danger zones can be edited. Remove the zone and draw a rectangle instead.')
+            return
+
+        ox, oy = self.state.crop_rect[:2]
+        x0, y0, x1, y1 = data
+        self.state.danger_coords = [x0 - ox, y0 - oy, x1 - ox, y1 - oy]
+        self.state.editing_zone = index
+        self.state.mode = 'danger'
+        self.control_panel.set_status(f'Editing danger zone {index + 1}. Apply to save the change.')
+        self.canvas_view.update_display()
+
+    def remove_danger_zone(self):
+        index = self.control_panel.get_selected_zone()
+        if index is None:
+            return
+        zone = self.state.danger_zones[index]
+        self.state.danger_zones.remove(zone)
+        self.state.push_history({'kind': 'danger', 'action': 'remove', 'index': index, 'zone': zone})
+        if self.state.editing_zone is not None:
+            self.cancel_current_mode()
+
+        self._refresh_zone_list()
+        self.canvas_view.update_display()
+        self.control_panel.set_status(f'Danger zone {index + 1} removed.')
+
+    def _refresh_zone_list(self):
+        labels = [f'{i + 1}: {kind}' for i, (kind, _) in enumerate(self.state.danger_zones)]
+        self.control_panel.set_danger_zones(labels)
+
+    def _danger_grid(self):
+        return self.state.grid_masks.danger(self.state.danger_zones, self.state.crop_rect[:2], self.state.target_centers,
+                                            (self.state.grid_w, self.state.grid_h), (self.state.ppm_x, self.state.ppm_y))
+
     def set_grid(self):
         if self.state.cv_img is None:
             return
@@ -123,15 +189,23 @@ class AppController:
             messagebox.showerror('Error', 'Please enter valid, positive numbers for real-world size.')
             return
 
-        h, w, _ = self.state.cv_img.shape
-        self.state.ppm_x, self.state.ppm_y = w / rw, h / rh
-        step_x, step_y = self.state.ppm_x * 0.5, self.state.ppm_y * 0.5
-        self.state.grid_w, self.state.grid_h = int(rw / 0.5), int(rh / 0.5)
-        
-        self.state.target_centers = [
-            (j * step_x + step_x / 2, i * step_y + step_y / 2)
-            for i in range(self.state.grid_h) for j in range(self.state.grid_w)
-        ]
+        state = self.state
+        state.real_size = (rw, rh)
+        grid = make_grid(state.cv_img.shape, rw, rh)
+        origin = state.crop_rect[:2]
+        if grid[:4] == (state.ppm_x, state.ppm_y, state.grid_w, state.grid_h) and origin == state.grid_origin:
+            # Same grid: keep target_centers so the cached masks and coverage stay valid.
+            self.control_panel.set_status(f'Grid unchanged: {state.grid_w}x{state.grid_h}')
+            return
+
+        old_centers, old_origin = state.target_centers, state.grid_origin
+        state.ppm_x, state.ppm_y, state.grid_w, state.grid_h, state.target_centers = grid
+        state.grid_origin = origin
+        if state.beacon_indices and old_centers is not None:
+            # Carry the placement over to the new grid so the next run can warm-start from it.
+            points = old_centers[state.beacon_indices] + (old_origin[0] - origin[0], old_origin[1] - origin[1])
+            state.beacon_indices = list(dict.fromkeys(cells_at(points, grid[2:4], grid[:2])))
+            state.coverage = None
         self.control_panel.set_status(f'Grid set: {self.state.grid_w}x{self.state.grid_h}')
         self.canvas_view.update_display()
     
@@ -143,92 +217,283 @@ class AppController:
             self.canvas_view.update_display()
         elif self.state.mode == "danger":
             self.state.danger_coords = None
+            self.state.editing_zone = None
             self.state.mode = None
             self.control_panel.set_status("Danger zone operation cancelled.")
             self.canvas_view.update_display()
 
     def run_ga(self):
-        if not self.state.target_centers:
+        if self.state.target_centers is None:
             messagebox.showwarning('Warning', 'Please set the grid first.')
             return
+        if self._worker is not None and self._worker.is_alive():
+            messagebox.showwarning('Warning', 'An estimation is already running.')
+            return
+        if self.solver is self.count_search:
+            try:
+                target = float(self.control_panel.get_target_coverage()) / 100
+                if not 0 < target <= 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror('Error', 'Please enter a target coverage between 0 and 100 %.')
+                return
+            self.count_search.target_coverage = target
 
+        job = {
+            'cv_img': self.state.cv_img,
+            'danger_zones': self.state.danger_zones.copy(),
+            'offset': self.state.crop_rect[:2],
+            'target_centers': self.state.target_centers,
+            'grid_size': (self.state.grid_w, self.state.grid_h),
+            'ppm': (self.state.ppm_x, self.state.ppm_y),
+            'solver': self.solver,
+            'initial': list(self.state.beacon_indices) or None,  # Warm start from the current placement
+        }
+        self._cancel_event.clear()
+        self._events = queue.Queue()
+        self._worker = threading.Thread(target=self._estimation_worker, args=(job, self._events), daemon=True)
+        self._worker.start()
         self.control_panel.set_status('Running analysis...')
-        self.state.building_mask = self.image_processor.detect_building_mask(self.state.cv_img)
-        
-        if self.state.danger_mask is None:
-            self.state.danger_mask = self.image_processor.detect_danger_zones(self.state.cv_img)
-        
-        h, w = self.state.building_mask.shape
-        danger_mask_resized = cv2.resize(self.state.danger_mask, (w, h))
+        self.control_panel.after(POLL_INTERVAL_MS, self._poll_estimation, job)
 
-        placements = [
-            i for i, (x, y) in enumerate(self.state.target_centers)
-            if self.state.building_mask[int(y), int(x)] > 0 and danger_mask_resized[int(y), int(x)] == 0
-        ]
-        if not placements:
-            messagebox.showerror('Error', 'No valid placement locations found in the building mask.')
+    def cancel_estimation(self):
+        if self._worker is None or not self._worker.is_alive():
             return
-            
-        centers_arr = np.array(self.state.target_centers)
-        cand_arr = centers_arr[placements]
-        dist = np.linalg.norm(centers_arr[:, None, :] - cand_arr[None, :, :], axis=2)
-        ble_px = COVERAGE * self.state.ppm_x
-        coverage_sets = [set(np.where(dist[:, j] <= ble_px)[0]) for j in range(len(placements))]
-        
-        self.state.beacon_indices = self.ga_solver.run(placements, self.state.target_centers, coverage_sets, ble_px)
-        
+        self._cancel_event.set()
+        self.control_panel.set_status('Cancelling estimation...')
+
+    def _estimation_worker(self, job, events):
+        """Runs on the worker thread; talks to the UI only through the event queue."""
+        def on_generation(generation, best_fitness, mean_fitness, best_placement):
+            events.put(('generation', generation, best_fitness, best_placement))
+            return self._cancel_event.is_set()
+
+        try:
+            with MemorySampler(self.profiler) as memory, self.profiler.span('run_ga') as details:
+                result = run_estimation(
+                    job['cv_img'], job['danger_zones'], job['target_centers'], job['grid_size'], job['ppm'],
+                    self.image_processor, job['solver'], offset=job['offset'], grid_masks=self.state.grid_masks,
+                    report=lambda message: events.put(('status', message)),
+                    cancelled=self._cancel_event.is_set,
+                    on_generation=on_generation,
+                    profiler=self.profiler,
+                    initial=job['initial'],
+                )
+            if memory.peak is not None:
+                details['peak_rss_mb'] = result['peak_rss_mb'] = memory.peak / 1024 ** 2
+        except EstimationCancelled:
+            events.put(('cancelled',))
+        except ValueError as e:
+            events.put(('error', str(e)))
+        except Exception as e:  # Always end with an event, or _poll_estimation would poll forever
+            events.put(('error', f'{type(e).__name__}: {e}'))
+        else:
+            events.put(('done', result))
+
+    def _poll_estimation(self, job):
+        """Drains worker events on the Tk thread, redrawing at most once per poll."""
+        latest_generation, finished = None, None
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'status':
+                self.control_panel.set_status(event[1])
+            elif event[0] == 'generation':
+                latest_generation = event
+            else:
+                finished = event
+
+        # The result only applies to the image, grid and danger zones it was computed from.
+        current = (job['cv_img'] is self.state.cv_img and job['grid_size'] == (self.state.grid_w, self.state.grid_h)
+                   and job['danger_zones'].version == self.state.danger_zones.version)
+        if latest_generation is not None and current and finished is None:
+            _, generation, best_fitness, best_placement = latest_generation
+            self.state.beacon_indices = best_placement
+            self.state.coverage = None
+            self.canvas_view.update_display()
+            self.control_panel.set_status(f'Generation {generation + 1}: best fitness {best_fitness:.3f}')
+
+        if finished is None:
+            self.control_panel.after(POLL_INTERVAL_MS, self._poll_estimation, job)
+        elif finished[0] == 'done':
+            self._finish_estimation(finished[1], current)
+        elif finished[0] == 'cancelled':
+            self.control_panel.set_status('Estimation cancelled.')
+        else:
+            messagebox.showerror('Error', finished[1])
+            self.control_panel.set_status(finished[1])
+
+    def _finish_estimation(self, result, current):
+        if not current:
+            self.control_panel.set_status('Image, grid or danger zones changed during estimation; result discarded.')
+            return
+
+        self.state.feasible_mask = result['feasible_mask']
+        if not self.state.danger_zones and result['danger_zones']:
+            # Auto-detected zones become ordinary zones that can be removed individually, or all at once by undo.
+            zones = list(result['danger_zones'])
+            self.state.danger_zones.extend(zones)
+            self.state.push_history({'kind': 'danger', 'action': 'detect', 'zones': zones})
+            self._refresh_zone_list()
+
+        self.state.beacon_indices = result['beacon_indices']
+        self.state.coverage = result['coverage']
         self.canvas_view.update_display()
-        self.control_panel.set_status(f'Beacon estimation complete. {len(self.state.beacon_indices)} beacons placed.')
+        summary = self._estimation_summary(result)
+        if result['stop_reason'] == 'cancelled':
+            self.control_panel.set_status(f'Estimation cancelled. Kept best result so far ({len(self.state.beacon_indices)} beacons). {summary}')
+            return
+        self.control_panel.set_status(f'Beacon estimation complete. {len(self.state.beacon_indices)} beacons placed. {summary}')
         messagebox.showinfo('Complete', 'Beacon estimation complete.')
 
+    def _estimation_summary(self, result):
+        """One-line timing summary of the last run for the status bar."""
+        run = self.profiler.last('run_ga')
+        since = run and run['ts']  # Stages skipped this run (e.g. detection) keep older spans
+        stages = self.profiler.durations(ESTIMATION_STAGES, since)
+        parts = [f'{name.replace("_", " ")} {seconds:.2f}s' for name, seconds in stages.items() if name != 'solver']
+        solver = self.profiler.last('solver', since)
+        if solver is not None:
+            counters = solver['args']
+            text = f'solver {solver["dur"] / 1e6:.2f}s'
+            if 'evaluations' in counters:
+                text += f' ({counters["evaluations"]} evals, {counters["evaluations_per_s"]:.0f}/s'
+                if counters.get('cache_hits'):
+                    text += f', {counters["cache_hit_rate"]:.0%} cached'
+                if counters.get('best_generation') is not None:
+                    text += f', best at gen {counters["best_generation"] + 1}'
+                text += ')'
+            parts.append(text)
+        coverage = result.get('coverage')
+        if coverage and 'curve' in coverage:
+            parts.append(f'{coverage["num_beacons"]} beacons cover {coverage["feasible_fraction"]:.1%} of the feasible area '
+                         f'(target {coverage["target"]:.0%}{"" if coverage["reached"] else ", not reached"})')
+        elif coverage:
+            parts.append(f'{coverage["feasible_fraction"]:.1%} of the feasible area covered')
+        if result.get('moved_beacons'):
+            parts.append(f'{result["moved_beacons"]} infeasible beacons moved')
+        if result.get('peak_rss_mb') is not None:
+            parts.append(f'peak {result["peak_rss_mb"]:.0f} MB')
+        return ' · '.join(parts)
+
     def export_json(self):
-        if not self.state.beacon_indices or self.state.danger_mask is None or self.state.grid_w is None:
+        if not self.state.beacon_indices or self.state.grid_w is None:
             messagebox.showwarning('Warning', 'Prerequisites not met. Run Grid Setup, Danger Application, and GA.')
             return
 
-        h, w, _ = self.state.cv_img.shape
-        danger_mask_resized = cv2.resize(self.state.danger_mask, (w, h))
-        safe_coords = [
-            [divmod(idx, self.state.grid_w)[0], divmod(idx, self.state.grid_w)[1]]
-            for idx, (x, y) in enumerate(self.state.target_centers)
-            if danger_mask_resized[int(y), int(x)] == 0
-        ]
-        
-        parent_devices = []
-        for idx in self.state.beacon_indices:
-            i, j = divmod(idx, self.state.grid_w)
-            px, py = self.state.target_centers[idx]
-            parent_devices.append({"grid_coords": [i, j], "pixel_coords": [int(px), int(py)]})
-            
         real_w, real_h = self.control_panel.get_grid_entries()
-        export_data = {
-            "real_world_dimensions": {"width_m": float(real_w), "height_m": float(real_h)},
-            "pixel_dimensions": {"width_px": w, "height_px": h},
-            "pixels_per_meter": {"x": self.state.ppm_x, "y": self.state.ppm_y},
-            "grid_dimensions": {"width": self.state.grid_w, "height": self.state.grid_h},
-            "parent_devices": parent_devices,
-            "safe_grid_coordinates": safe_coords
-        }
+        with self.profiler.span('export_build'):
+            export_data = build_export(
+                self.state.cv_img.shape, self._danger_grid(), self.state.target_centers,
+                (self.state.grid_w, self.state.grid_h), (self.state.ppm_x, self.state.ppm_y),
+                (real_w, real_h), self.state.beacon_indices, self.state.coverage,
+                mask_encoding='bits' if self.control_panel.get_compact_export() else None
+            )
         
         path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('JSON', '*.json')])
         if not path: 
             return
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=4)
+        with self.profiler.span('export_write', path=path):
+            write_json(path, export_data)
+        timings = self.profiler.durations(('export_build', 'export_write'))
+        self.control_panel.set_status(f"Exported in {timings['export_build']:.2f}s + {timings['export_write']:.2f}s write.")
         messagebox.showinfo('Success', 'JSON file exported.')
 
+    def save_project(self):
+        """Saves the editing state and cached masks/coverage so the site can be reopened without recomputation."""
+        if self.state.source_img is None:
+            messagebox.showwarning('Warning', 'Open an image first.')
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.npz', filetypes=[('Project', '*.npz')])
+        if not path:
+            return
+        with self.profiler.span('save_project', path=path):
+            save_project(path, self.state)
+        self.control_panel.set_status(f"Project saved: {path.split('/')[-1]}")
+
+    def open_project(self):
+        if self._worker is not None and self._worker.is_alive():
+            messagebox.showwarning('Warning', 'An estimation is running; cancel it before opening a project.')
+            return
+        path = filedialog.askopenfilename(filetypes=[('Project', '*.npz')])
+        if not path:
+            return
+
+        def locate_image(missing):
+            messagebox.showwarning('Warning', f'Image not found: {missing}\nPlease locate it.')
+            return filedialog.askopenfilename(filetypes=[('Image Files', '*.png *.jpg *.jpeg')]) or None
+
+        try:
+            with self.profiler.span('open_project', path=path):
+                restored = load_project(path, self.state, self.image_cache_dir, locate_image)
+        except ValueError as e:
+            messagebox.showerror('Error', str(e))
+            return
+
+        self.control_panel.clear_grid_entries()
+        if self.state.real_size is not None:
+            self.control_panel.set_grid_entries(*self.state.real_size)
+        self._refresh_zone_list()
+        self.canvas_view.update_display()
+        status = f"Project loaded: {path.split('/')[-1]}"
+        if not restored:
+            status += ' (the image changed since it was saved; masks will be recomputed)'
+        self.control_panel.set_status(status)
+
+    def save_trace(self):
+        """Writes every span and counter recorded so far as a Chrome trace (chrome://tracing, Perfetto)."""
+        if not self.profiler.events:
+            messagebox.showwarning('Warning', 'Nothing has been recorded yet.')
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('Chrome Trace', '*.json')])
+        if not path:
+            return
+        self.profiler.write_chrome_trace(path)
+        self.control_panel.set_status(f'Trace with {len(self.profiler.events)} events saved.')
+
     def undo(self):
         if not self.state.history: 
             return
-        self.state.cv_img = self.state.history.pop()
-        rgb_img = cv2.cvtColor(self.state.cv_img, cv2.COLOR_BGR2RGB)
-        self.state.original_pil_img = Image.fromarray(rgb_img)
+        command = self.state.history.pop()
+        if command['kind'] == 'danger':
+            zones = self.state.danger_zones
+            if command['action'] == 'add':
+                zones.remove(command['zone'])
+            elif command['action'] == 'detect':
+                for zone in command['zones']:
+                    zones.remove(zone)
+            elif command['action'] == 'remove':
+                zones.add(command['zone'], command['index'])
+            else:
+                zones.replace(command['index'], command['zone'])
+            self._refresh_zone_list()
+            self.canvas_view.update_display()
+            self.control_panel.set_status('Last danger zone change undone.')
+            return
+
+        self.state.set_crop_rect(command['rect'])
+        # The grid set on the crop does not fit the restored image; go back to the grid from before the crop
+        # (none if the crop was loaded from a project file, which does not store it).
+        self.state.restore_grid_state(command.get('grid'))
+        self.control_panel.clear_grid_entries()
+        if self.state.real_size is not None:
+            self.control_panel.set_grid_entries(*self.state.real_size)
         self.state.zoom_level = 1.0
         self.canvas_view.update_display()
         self.control_panel.set_status('Last crop undone.')
 
+    def set_layer_visible(self, name, visible):
+        self.state.layer_visibility[name] = visible
+        self.canvas_view.update_display()
+
+    def select_solver(self, name):
+        self.solver = self.solvers[name]
+        self.control_panel.set_status(f'Solver: {name}')
+
     def _zoom(self, factor):
-        if self.state.original_pil_img is None:
+        if self.state.cv_img is None:
             return
         
         new_zoom = self.state.zoom_level * factor
@@ -0,0 +1,380 @@
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+BIT_COVERAGE_MAX_BYTES = 128 * 1024 ** 2
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words):
+    """
+    uint64配列の各行について立っているビット数を合計する。
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+class BitCoverage:
+    """
+    候補位置 × グリッドセルのカバレッジを、uint64単位にパックしたビット行列で保持するクラス。
+    個体のカバー数はビットごとのORとpopcountで求める。
+    """
+    def __init__(self, words, num_cells):
+        self.words = words
+        self.num_cells = num_cells
+
+    @classmethod
+    def from_dense(cls, mask):
+        """
+        (候補数 × セル数) のブール行列からビット行列を生成する。
+        """
+        mask = np.asarray(mask, dtype=bool)
+        num_candidates, num_cells = mask.shape
+        num_words = max(1, -(-num_cells // 64))
+        packed = np.zeros((num_candidates, num_words * 8), dtype=np.uint8)
+        bits = np.packbits(mask, axis=1, bitorder="little")
+        packed[:, :bits.shape[1]] = bits
+        return cls(packed.view(np.uint64), num_cells)
+
+    @classmethod
+    def from_sparse(cls, coverage):
+        """
+        SparseCoverageからビット行列を生成する。密なブール行列は経由しない。
+        """
+        num_words = max(1, -(-coverage.num_cells // 64))
+        words = np.zeros((len(coverage), num_words), dtype=np.uint64)
+        rows = np.repeat(np.arange(len(coverage)), np.diff(coverage.indptr))
+        cells = coverage.indices.astype(np.int64)
+        bits = np.left_shift(np.uint64(1), (cells % 64).astype(np.uint64))
+        np.bitwise_or.at(words, (rows, cells // 64), bits)
+        return cls(words, coverage.num_cells)
+
+    @classmethod
+    def from_sets(cls, coverage_sets, num_cells):
+        """
+        候補ごとのカバーするセル番号の集合からビット行列を生成する。
+        """
+        mask = np.zeros((len(coverage_sets), num_cells), dtype=bool)
+        for row, cells in enumerate(coverage_sets):
+            mask[row, list(cells)] = True
+        return cls.from_dense(mask)
+
+    @classmethod
+    def from_arrays(cls, num_cells, words):
+        return cls(words, num_cells)
+
+    def arrays(self):
+        """
+        共有メモリへ載せるための配列を返す。from_arraysで復元できる。
+        """
+        return {"words": self.words}
+
+    def __len__(self):
+        return self.words.shape[0]
+
+    def rows(self, start, stop):
+        """
+        候補start〜stop-1の行だけを持つカバレッジを返す。ビット行列はコピーせずビューを使う。
+        """
+        return BitCoverage(self.words[start:stop], self.num_cells)
+
+    @classmethod
+    def concatenate(cls, parts, num_cells):
+        """
+        複数のカバレッジの行を順に連結する。
+        """
+        return cls(np.concatenate([part.words for part in parts]), num_cells)
+
+    def __getitem__(self, candidate):
+        """
+        候補がカバーするセル番号の集合を返す。集合ベースの実装との互換用。
+        """
+        return set(self.cells(candidate).tolist())
+
+    def cells(self, candidate):
+        """
+        候補がカバーするセル番号の配列を返す。
+        """
+        bits = np.unpackbits(self.words[candidate].view(np.uint8), bitorder="little")[:self.num_cells]
+        return np.flatnonzero(bits)
+
+    def row_sizes(self):
+        """
+        各候補が単独でカバーするセルの数を返す。
+        """
+        return _popcount(self.words)
+
+    def count(self, individual):
+        """
+        個体（候補番号のリスト）がカバーするセルの数を返す。
+        """
+        covered = np.bitwise_or.reduce(self.words[list(individual)], axis=0)
+        return int(_popcount(covered))
+
+    def count_population(self, population):
+        """
+        (個体数 × ビーコン数) の整数配列を受け取り、各個体がカバーするセル数をまとめて返す。
+        """
+        covered = np.bitwise_or.reduce(self.words[np.asarray(population)], axis=1)
+        return _popcount(covered)
+
+    def covered(self, individual):
+        """
+        個体がカバーするセルをセル数の長さのブール配列で返す。
+        """
+        if len(individual) == 0:
+            return np.zeros(self.num_cells, dtype=bool)
+        words = np.bitwise_or.reduce(self.words[list(individual)], axis=0)
+        return np.unpackbits(words.view(np.uint8), bitorder="little")[:self.num_cells].astype(bool)
+
+    def gains(self, covered):
+        """
+        各候補がカバーするセルのうち、covered（セル数の長さのブール配列）に含まれないセルの数を返す。
+        """
+        packed = BitCoverage.from_dense(np.asarray(covered, dtype=bool)[None, :]).words
+        return _popcount(self.words & ~packed)
+
+
+class SparseCoverage:
+    """
+    候補位置ごとにカバーするセル番号をCSR形式 (indptr, indices) で保持するクラス。
+    メモリ使用量は候補数 × 半径内のセル数に比例する。
+    """
+    def __init__(self, indptr, indices, num_cells):
+        self.indptr = indptr
+        self.indices = indices
+        self.num_cells = num_cells
+
+    @classmethod
+    def from_arrays(cls, num_cells, indptr, indices):
+        return cls(indptr, indices, num_cells)
+
+    def arrays(self):
+        """
+        共有メモリへ載せるための配列を返す。from_arraysで復元できる。
+        """
+        return {"indptr": self.indptr, "indices": self.indices}
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def rows(self, start, stop):
+        """
+        候補start〜stop-1の行だけを持つカバレッジを返す。indicesはコピーせずビューを使う。
+        """
+        indptr = self.indptr[start:stop + 1]
+        return SparseCoverage(indptr - indptr[0], self.indices[indptr[0]:indptr[-1]], self.num_cells)
+
+    @classmethod
+    def concatenate(cls, parts, num_cells):
+        """
+        複数のカバレッジの行を順に連結する。
+        """
+        indptr = np.zeros(sum(len(part) for part in parts) + 1, dtype=np.int64)
+        np.cumsum(np.concatenate([np.diff(part.indptr) for part in parts]), out=indptr[1:])
+        return cls(indptr, np.concatenate([part.indices for part in parts]), num_cells)
+
+    def __getitem__(self, candidate):
+        return set(self.cells(candidate).tolist())
+
+    def cells(self, candidate):
+        """
+        候補がカバーするセル番号の配列を返す。
+        """
+        return self.indices[self.indptr[candidate]:self.indptr[candidate + 1]]
+
+    def row_sizes(self):
+        return np.diff(self.indptr)
+
+    def count(self, individual):
+        return int(self.count_population([list(individual)])[0])
+
+    def count_population(self, population):
+        population = np.asarray(population)
+        rows = population.ravel()
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        owners = np.repeat(np.arange(population.shape[0]), lengths.reshape(population.shape).sum(axis=1))
+        keys = np.sort(owners.astype(np.int64) * self.num_cells + self.indices[offsets])
+        first = np.ones(len(keys), dtype=bool)
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        return np.bincount(keys[first] // self.num_cells, minlength=population.shape[0])
+
+    def covered(self, individual):
+        mask = np.zeros(self.num_cells, dtype=bool)
+        for candidate in individual:
+            mask[self.cells(candidate)] = True
+        return mask
+
+    def gains(self, covered):
+        uncovered = np.concatenate([[0], np.cumsum(~np.asarray(covered, dtype=bool)[self.indices])])
+        return uncovered[self.indptr[1:]] - uncovered[self.indptr[:-1]]
+
+
+class SharedCoverage:
+    """
+    カバレッジと付随する配列（候補座標など）を共有メモリに載せるコンテキストマネージャ。
+    with文の間だけ有効で、specをワーカープロセスに渡すとattach_coverageで同じ配列を参照できる。
+    """
+    def __init__(self, coverage, **extra):
+        self.kind = type(coverage).__name__
+        self.num_cells = coverage.num_cells
+        self.arrays = dict(coverage.arrays(), **extra)
+        self.blocks = {}
+        self.spec = None
+
+    def __enter__(self):
+        specs = {}
+        try:
+            for key, array in self.arrays.items():
+                self.blocks[key] = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                np.ndarray(array.shape, array.dtype, buffer=self.blocks[key].buf)[...] = array
+                specs[key] = (self.blocks[key].name, array.shape, array.dtype.str)
+        except BaseException:
+            self.__exit__()
+            raise
+        self.spec = (self.kind, self.num_cells, specs)
+        return self
+
+    def __exit__(self, *exc):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+        return False
+
+
+_ATTACHED = []
+
+
+def attach_coverage(spec):
+    """
+    SharedCoverage.specから、共有メモリ上のカバレッジと付随する配列の辞書を返す（ワーカー側）。
+    ブロックは参照が切れないよう_ATTACHEDに保持する。
+    """
+    kind, num_cells, specs = spec
+    kwargs = {"track": False} if sys.version_info >= (3, 13) else {}
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name, **kwargs)
+        _ATTACHED.append(block)
+        arrays[key] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    coverage_cls = {"BitCoverage": BitCoverage, "SparseCoverage": SparseCoverage}[kind]
+    coverage_arrays = {key: arrays.pop(key) for key in list(arrays) if key in ("words", "indptr", "indices")}
+    return coverage_cls.from_arrays(num_cells, **coverage_arrays), arrays
+
+
+def as_coverage(coverage_set, num_cells):
+    """
+    カバレッジ構造をそのまま返す。セル番号の集合のリストが渡された場合はBitCoverageに変換する。
+    """
+    if isinstance(coverage_set, (BitCoverage, SparseCoverage)):
+        return coverage_set
+    return BitCoverage.from_sets(coverage_set, num_cells)
+
+
+def feasible_fraction(coverage, placement, individual):
+    """
+    個体（候補番号のリスト）がカバーするセルのうち、設置可能なセル（placement）の割合を返す。
+    """
+    if len(placement) == 0:
+        return 0.0
+    return float(np.count_nonzero(coverage.covered(individual)[placement]) / len(placement))
+
+
+def coverage_stencil(step_x, step_y, radius):
+    """
+    一様なグリッド上で、半径radius以内に入るセルの相対オフセット (di, dj) を返す。
+    境界上のセルを浮動小数点誤差で取りこぼさないよう、わずかな許容誤差を含める。
+    """
+    ri, rj = int(radius // step_y), int(radius // step_x)
+    di, dj = np.mgrid[-ri:ri + 1, -rj:rj + 1]
+    inside = np.hypot(dj * step_x, di * step_y) <= radius * (1 + 1e-9)
+    return di[inside], dj[inside]
+
+
+def grid_coverage(candidate_cells, grid_w, grid_h, step_x, step_y, radius, chunk_size=4096):
+    """
+    候補セル（行優先のセル番号）ごとに、半径radius以内のセルをステンシルで列挙してSparseCoverageを返す。
+    一時配列が大きくならないよう、候補をchunk_size件ずつ処理する。
+    """
+    di, dj = coverage_stencil(step_x, step_y, radius)
+    candidate_cells = np.asarray(candidate_cells, dtype=np.int64)
+    counts, chunks = [], []
+    for start in range(0, len(candidate_cells), chunk_size):
+        ci, cj = np.divmod(candidate_cells[start:start + chunk_size], grid_w)
+        ii = ci[:, None] + di[None, :]
+        jj = cj[:, None] + dj[None, :]
+        valid = (ii >= 0) & (ii < grid_h) & (jj >= 0) & (jj < grid_w)
+        chunks.append((ii * grid_w + jj)[valid].astype(np.int32))
+        counts.append(valid.sum(axis=1))
+    indptr = np.zeros(len(candidate_cells) + 1, dtype=np.int64)
+    if counts:
+        np.cumsum(np.concatenate(counts), out=indptr[1:])
+    indices = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+    return SparseCoverage(indptr, indices, grid_w * grid_h)
+
+
+def coverage_counts(cells, grid_w, grid_h, step_x, step_y, radius):
+    """
+    指定したセル（ビーコン位置）ごとのカバー範囲を重ね合わせ、各セルを何個のビーコンがカバーしているかを
+    (grid_h, grid_w) の配列で返す。
+    """
+    coverage = grid_coverage(cells, grid_w, grid_h, step_x, step_y, radius)
+    return np.bincount(coverage.indices, minlength=grid_w * grid_h).reshape(grid_h, grid_w)
+
+
+def _fits_bits(num_candidates, num_cells, max_bit_bytes):
+    return num_candidates * max(1, -(-num_cells // 64)) * 8 <= max_bit_bytes
+
+
+def build_coverage(candidate_cells, grid_w, grid_h, step_x, step_y, radius, max_bit_bytes=BIT_COVERAGE_MAX_BYTES):
+    """
+    カバレッジ構造を構築する。ビット行列がmax_bit_bytesに収まる場合はBitCoverageを、
+    収まらない場合はSparseCoverageをそのまま返す。
+    """
+    sparse = grid_coverage(candidate_cells, grid_w, grid_h, step_x, step_y, radius)
+    if _fits_bits(len(sparse), sparse.num_cells, max_bit_bytes):
+        return BitCoverage.from_sparse(sparse)
+    return sparse
+
+
+def update_coverage(coverage, old_cells, candidate_cells, grid_w, grid_h, step_x, step_y, radius,
+                    max_bit_bytes=BIT_COVERAGE_MAX_BYTES):
+    """
+    候補セルold_cellsに対するカバレッジcoverageを、候補セルcandidate_cells用に差分更新する。
+    各候補の行はその候補のセルだけで決まるため、両方に含まれる候補の行は連続する区間ごとにまとめて
+    コピーし、新しく加わった候補の行だけを計算する。どちらの候補セルも昇順であること。
+    build_coverageと同じ種類・同じ内容のカバレッジを返す。
+    戻り値は (カバレッジ, 新しく計算した行数)。
+    """
+    old_cells = np.asarray(old_cells, dtype=np.int64)
+    candidate_cells = np.asarray(candidate_cells, dtype=np.int64)
+    kind = BitCoverage if _fits_bits(len(candidate_cells), grid_w * grid_h, max_bit_bytes) else SparseCoverage
+    if not isinstance(coverage, kind) or len(candidate_cells) == 0:
+        return build_coverage(candidate_cells, grid_w, grid_h, step_x, step_y, radius, max_bit_bytes), len(candidate_cells)
+
+    pos = np.minimum(np.searchsorted(old_cells, candidate_cells), max(0, len(old_cells) - 1))
+    kept = (old_cells[pos] == candidate_cells) if len(old_cells) else np.zeros(len(candidate_cells), dtype=bool)
+    added = grid_coverage(candidate_cells[~kept], grid_w, grid_h, step_x, step_y, radius)
+    if kind is BitCoverage:
+        added = BitCoverage.from_sparse(added)
+
+    # 行の取り出し元を「coverageの行番号」または「len(old_cells) + addedの行番号」で表し、連続区間に分ける。
+    source = np.where(kept, pos, len(old_cells) + np.cumsum(~kept) - 1)
+    breaks = np.flatnonzero((np.diff(source) != 1) | (kept[1:] != kept[:-1])) + 1
+    starts = np.concatenate([[0], breaks])
+    stops = np.concatenate([breaks, [len(source)]])
+    parts = []
+    for start, stop in zip(starts, stops):
+        first, last = source[start], source[stop - 1] + 1
+        if kept[start]:
+            parts.append(coverage.rows(first, last))
+        else:
+            parts.append(added.rows(first - len(old_cells), last - len(old_cells)))
+    return kind.concatenate(parts, grid_w * grid_h), len(added)
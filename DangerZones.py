@@ -0,0 +1,141 @@
+import itertools
+
+import cv2
+import numpy as np
+
+POLYGON_SHIFT = 8  # Fractional bits used when filling polygons with sub-pixel vertices
+_VERSIONS = itertools.count()
+
+
+class DangerZones:
+    """
+    Danger zones as vector shapes in source-image pixel coordinates.
+
+    Each zone is a tuple ('rect', (x0, y0, x1, y1)) with inclusive pixel bounds, or
+    ('polygon', points) with an (N, 2) float array of vertices in continuous coordinates
+    (pixel p spans [p, p + 1)). Zones are rasterized on demand at whatever resolution the
+    consumer needs. `version` is unique per content: it changes on every edit and is shared
+    only with copies, so it can key caches of rasterized masks.
+    """
+    def __init__(self, zones=None):
+        self.zones = list(zones or [])
+        self.version = next(_VERSIONS)
+
+    @staticmethod
+    def rect(x0, y0, x1, y1):
+        x0, x1 = sorted((int(x0), int(x1)))
+        y0, y1 = sorted((int(y0), int(y1)))
+        return ('rect', (x0, y0, x1, y1))
+
+    @staticmethod
+    def polygon(points):
+        return ('polygon', np.asarray(points, dtype=np.float64).reshape(-1, 2))
+
+    @staticmethod
+    def bounds(zone):
+        """Bounding box (x0, y0, x1, y1) of a zone in source pixels; every pixel it covers lies inside."""
+        kind, data = zone
+        if kind == 'rect':
+            return data
+        (x0, y0), (x1, y1) = np.floor(data.min(axis=0)), np.ceil(data.max(axis=0))
+        return int(x0), int(y0), int(x1), int(y1)
+
+    @classmethod
+    def from_mask(cls, mask, offset=(0, 0), scale=(1.0, 1.0)):
+        """
+        Vectorizes the outer contours of a binary mask into polygon zones. `scale` is the (x, y)
+        factor from image to mask pixels, and `offset` shifts the result into source coordinates.
+        """
+        contours, _ = cv2.findContours((mask > 0).astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return cls(cls.polygon((c.reshape(-1, 2) + 0.5) / scale + np.asarray(offset)) for c in contours)
+
+    def copy(self):
+        zones = DangerZones(self.zones)
+        zones.version = self.version
+        return zones
+
+    def __len__(self):
+        return len(self.zones)
+
+    def __iter__(self):
+        return iter(self.zones)
+
+    def __getitem__(self, index):
+        return self.zones[index]
+
+    def changed_zones(self, previous):
+        """Zones that are in exactly one of this set and `previous` (a sequence of zones), by identity."""
+        current_ids, previous_ids = {id(z) for z in self.zones}, {id(z) for z in previous}
+        return ([z for z in self.zones if id(z) not in previous_ids] +
+                [z for z in previous if id(z) not in current_ids])
+
+    def _changed(self):
+        self.version = next(_VERSIONS)
+
+    def add(self, zone, index=None):
+        self.zones.insert(len(self.zones) if index is None else index, zone)
+        self._changed()
+
+    def extend(self, zones):
+        self.zones.extend(zones)
+        self._changed()
+
+    def remove(self, zone):
+        """Removes the given zone object and returns the index it had."""
+        for index, z in enumerate(self.zones):
+            if z is zone:
+                del self.zones[index]
+                self._changed()
+                return index
+        raise ValueError('zone is not in this DangerZones')
+
+    def replace(self, index, zone):
+        """Replaces the zone at index and returns the previous one."""
+        previous, self.zones[index] = self.zones[index], zone
+        self._changed()
+        return previous
+
+    def rasterize(self, x0, y0, scale_x, scale_y, out_w, out_h, window=None):
+        """
+        Returns an (out_h, out_w) boolean mask where output pixel (j, i) samples the source point
+        (x0 + (j + 0.5) * scale_x, y0 + (i + 0.5) * scale_y). With scale = grid step this samples
+        grid-cell centers; with scale = 1 / zoom it renders a viewport. With window=(j0, i0, j1, i1)
+        only that region of the output is rendered, identical to the same slice of the full mask.
+        """
+        j0, i0, j1, i1 = window or (0, 0, out_w, out_h)
+        mask = np.zeros((i1 - i0, j1 - j0), dtype=bool)
+        if not self.zones or mask.size == 0:
+            return mask
+        xs = np.floor(x0 + (np.arange(j0, j1) + 0.5) * scale_x)
+        ys = np.floor(y0 + (np.arange(i0, i1) + 0.5) * scale_y)
+        for kind, data in self.zones:
+            if kind == 'rect':
+                rx0, ry0, rx1, ry1 = data
+                cols = (xs >= rx0) & (xs <= rx1)
+                rows = (ys >= ry0) & (ys <= ry1)
+                if cols.any() and rows.any():
+                    mask[np.ix_(rows, cols)] = True
+            else:
+                self._fill_polygon(mask, data, x0, y0, scale_x, scale_y, out_w, out_h, (j0, i0, j1, i1))
+        return mask
+
+    @staticmethod
+    def _fill_polygon(mask, points, x0, y0, scale_x, scale_y, out_w, out_h, window):
+        """
+        ORs one polygon into `mask`, the `window` region of the output. The polygon is filled on its
+        own bounding box clipped to the full output rather than on the window, because OpenCV's edge
+        walk depends on where a polygon is clipped; this keeps windowed and full renders identical.
+        """
+        j0, i0, j1, i1 = window
+        # Map vertices into output pixel space, where pixel centers sit on integers.
+        fixed = np.round(((points - (x0, y0)) / (scale_x, scale_y) - 0.5) * (1 << POLYGON_SHIFT))
+        (bx0, by0), (bx1, by1) = np.floor(fixed.min(axis=0) / (1 << POLYGON_SHIFT)), np.ceil(fixed.max(axis=0) / (1 << POLYGON_SHIFT))
+        bx0, by0 = max(0, int(bx0) - 1), max(0, int(by0) - 1)
+        bx1, by1 = min(out_w, int(bx1) + 2), min(out_h, int(by1) + 2)
+        if bx0 >= min(bx1, j1) or max(bx0, j0) >= bx1 or by0 >= min(by1, i1) or max(by0, i0) >= by1:
+            return
+        filled = np.zeros((by1 - by0, bx1 - bx0), dtype=np.uint8)
+        shifted = (fixed - (bx0 << POLYGON_SHIFT, by0 << POLYGON_SHIFT)).astype(np.int32)
+        cv2.fillPoly(filled, [shifted], 1, lineType=cv2.LINE_8, shift=POLYGON_SHIFT)
+        cx0, cy0, cx1, cy1 = max(bx0, j0), max(by0, i0), min(bx1, j1), min(by1, i1)
+        mask[cy0 - i0:cy1 - i0, cx0 - j0:cx1 - j0] |= filled[cy0 - by0:cy1 - by0, cx0 - bx0:cx1 - bx0].astype(bool)
@@ -0,0 +1,148 @@
+"""Compact export format for large grids, with a streaming writer and a reference decoder.
+
+The original export (schema version 1) lists every safe cell as an [i, j] pair under
+"safe_grid_coordinates". The compact export (schema version 2) has the same top-level keys
+except that list, which is replaced by one mask of the whole grid:
+
+    "schema_version": 2,
+    "safe_mask": {
+        "shape": [grid_h, grid_w],   # cells are numbered row-major: n = i * grid_w + j
+        "safe_cells": <number of safe cells>,
+        "encoding": "bits" | "rle",
+        "data": "<base64>"
+    }
+
+"bits": one bit per cell, LSB first: cell n is safe when (data[n >> 3] >> (n & 7)) & 1.
+"rle":  lengths of alternating runs of unsafe and safe cells, starting with an unsafe run
+        (which may be empty), each as an unsigned LEB128 varint.
+
+The mask is encoded and written in chunks, so neither the coordinate list nor the whole
+base64 string is ever built in memory.
+"""
+import base64
+import json
+
+import numpy as np
+
+SCHEMA_VERSION = 2
+MASK_ENCODINGS = ('bits', 'rle')
+CHUNK_CELLS = 3 * 8 * 65536  # A whole number of base64 blocks once bit-packed
+CHUNK_RUNS = 65536
+
+
+def safe_mask_header(safe_mask, encoding='bits'):
+    """
+    The "safe_mask" entry for a (grid_h, grid_w) boolean mask. Its "data" is the mask
+    itself and is encoded by write_compact().
+    """
+    if encoding not in MASK_ENCODINGS:
+        raise ValueError(f'Unknown mask encoding: {encoding}')
+    safe_mask = np.asarray(safe_mask, dtype=bool)
+    return {'shape': list(safe_mask.shape), 'safe_cells': int(np.count_nonzero(safe_mask)),
+            'encoding': encoding, 'data': safe_mask}
+
+
+def _bit_chunks(flat):
+    for start in range(0, flat.size, CHUNK_CELLS):
+        yield np.packbits(flat[start:start + CHUNK_CELLS], bitorder='little').tobytes()
+
+
+def _run_lengths(flat):
+    """Lengths of the alternating unsafe/safe runs, starting with an unsafe run."""
+    edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate([[0], edges, [flat.size]])
+    runs = np.diff(bounds)
+    if flat.size and flat[0]:
+        runs = np.concatenate([[0], runs])
+    return runs.astype(np.uint64)
+
+
+def _varints(values):
+    """Unsigned LEB128 encoding of an array of non-negative integers."""
+    sizes = np.ones(values.size, dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35, 42, 49, 56, 63):
+        sizes += values >= np.uint64(1) << np.uint64(shift)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for index in range(int(sizes.max(initial=0))):
+        selected = sizes > index
+        byte = (values[selected] >> np.uint64(7 * index)) & np.uint64(0x7F)
+        more = (sizes[selected] > index + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[selected] + index] = byte | more
+    return out.tobytes()
+
+
+def _rle_chunks(flat):
+    runs = _run_lengths(flat)
+    for start in range(0, runs.size, CHUNK_RUNS):
+        yield _varints(runs[start:start + CHUNK_RUNS])
+
+
+def _base64_chunks(byte_chunks):
+    """Base64-encode a stream of byte chunks, carrying remainders so the pieces concatenate."""
+    carry = b''
+    for chunk in byte_chunks:
+        chunk = carry + chunk
+        cut = len(chunk) - len(chunk) % 3
+        carry = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut]).decode('ascii')
+    if carry:
+        yield base64.b64encode(carry).decode('ascii')
+
+
+def encode_mask(safe_mask, encoding='bits'):
+    """Yield the base64 "data" of a safe mask piece by piece."""
+    flat = np.asarray(safe_mask, dtype=bool).ravel()
+    chunks = _bit_chunks(flat) if encoding == 'bits' else _rle_chunks(flat)
+    return _base64_chunks(chunks)
+
+
+def write_compact(path, export_data):
+    """
+    Write a schema version 2 document. Everything but the mask data is ordinary compact JSON;
+    the mask is streamed into the "data" string chunk by chunk.
+    """
+    mask = export_data['safe_mask']
+    header = {key: value for key, value in export_data.items() if key != 'safe_mask'}
+    mask_header = {key: value for key, value in mask.items() if key != 'data'}
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(header, separators=(',', ':'))[:-1])
+        f.write(',"safe_mask":' + json.dumps(mask_header, separators=(',', ':'))[:-1] + ',"data":"')
+        for chunk in encode_mask(mask['data'], mask['encoding']):
+            f.write(chunk)
+        f.write('"}}')
+
+
+def _decode_varints(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    position = np.arange(data.size) - np.repeat(starts, ends - starts + 1)
+    values = (data & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.add.reduceat(values, starts) if data.size else np.zeros(0, np.uint64)
+
+
+def decode_safe_mask(safe_mask):
+    """Reference decoder: the (grid_h, grid_w) boolean mask of a "safe_mask" entry."""
+    grid_h, grid_w = safe_mask['shape']
+    data = base64.b64decode(safe_mask['data'])
+    if safe_mask['encoding'] == 'bits':
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=grid_h * grid_w, bitorder='little')
+        return bits.astype(bool).reshape(grid_h, grid_w)
+    if safe_mask['encoding'] == 'rle':
+        runs = _decode_varints(data).astype(np.int64)
+        values = np.arange(runs.size) % 2 == 1
+        return np.repeat(values, runs).reshape(grid_h, grid_w)
+    raise ValueError(f'Unknown mask encoding: {safe_mask["encoding"]}')
+
+
+def read_safe_mask(export_data):
+    """The safe-cell mask of an export document of either schema version."""
+    if export_data.get('schema_version', 1) >= 2:
+        return decode_safe_mask(export_data['safe_mask'])
+    grid = export_data['grid_dimensions']
+    mask = np.zeros((grid['height'], grid['width']), dtype=bool)
+    coords = np.asarray(export_data['safe_grid_coordinates'], dtype=np.int64).reshape(-1, 2)
+    mask[coords[:, 0], coords[:, 1]] = True
+    return mask
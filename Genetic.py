@@ -1,5 +1,10 @@
 import numpy as np
 import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from Coverage import SharedCoverage, as_coverage, attach_coverage, feasible_fraction
+from Greedy import GreedySolver
 
 NUM_BEACONS = 3
 POPULATION_SIZE = 50
@@ -7,6 +12,17 @@ NUM_GENERATIONS = 100
 MUTATION_RATE = 0.1
 ELITISM_RATE = 0.1
 SEED = 42
+NUM_ISLANDS = 1
+MIGRATION_INTERVAL = 10
+MIGRATION_SIZE = 2
+GREEDY_SEED_RATE = 0.0
+WARM_START_RATE = 0.2
+PATIENCE = None
+TARGET_COVERAGE = None
+TIME_LIMIT = None
+FITNESS_CACHE_SIZE = 10000
+DEDUPLICATE = False
+MAX_DEDUP_ATTEMPTS = 10
 
 np.random.seed(SEED)
 random.seed(SEED)
@@ -17,71 +33,393 @@ class GeneticAlgorithm:
                  population_size=POPULATION_SIZE,
                  num_generations=NUM_GENERATIONS,
                  mutation_rate=MUTATION_RATE,
-                 elitism_rate=ELITISM_RATE,):
+                 elitism_rate=ELITISM_RATE,
+                 num_islands=NUM_ISLANDS,
+                 migration_interval=MIGRATION_INTERVAL,
+                 migration_size=MIGRATION_SIZE,
+                 seed=SEED,
+                 greedy_seed_rate=GREEDY_SEED_RATE,
+                 warm_start_rate=WARM_START_RATE,
+                 patience=PATIENCE,
+                 target_coverage=TARGET_COVERAGE,
+                 time_limit=TIME_LIMIT,
+                 fitness_cache_size=FITNESS_CACHE_SIZE,
+                 deduplicate=DEDUPLICATE,
+                 callback=None,):
         self.num_beacons = num_beacons
         self.population_size = population_size
         self.num_generations = num_generations
         self.mutation_rate = mutation_rate
         self.elitism_rate = elitism_rate
+        self.num_islands = num_islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.seed = seed
+        self.greedy_seed_rate = greedy_seed_rate
+        self.warm_start_rate = warm_start_rate
+        self.patience = patience
+        self.target_coverage = target_coverage
+        self.time_limit = time_limit
+        self.fitness_cache_size = fitness_cache_size
+        self.deduplicate = deduplicate
+        self.callback = callback
+        self.stats = []
+        self.stop_reason = None
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.counters = {}
+        self._fitness_cache = OrderedDict()
 
-    def _create_individual(self, placement):
+    def _create_individual(self, placement, rng=random):
         """
         個体を生成する。各ビーコンの位置はランダムに決定される。
         """
-        return random.sample(range(placement), self.num_beacons)
+        return rng.sample(range(placement), self.num_beacons)
+
+    def _initial_population(self, placement, seeds=(), rng=random):
+        """
+        初期集団を生成する。seedsは (解, 割合) のリストで、各解について集団のその割合を
+        解そのものと、解の遺伝子を1つだけランダムに入れ替えた個体で埋める。残りはランダムな個体とする。
+        """
+        pop = []
+        for solution, rate in seeds:
+            seed_count = max(1, int(self.population_size * rate))
+            pop.append(list(solution))
+            for _ in range(seed_count - 1):
+                pop.append(self._replace_gene(list(solution), placement, rng))
+        del pop[self.population_size:]
+        while len(pop) < self.population_size:
+            pop.append(self._create_individual(placement, rng))
+        return pop
+
+    def _seeds(self, placement, greedy, initial):
+        """
+        初期集団の種を (解, 割合) のリストで返す。initialは前回の配置（グリッドのセル番号）で、
+        すべて候補に含まれ、ビーコン数と一致する場合だけ種にする（ウォームスタート）。
+        """
+        seeds = []
+        if initial is not None:
+            index = {cell: i for i, cell in enumerate(placement)}
+            warm = list(dict.fromkeys(index[cell] for cell in initial if cell in index))
+            if len(warm) == self.num_beacons:
+                seeds.append((warm, self.warm_start_rate))
+        if greedy is not None:
+            seeds.append((greedy, self.greedy_seed_rate))
+        return seeds
+
+    def _greedy_seed(self, coverage, positions, ble_px):
+        """
+        greedy_seed_rateが正の場合に、初期集団の種となる貪欲法の解を返す。
+        """
+        if self.greedy_seed_rate <= 0:
+            return None
+        greedy = GreedySolver(self.num_beacons).solve(coverage, positions, ble_px)
+        return greedy if len(greedy) == self.num_beacons else None
     
-    def _calculate_fitness(self, individual, coverage_sets, centers, ble_px):
+    def _evaluate_population(self, population, coverage, positions, ble_px):
         """
-        個体の適応度を計算する。カバレッジとビーコン間の距離を考慮する。
+        集団全体の適応度をまとめて計算する。populationは (個体数 × ビーコン数) の候補番号配列、
+        positionsは候補位置の座標配列である。
         """
-        covered = set().union(*[coverage_sets[i] for i in individual])
-        covered = len(covered) / len(centers)
-        points = np.array([centers[i] for i in individual])
-        if len(points) > 1:
-            distances = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
-            np.fill_diagonal(distances, np.inf)
-            penalty = 0 if distances.min() >= ble_px / 4 else 0.5
+        population = np.asarray(population)
+        covered = coverage.count_population(population) / coverage.num_cells
+        if population.shape[1] > 1:
+            points = positions[population]
+            distances = np.linalg.norm(points[:, :, None, :] - points[:, None, :, :], axis=3)
+            distances[:, np.arange(population.shape[1]), np.arange(population.shape[1])] = np.inf
+            penalty = np.where(distances.min(axis=(1, 2)) >= ble_px / 4, 0, 0.5)
         else:
             penalty = 0
         return covered - penalty
     
-    def _crossover(self, parent1, parent2):
+    def _crossover(self, parent1, parent2, placement, rng=random):
         """
-        2つの親個体から子個体を生成する。ランダムに選択された遺伝子を組み合わせる。
+        2つの親個体から子個体を生成する。両親の遺伝子の和集合からランダムに選択する。
+        和集合がnum_beacons個に満たない場合は、含まれていない候補で補い、
+        子個体は常にnum_beacons個の異なる遺伝子を持つ。
         """
         g = list(set(parent1+parent2))
-        random.shuffle(g)
-        return g[:self.num_beacons]
+        rng.shuffle(g)
+        child = g[:self.num_beacons]
+        while len(child) < min(self.num_beacons, placement):
+            gene = rng.randrange(placement)
+            if gene not in child:
+                child.append(gene)
+        return child
     
-    def _mutate(self, individual, placement):
+    def _mutate(self, individual, placement, rng=random):
         """
-        個体に突然変異を適用する。ランダムに選択された遺伝子を変更する。
+        個体に突然変異を適用する。ランダムに選択された遺伝子を、個体に含まれない候補に変更する。
         """
-        if random.random() < self.mutation_rate:
-            individual[random.randrange(len(individual))] = random.randrange(placement)
+        if rng.random() < self.mutation_rate:
+            self._replace_gene(individual, placement, rng)
         return individual
-    
-    def run(self, placement, center, coverage_set, ble_px):
-        pop = [self._create_individual(len(placement)) for _ in range(self.population_size)]
-        best_solution, best_fitness = None, -1
 
-        for _ in range(self.num_generations):
-            scored = [(self._calculate_fitness(individual, coverage_set, center, ble_px), individual) for individual in pop]
-            scored.sort(reverse=True, key=lambda x: x[0])
+    def _replace_gene(self, individual, placement, rng=random):
+        """
+        ランダムに選択された遺伝子を、個体に含まれない候補に置き換える。遺伝子の重複は生じない。
+        """
+        if placement > len(individual):
+            gene = rng.randrange(placement)
+            while gene in individual:
+                gene = rng.randrange(placement)
+            individual[rng.randrange(len(individual))] = gene
+        return individual
+    
+    def _score(self, pop, coverage, positions, ble_px):
+        """
+        集団を評価し、適応度の高い順に並べた (適応度, 個体) のリストを返す。
+        """
+        if self.fitness_cache_size > 0:
+            fitness = self._cached_fitness(pop, coverage, positions, ble_px)
+        else:
+            fitness = self._evaluate_population(pop, coverage, positions, ble_px)
+            self.evaluations += len(pop)
+        order = np.argsort(-fitness, kind="stable")
+        return [(fitness[i], pop[i]) for i in order]
 
-            if scored[0][0] > best_fitness:
-                best_fitness, best_solution = scored[0]
+    def _cached_fitness(self, pop, coverage, positions, ble_px):
+        """
+        適応度をキャッシュ経由で求める。適応度は遺伝子の順序によらないため、ソートした遺伝子の
+        タプルをキーとし、集団内の重複とキャッシュにない個体をまとめて1回だけ評価する。
+        キャッシュはfitness_cache_size件を上限に、最も長く参照されていないものから捨てる（LRU）。
+        """
+        cache = self._fitness_cache
+        fitness = np.empty(len(pop))
+        missing = {}
+        keys = map(tuple, np.sort(np.asarray(pop), axis=1).tolist())
+        for row, key in enumerate(keys):
+            value = cache.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(row)
+            else:
+                cache.move_to_end(key)
+                fitness[row] = value
+                self.cache_hits += 1
 
-            elite_count = int(self.population_size * self.elitism_rate)
-            elite = [individual for _, individual in scored[:elite_count]]
-            new_population = elite[:]
+        if missing:
+            values = self._evaluate_population(list(missing), coverage, positions, ble_px)
+            self.evaluations += len(missing)
+            for (key, rows), value in zip(missing.items(), values):
+                fitness[rows] = value
+                cache[key] = value
+            while len(cache) > self.fitness_cache_size:
+                cache.popitem(last=False)
+        return fitness
 
+    def _breed(self, pop, scored, placement, rng=random):
+        """
+        エリートと子個体から次の世代を作る。deduplicateが有効な場合は、既に集団にある個体と
+        同じ遺伝子の組の子個体を突然変異させ、MAX_DEDUP_ATTEMPTS回まで作り直す。
+        """
+        elite_count = int(self.population_size * self.elitism_rate)
+        if not self.deduplicate:
+            new_population = [individual for _, individual in scored[:elite_count]]
             while len(new_population) < self.population_size:
-                parent1, parent2 = random.choices(pop, k=2)
-                child = self._crossover(parent1, parent2)
-                child = self._mutate(child, len(placement))
+                parent1, parent2 = rng.choices(pop, k=2)
+                child = self._crossover(parent1, parent2, placement, rng)
+                child = self._mutate(child, placement, rng)
                 new_population.append(child)
+            return new_population
+
+        new_population, seen = [], set()
+        for _, individual in scored:
+            if len(new_population) == elite_count:
+                break
+            key = tuple(sorted(individual))
+            if key not in seen:
+                seen.add(key)
+                new_population.append(individual)
+        while len(new_population) < self.population_size:
+            parent1, parent2 = rng.choices(pop, k=2)
+            child = self._crossover(parent1, parent2, placement, rng)
+            child = self._mutate(child, placement, rng)
+            for _ in range(MAX_DEDUP_ATTEMPTS):
+                if tuple(sorted(child)) not in seen:
+                    break
+                child = self._replace_gene(child, placement, rng)
+            seen.add(tuple(sorted(child)))
+            new_population.append(child)
+        return new_population
+
+    def _evolve(self, pop, coverage, positions, ble_px, generations, rng=random, record=None):
+        """
+        集団をgenerations世代だけ進化させ、最終集団を返す。
+        recordは各世代の評価結果（適応度順のリスト）を受け取り、Trueを返すと進化を打ち切る。
+        """
+        for _ in range(generations):
+            scored = self._score(pop, coverage, positions, ble_px)
+            if record is not None and record(scored):
+                break
+            pop = self._breed(pop, scored, len(positions), rng)
+
+        return pop
+
+    def _begin_run(self):
+        self.stats = []
+        self.stop_reason = None
+        self.best_fitness, self.best_generation = -1, None
+        self.best_coverage = None
+        self._best_solution = None
+        self.evaluations = 0
+        self.cache_hits = 0
+        self._fitness_cache = OrderedDict()  # 候補番号は実行ごとに変わるため、キャッシュは実行ごとに作り直す
+        self._started = time.perf_counter()
+
+    def _end_run(self):
+        """
+        実行の計測値をcountersにまとめる。
+        evaluationsは実際に適応度評価した個体数の合計（全島分、キャッシュのヒットは含まない）、
+        best_generationは最良解が見つかった世代。
+        """
+        self._coverage = None
+        elapsed = time.perf_counter() - self._started
+        self.counters = {
+            "evaluations": self.evaluations,
+            "evaluations_per_s": self.evaluations / elapsed if elapsed > 0 else 0.0,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": self._cache_hit_rate(),
+            "generations": len(self.stats),
+            "best_generation": self.best_generation,
+            "elapsed_s": elapsed,
+        }
+
+    def _cache_hit_rate(self):
+        lookups = self.evaluations + self.cache_hits
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def _record(self, best_fitness, best_solution, mean_fitness, placement):
+        """
+        1世代分の統計を記録してコールバックを呼び出し、停止条件を満たした場合はTrueを返す。
+        コールバックがTrueを返した場合も、それまでの最良解を残して探索を打ち切る。
+        適応度は全セルに対する割合から間隔のペナルティを引いた値なので、target_coverageは適応度ではなく、
+        最良解がカバーする設置可能セル（placement）の割合best_coverageと比べる。
+        """
+        generation = len(self.stats)
+        if best_fitness > self.best_fitness:
+            self.best_fitness, self.best_generation = float(best_fitness), generation
+            self._best_solution = list(best_solution)
+            if self.target_coverage is not None:
+                self.best_coverage = feasible_fraction(self._coverage, placement, self._best_solution)
+        self.stats.append({"generation": generation, "best_fitness": self.best_fitness, "mean_fitness": float(mean_fitness),
+                           "best_coverage": self.best_coverage, "cache_hit_rate": self._cache_hit_rate()})
+
+        if self.callback is not None and self.callback(generation, self.best_fitness, float(mean_fitness),
+                                                       [placement[i] for i in self._best_solution]):
+            self.stop_reason = "cancelled"
+        elif self.target_coverage is not None and self.best_coverage >= self.target_coverage:
+            self.stop_reason = "target"
+        elif self.patience is not None and generation - self.best_generation >= self.patience:
+            self.stop_reason = "patience"
+        elif self.time_limit is not None and time.perf_counter() - self._started >= self.time_limit:
+            self.stop_reason = "time"
+        return self.stop_reason is not None
+
+    def run(self, placement, center, coverage_set, ble_px, initial=None):
+        """
+        最適化を実行し、選ばれた候補のセル番号のリストを返す。
+        initialに前回の配置を渡すと、それを初期集団に含めて探索を再開する（ウォームスタート）。
+        乱数は実行ごとにseedで初期化するため、同じ入力とseedからは常に同じ配置が得られる。
+        """
+        if self.num_beacons > len(placement):
+            raise ValueError(f"{self.num_beacons} beacons requested but only {len(placement)} candidate cells are available.")
+        coverage_set = as_coverage(coverage_set, len(center))
+        positions = np.asarray(center, dtype=float)[placement]
+        seeds = self._seeds(placement, self._greedy_seed(coverage_set, positions, ble_px), initial)
+        self._begin_run()
+        self._coverage = coverage_set
+
+        if self.num_islands > 1:
+            self._run_islands(placement, coverage_set, positions, ble_px, seeds)
+        else:
+            rng = random.Random(self.seed)
+            pop = self._initial_population(len(placement), seeds, rng)
+            record = lambda scored: self._record(*_summarize(scored), placement)
+            self._evolve(pop, coverage_set, positions, ble_px, self.num_generations, rng, record)
+
+        self._end_run()
+        return [placement[i] for i in self._best_solution]
+
+    def _run_islands(self, placement, coverage, positions, ble_px, seeds=()):
+        """
+        アイランドモデルで進化させる。各島は別プロセスで独立に進化し、
+        migration_interval世代ごとに上位migration_size個体を隣の島（リング状）へ移住させる。
+        カバレッジと候補座標は共有メモリで一度だけワーカーへ渡す。停止条件は移住のたびに判定する。
+        """
+        rngs = [random.Random(self.seed + island) for island in range(self.num_islands)]
+        pops = [self._initial_population(len(positions), seeds, rng) for rng in rngs]
+
+        with SharedCoverage(coverage, positions=positions) as shared:
+            params = dict(num_beacons=self.num_beacons, population_size=self.population_size,
+                          mutation_rate=self.mutation_rate, elitism_rate=self.elitism_rate,
+                          fitness_cache_size=self.fitness_cache_size, deduplicate=self.deduplicate)
+            initargs = (params, shared.spec, ble_px)
+            with ProcessPoolExecutor(self.num_islands, initializer=_init_island, initargs=initargs) as executor:
+                done = 0
+                while done < self.num_generations and self.stop_reason is None:
+                    generations = min(self.migration_interval, self.num_generations - done)
+                    tasks = [(pop, rng.getstate(), generations) for pop, rng in zip(pops, rngs)]
+                    results = list(executor.map(_evolve_island, tasks))
+                    done += generations
+
+                    for island, (pop, state, _, (evaluations, cache_hits)) in enumerate(results):
+                        pops[island] = pop
+                        rngs[island].setstate(state)
+                        self.evaluations += evaluations
+                        self.cache_hits += cache_hits
+
+                    for generation in zip(*[history for _, _, history, _ in results]):
+                        best_fitness, best_solution, _ = max(generation, key=lambda summary: summary[0])
+                        mean_fitness = np.mean([summary[2] for summary in generation])
+                        if self._record(best_fitness, best_solution, mean_fitness, placement):
+                            break
+
+                    if done < self.num_generations and self.migration_size > 0:
+                        migrants = [pop[:self.migration_size] for pop in pops]
+                        for island in range(self.num_islands):
+                            pops[island][-self.migration_size:] = [list(ind) for ind in migrants[island - 1]]
+
+
+def _summarize(scored):
+    """
+    適応度順のリストから (最良適応度, 最良個体, 平均適応度) を返す。
+    """
+    return float(scored[0][0]), list(scored[0][1]), float(np.mean([fitness for fitness, _ in scored]))
+
+
+_ISLAND = {}
+
+
+def _init_island(params, spec, ble_px):
+    """
+    アイランドワーカーの初期化。共有メモリ上のカバレッジと候補座標を参照する。
+    """
+    coverage, arrays = attach_coverage(spec)
+    _ISLAND.update(
+        ga=GeneticAlgorithm(**params),
+        coverage=coverage,
+        positions=arrays["positions"],
+        ble_px=ble_px,
+    )
+
+
+def _evolve_island(task):
+    """
+    1つの島をgenerations世代進化させ、適応度順に並べた集団と乱数状態、世代ごとの統計、
+    (適応度評価した個体数, キャッシュのヒット数) を返す。適応度のキャッシュはワーカー内で保持され続ける。
+    """
+    pop, state, generations = task
+    rng = random.Random()
+    rng.setstate(state)
+    ga, coverage, positions, ble_px = _ISLAND["ga"], _ISLAND["coverage"], _ISLAND["positions"], _ISLAND["ble_px"]
+    history = []
+    start = ga.evaluations, ga.cache_hits
 
-            pop = new_population
+    def record(scored):
+        history.append(_summarize(scored))
+        return False
 
-        return [placement[i] for i in best_solution]
\ No newline at end of file
+    pop = ga._evolve(pop, coverage, positions, ble_px, generations, rng, record)
+    scored = ga._score(pop, coverage, positions, ble_px)
+    counts = ga.evaluations - start[0], ga.cache_hits - start[1]
+    return [individual for _, individual in scored], rng.getstate(), history, counts
@@ -0,0 +1,55 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+MEMMAP_THRESHOLD_BYTES = 256 * 1024 ** 2
+MAX_CACHED_IMAGES = 4
+
+
+def load_image(path, cache_dir=None, memmap_threshold=MEMMAP_THRESHOLD_BYTES):
+    """
+    Decode an image into the single BGR buffer the application works on, or return None.
+
+    With a cache_dir, images whose decoded size reaches memmap_threshold are stored there as
+    .npy and returned as a read-only memory map, so the pixels are paged in on demand instead of
+    being held in RAM, and reopening the same file skips decoding. Everything downstream (crops,
+    the canvas pyramid, detection) takes views of this buffer and must not write to it.
+    """
+    if cache_dir is None:
+        return cv2.imread(path)
+
+    cached = _cache_path(path, cache_dir)
+    if os.path.exists(cached):
+        os.utime(cached)
+        return np.load(cached, mmap_mode='r')
+
+    image = cv2.imread(path)
+    if image is None or image.nbytes < memmap_threshold:
+        return image
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{cached}.{os.getpid()}.tmp.npy'
+    np.save(tmp, image)
+    os.replace(tmp, cached)
+    del image
+    _evict(cache_dir)
+    return np.load(cached, mmap_mode='r')
+
+
+def _cache_path(path, cache_dir):
+    """Cache entries are keyed on the file's absolute path, size and modification time."""
+    stat = os.stat(path)
+    key = f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return os.path.join(cache_dir, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '.npy')
+
+
+def _evict(cache_dir):
+    """Keeps the MAX_CACHED_IMAGES most recently used decoded images."""
+    entries = sorted((os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.npy')
+                      and '.tmp.' not in name), key=os.path.getmtime, reverse=True)
+    for stale in entries[MAX_CACHED_IMAGES:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass  # Still mapped by another process on some platforms; try again next time
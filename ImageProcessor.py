@@ -1,32 +1,237 @@
+import hashlib
+import os
+import weakref
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 
+from Pipeline import GRID_PITCH
+
+DANGER_HSV_RANGES = (((0, 100, 100), (10, 255, 255)), ((160, 100, 100), (179, 255, 255)))
+CANNY_THRESHOLDS = (100, 200)
+CLOSE_KERNEL_SIZE = 15  # Kernel in pixels when the image scale is unknown
+CLOSE_KERNEL_M = 0.3  # Kernel in meters for multi-scale detection
+MIN_KERNEL_SIZE = 3  # Smallest kernel in pixels, so thin walls still close at coarse scales
+CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+_DIGESTS = {}  # id(array) -> (weakref, digest)
+
+
+def image_digest(image):
+    """
+    画像バッファの内容（形状・型を含む）から16バイトのハッシュを計算する。
+    同じ配列オブジェクトに対する再計算を避けるため、配列ごとに結果を覚えておく（画像は書き換えない前提）。
+    """
+    entry = _DIGESTS.get(id(image))
+    if entry is not None and entry[0]() is image:
+        return entry[1]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{image.shape}{image.dtype.str}'.encode())
+    if image.flags.c_contiguous:
+        h.update(memoryview(image).cast('B'))
+    else:
+        # 切り抜きのビューは行ごとには連続しているので、コピーせずに行単位で読む
+        for row in image:
+            h.update(np.ascontiguousarray(row))
+    digest = h.hexdigest()
+    try:
+        _DIGESTS[id(image)] = (weakref.ref(image, lambda _, key=id(image): _DIGESTS.pop(key, None)), digest)
+    except TypeError:
+        pass
+    return digest
+
+
+def parent_region(image):
+    """
+    imageが別の配列のスライス（切り抜きのビュー）であれば、(親配列, (x0, y0)) を返す。そうでなければNone。
+    """
+    base = image.base
+    if not isinstance(base, np.ndarray) or base.ndim != image.ndim or base.shape == image.shape:
+        return None
+    if base.strides != image.strides or base.shape[2:] != image.shape[2:]:
+        return None
+    offset = image.__array_interface__['data'][0] - base.__array_interface__['data'][0]
+    y0, rest = divmod(offset, base.strides[0])
+    x0, rest = divmod(rest, base.strides[1])
+    if rest or y0 + image.shape[0] > base.shape[0] or x0 + image.shape[1] > base.shape[1]:
+        return None
+    return base, (x0, y0)
+
+
+class DetectionCache:
+    """
+    検出結果のマスクを、画像内容のハッシュと検出パラメータをキーとして保持するキャッシュ。
+    メモリ上ではmax_bytesを上限としたLRUで管理し、directoryを指定した場合は圧縮した.npzとしてディスクにも保存する。
+    """
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name + '.npz')
+
+    def get(self, key):
+        mask = self._entries.get(key)
+        if mask is not None:
+            self._entries.move_to_end(key)
+        elif self.directory is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as data:
+                mask = data['mask']
+            self._remember(key, mask)
+        if mask is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return mask
+
+    def peek(self, key):
+        """統計を更新せず、メモリ上にある場合のみマスクを返す。"""
+        return self._entries.get(key)
+
+    def put(self, key, mask, persist=True):
+        self._remember(key, mask)
+        if persist and self.directory is not None:
+            path = self._path(key)
+            tmp = f'{path}.{os.getpid()}.tmp.npz'
+            np.savez_compressed(tmp, mask=mask)
+            os.replace(tmp, path)
+        return mask
+
+    def _remember(self, key, mask):
+        mask.flags.writeable = False  # キャッシュ内のマスクは共有されるので読み取り専用にする
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = mask
+        self._bytes += mask.nbytes
+        while len(self._entries) > 1 and self._bytes > self.max_bytes:
+            self._bytes -= self._entries.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
 class ImageProcessor:
-    @staticmethod
-    def detect_danger_zones(cv_img):
+    """
+    cell_pixelsを指定すると、ppm（1メートルあたりのピクセル数）が与えられた検出を縮小画像で行う。
+    縮小率はグリッドの1セルがおよそcell_pixelsピクセルになるように決め、カーネルの大きさはメートル単位で換算する。
+    このとき返すマスクは縮小後の解像度であり、元画像との倍率はマスクと画像の形状の比から求める。
+    """
+    def __init__(self, cache=None, cell_pixels=None):
+        self.cache = cache
+        self.cell_pixels = cell_pixels
+
+    def working_scale(self, ppm):
+        """
+        検出を行う解像度の元画像に対する倍率を返す。縮小しない場合は1.0である。
+        """
+        if self.cell_pixels is None or ppm is None:
+            return 1.0
+        return min(1.0, self.cell_pixels / (min(ppm) * GRID_PITCH))
+
+    def _kernel_size(self, ppm, scale):
+        """
+        モルフォロジー演算のカーネルの大きさ（奇数ピクセル）を返す。
+        """
+        if self.cell_pixels is None or ppm is None:
+            return CLOSE_KERNEL_SIZE
+        return max(MIN_KERNEL_SIZE, int(round(CLOSE_KERNEL_M * min(ppm) * scale))) | 1
+
+    def _detect(self, kind, params, detect, cv_img, ppm, stages=None):
+        """
+        必要なら画像を縮小してから、キャッシュを引いて検出を行う。
+        stagesはdetectと同じ結果になる (画素ごとに独立な前段, 後段(マスク, カーネル)) の組で、
+        縮小しない場合は前段の結果を_pixel_maskで切り抜き元と共有する。
+        """
+        scale = self.working_scale(ppm)
+        kernel = self._kernel_size(ppm, scale)
+        run = lambda image: detect(image, kernel)
+        if scale < 1.0:
+            h, w = cv_img.shape[:2]
+            size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+            run = lambda image: detect(cv2.resize(image, size, interpolation=cv2.INTER_AREA), kernel)
+        elif stages is not None and self.cache is not None:
+            pixelwise, finish = stages
+            run = lambda image: finish(self._pixel_mask(kind, params, pixelwise, image), kernel)
+        return self._cached(kind, params + (kernel, scale), run, cv_img)
+
+    def _cached(self, kind, params, detect, cv_img):
+        """
+        キャッシュを引いてから検出を行う。キャッシュには、その画像そのものに対する検出結果だけを入れる。
+        """
+        if self.cache is None:
+            return detect(cv_img)
+        key = (kind, params, image_digest(cv_img))
+        mask = self.cache.get(key)
+        if mask is not None:
+            return mask
+        return self.cache.put(key, detect(cv_img))
+
+    def _pixel_mask(self, kind, params, pixelwise, cv_img):
+        """
+        画素ごとに独立な前段の検出（色の閾値処理など）を行う。切り抜きに対する結果は切り抜き元の結果の
+        同じ範囲と一致するため、切り抜き元の前段のマスクがメモリ上にあれば、それを切り出して使う。
+        モルフォロジー演算などの後段は切り抜きの外側の画素に依存するので、常に切り抜き自体に対して行う。
+        """
+        key = (kind + '_pixels', params, image_digest(cv_img))
+        mask = self.cache.peek(key)
+        if mask is not None:
+            return mask
+        parent = parent_region(cv_img)
+        if parent is not None:
+            base, (x0, y0) = parent
+            parent_mask = self.cache.peek((kind + '_pixels', params, image_digest(base)))
+            if parent_mask is not None:
+                h, w = cv_img.shape[:2]
+                return self.cache.put(key, parent_mask[y0:y0 + h, x0:x0 + w], persist=False)
+        return self.cache.put(key, pixelwise(cv_img), persist=False)
+
+    def detect_danger_zones(self, cv_img, ppm=None):
         """
         画像内の赤色の領域を「危険区域」として検出し、その部分を白で示したマスク画像を返す。
         """
-        hsv = cv2.cvtColor(cv_img, cv2.COLOR_BGR2HSV)
-        lower1, upper1 = np.array([0, 100, 100]), np.array([10, 255, 255])
-        lower2, upper2 = np.array([160, 100, 100]), np.array([179, 255, 255])
-        mask1 = cv2.inRange(hsv, lower1, upper1)
-        mask2 = cv2.inRange(hsv, lower2, upper2)
-        mask = cv2.bitwise_or(mask1, mask2)
-        return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((15, 15), np.uint8))
-    
-    @staticmethod
-    def detect_building_mask(cv_img):
+        return self._detect('danger', (DANGER_HSV_RANGES,), self._danger_mask, cv_img, ppm,
+                            stages=(self._red_mask, self._close))
+
+    def detect_building_mask(self, cv_img, ppm=None):
         """
         画像内の建物を検出し、その部分を白で示したマスク画像を返す。
+        最大の輪郭は画像全体に依存するため、切り抜き元のマスクは流用しない。
         """
+        return self._detect('building', (CANNY_THRESHOLDS,), self._building_mask, cv_img, ppm)
+
+    @staticmethod
+    def _danger_mask(cv_img, kernel_size=CLOSE_KERNEL_SIZE):
+        return ImageProcessor._close(ImageProcessor._red_mask(cv_img), kernel_size)
+
+    @staticmethod
+    def _red_mask(cv_img):
+        hsv = cv2.cvtColor(cv_img, cv2.COLOR_BGR2HSV)
+        mask = np.zeros(cv_img.shape[:2], np.uint8)
+        for lower, upper in DANGER_HSV_RANGES:
+            mask = cv2.bitwise_or(mask, cv2.inRange(hsv, np.array(lower), np.array(upper)))
+        return mask
+
+    @staticmethod
+    def _close(mask, kernel_size=CLOSE_KERNEL_SIZE):
+        return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((kernel_size, kernel_size), np.uint8))
+
+    @staticmethod
+    def _building_mask(cv_img, kernel_size=CLOSE_KERNEL_SIZE):
         gray = cv2.cvtColor(cv_img, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 100, 200)
-        kernel = np.ones((15, 15), np.uint8)
+        edges = cv2.Canny(gray, *CANNY_THRESHOLDS)
+        kernel = np.ones((kernel_size, kernel_size), np.uint8)
         closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
         contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         mask = np.zeros_like(gray)
         if contours:
             c = max(contours, key=cv2.contourArea)
             cv2.drawContours(mask, [c], -1, 255, thickness=-1)
-        return mask
\ No newline at end of file
+        return mask
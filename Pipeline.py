@@ -0,0 +1,338 @@
+import json
+import numpy as np
+from Coverage import BitCoverage, SparseCoverage, feasible_fraction, update_coverage
+from DangerZones import DangerZones
+from ExportFormat import SCHEMA_VERSION, safe_mask_header, write_compact
+from Profiler import Profiler
+
+COVERAGE = 5
+GRID_PITCH = 0.5
+ESTIMATION_STAGES = ('building_mask', 'danger_detection', 'feasibility', 'coverage', 'repair', 'solver')
+INCREMENTAL_MAX_FRACTION = 0.5  # Edits touching more of the grid than this re-rasterize it whole
+
+
+class EstimationCancelled(Exception):
+    """Raised when an estimation is cancelled before the solver has produced a placement."""
+
+
+def make_grid(image_shape, real_w, real_h):
+    """
+    Return (ppm_x, ppm_y, grid_w, grid_h, target_centers) for an image of the given real size in meters.
+    target_centers is a (grid_h * grid_w, 2) array of cell-center pixels in row-major cell order.
+    """
+    h, w = image_shape[:2]
+    ppm_x, ppm_y = w / real_w, h / real_h
+    step_x, step_y = ppm_x * GRID_PITCH, ppm_y * GRID_PITCH
+    grid_w, grid_h = int(real_w / GRID_PITCH), int(real_h / GRID_PITCH)
+    xs, ys = np.meshgrid(np.arange(grid_w) * step_x + step_x / 2, np.arange(grid_h) * step_y + step_y / 2)
+    target_centers = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    return ppm_x, ppm_y, grid_w, grid_h, target_centers
+
+
+def danger_grid(danger_zones, offset, grid_size, ppm, window=None):
+    """
+    Rasterize danger zones at grid resolution: a (grid_h, grid_w) boolean mask sampled at the
+    cell centers. `offset` is the (x, y) of the image within the zones' source coordinates.
+    With window=(j0, i0, j1, i1) only those cells are rasterized.
+    """
+    grid_w, grid_h = grid_size
+    return danger_zones.rasterize(offset[0], offset[1], ppm[0] * GRID_PITCH, ppm[1] * GRID_PITCH, grid_w, grid_h,
+                                  window)
+
+
+def zone_cells(zones, offset, grid_size, ppm):
+    """The (j0, i0, j1, i1) window of grid cells whose centers the given zones can cover, or None."""
+    if not zones:
+        return None
+    grid_w, grid_h = grid_size
+    step_x, step_y = ppm[0] * GRID_PITCH, ppm[1] * GRID_PITCH
+    ox, oy = offset
+    bounds = np.array([DangerZones.bounds(zone) for zone in zones], dtype=float) - (ox, oy, ox, oy)
+    x0, y0 = bounds[:, :2].min(axis=0)
+    x1, y1 = bounds[:, 2:].max(axis=0) + 1
+    # One cell of slack on each side absorbs the floor() in the center sampling.
+    j0, i0 = max(0, int(x0 // step_x) - 1), max(0, int(y0 // step_y) - 1)
+    j1, i1 = min(grid_w, int(x1 // step_x) + 2), min(grid_h, int(y1 // step_y) + 2)
+    return (j0, i0, j1, i1) if j0 < j1 and i0 < i1 else None
+
+
+def cells_at(points, grid_size, ppm):
+    """Row-major indices of the grid cells containing the given (x, y) pixel points, clipped to the grid."""
+    grid_w, grid_h = grid_size
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    cols = np.clip((points[:, 0] // (ppm[0] * GRID_PITCH)).astype(np.intp), 0, grid_w - 1)
+    rows = np.clip((points[:, 1] // (ppm[1] * GRID_PITCH)).astype(np.intp), 0, grid_h - 1)
+    return (rows * grid_w + cols).tolist()
+
+
+def repair_placement(beacon_indices, placements, target_centers):
+    """
+    Make a previous placement feasible for a warm start: beacons that are no longer candidates
+    (or are duplicates) move to the nearest free candidate. Returns (cells, number moved).
+    """
+    candidates = np.asarray(placements)
+    feasible = set(placements)
+    cells, taken = list(beacon_indices), set()
+    for k, cell in enumerate(cells):
+        if cell in feasible and cell not in taken:
+            taken.add(cell)
+        else:
+            cells[k] = None
+
+    moved = 0
+    for k, cell in enumerate(cells):
+        if cell is not None:
+            continue
+        origin = target_centers[min(beacon_indices[k], len(target_centers) - 1)]
+        distances = np.linalg.norm(target_centers[candidates] - origin, axis=1)
+        for nearest in np.argsort(distances, kind='stable'):
+            candidate = int(candidates[nearest])
+            if candidate not in taken:
+                taken.add(candidate)
+                cells[k] = candidate
+                moved += 1
+                break
+    return [cell for cell in cells if cell is not None], moved
+
+
+def mask_scale(mask, image_shape):
+    """The (x, y) factor from image pixels to mask pixels; detection may run on a downscaled image."""
+    return mask.shape[1] / image_shape[1], mask.shape[0] / image_shape[0]
+
+
+def sample_cells(mask, target_centers, grid_size, scale=(1.0, 1.0)):
+    """Gather a mask at the cell centers into a (grid_h, grid_w) boolean mask. `scale` maps image to mask pixels."""
+    grid_w, grid_h = grid_size
+    cols = np.minimum((target_centers[:, 0] * scale[0]).astype(np.intp), mask.shape[1] - 1)
+    rows = np.minimum((target_centers[:, 1] * scale[1]).astype(np.intp), mask.shape[0] - 1)
+    return (mask[rows, cols] > 0).reshape(grid_h, grid_w)
+
+
+class GridMasks:
+    """
+    Building and danger masks at grid resolution and the coverage of the feasible candidates,
+    each recomputed only when, and only where, its inputs change.
+
+    The building mask depends on the image and the grid, the danger mask on the zones, the image
+    offset and the grid. After a zone edit only the cells the added or removed zones can reach
+    are re-rasterized, and coverage rows are computed only for candidates that were not
+    candidates before. Entries are replaced as whole (key, value) tuples, so a worker thread can
+    fill the cache while the UI thread reads it.
+    """
+    def __init__(self):
+        self._building = (None, None)
+        self._danger = (None, None)
+        self._coverage = (None, None)
+
+    def building(self, cv_img, target_centers, grid_size, ppm, image_processor):
+        key, cells = self._building
+        if key is None or key[0] is not cv_img or key[1] is not target_centers:
+            mask = image_processor.detect_building_mask(cv_img, ppm)
+            cells = sample_cells(mask, target_centers, grid_size, mask_scale(mask, cv_img.shape))
+            self._building = ((cv_img, target_centers), cells)
+        return cells
+
+    def danger(self, danger_zones, offset, target_centers, grid_size, ppm):
+        key, cells = self._danger
+        same_grid = key is not None and key[1] == tuple(offset) and key[2] is target_centers
+        if same_grid and key[0] == danger_zones.version:
+            return cells
+
+        if not same_grid:
+            cells = danger_grid(danger_zones, offset, grid_size, ppm)
+        else:
+            # Only cells an added or removed zone can reach may change; None means no such cell.
+            window = zone_cells(danger_zones.changed_zones(key[3]), offset, grid_size, ppm)
+            if window is not None:
+                j0, i0, j1, i1 = window
+                if (j1 - j0) * (i1 - i0) <= INCREMENTAL_MAX_FRACTION * cells.size:
+                    cells = cells.copy()
+                    cells[i0:i1, j0:j1] = danger_grid(danger_zones, offset, grid_size, ppm, window)
+                else:
+                    cells = danger_grid(danger_zones, offset, grid_size, ppm)
+        self._danger = ((danger_zones.version, tuple(offset), target_centers, tuple(danger_zones)), cells)
+        return cells
+
+    def coverage(self, placements, target_centers, grid_size, ppm, ble_px):
+        """Coverage for the candidate cells `placements` (ascending); returns (coverage, rows computed)."""
+        key, value = self._coverage
+        grid_w, grid_h = grid_size
+        step_x, step_y = ppm[0] * GRID_PITCH, ppm[1] * GRID_PITCH
+        if key is not None and key[0] is target_centers and key[1] == ble_px:
+            previous_cells, previous = value
+        else:
+            previous_cells, previous = np.zeros(0, dtype=np.int64), None
+        cells = np.asarray(placements, dtype=np.int64)
+        coverage, computed = update_coverage(previous, previous_cells, cells, grid_w, grid_h, step_x, step_y, ble_px)
+        self._coverage = ((target_centers, ble_px), (cells, coverage))
+        return coverage, computed
+
+    def snapshot(self, cv_img, danger_zones, offset, target_centers):
+        """
+        The cached entries that are valid for the given state, as a dict of plain values and
+        arrays (see restore()). Entries computed for another image, grid or zone set are left out.
+        """
+        snapshot = {}
+        key, cells = self._building
+        if key is not None and key[0] is cv_img and key[1] is target_centers:
+            snapshot['building_cells'] = cells
+        key, cells = self._danger
+        if key is not None and key[0] == danger_zones.version and key[1] == tuple(offset) and key[2] is target_centers:
+            snapshot['danger_cells'] = cells
+        key, value = self._coverage
+        if key is not None and key[0] is target_centers:
+            cells, coverage = value
+            snapshot.update(coverage_ble_px=key[1], coverage_cells=cells, coverage_kind=type(coverage).__name__,
+                            coverage_num_cells=coverage.num_cells, coverage_arrays=coverage.arrays())
+        return snapshot
+
+    def restore(self, snapshot, cv_img, danger_zones, offset, target_centers):
+        """Fills the cache from snapshot() output, keyed on the given (newly loaded) state objects."""
+        if 'building_cells' in snapshot:
+            self._building = ((cv_img, target_centers), snapshot['building_cells'])
+        if 'danger_cells' in snapshot:
+            self._danger = ((danger_zones.version, tuple(offset), target_centers, tuple(danger_zones)),
+                            snapshot['danger_cells'])
+        if 'coverage_cells' in snapshot:
+            coverage_cls = {'BitCoverage': BitCoverage, 'SparseCoverage': SparseCoverage}[snapshot['coverage_kind']]
+            coverage = coverage_cls.from_arrays(snapshot['coverage_num_cells'], **snapshot['coverage_arrays'])
+            self._coverage = ((target_centers, snapshot['coverage_ble_px']), (snapshot['coverage_cells'], coverage))
+
+
+def run_estimation(cv_img, danger_zones, target_centers, grid_size, ppm, image_processor, solver,
+                   offset=(0, 0), grid_masks=None, report=None, cancelled=None, on_generation=None, profiler=None,
+                   initial=None):
+    """
+    Run mask detection, candidate filtering, coverage construction and the solver.
+
+    `danger_zones` is a DangerZones in source coordinates, with cv_img placed at `offset`;
+    when it is empty, red areas are detected and vectorized instead. Pass the caller's
+    GridMasks as `grid_masks` to reuse masks and coverage from earlier runs; after a small
+    edit only the touched cells and candidates are recomputed. `initial` is a previous placement
+    (grid cell indices) to warm-start the solver from; beacons that are no longer feasible are
+    first moved to the nearest free candidate. This touches no UI
+    state, so it can run on a worker thread. `report` receives status messages, `cancelled`
+    is polled between stages, and `on_generation` is installed as the solver's
+    per-generation callback for the duration of the run (returning True stops it). Each stage
+    is recorded as a span in `profiler`; see ESTIMATION_STAGES. The result's 'coverage' is
+    the summary that build_export records; see coverage_summary().
+    """
+    report = report or (lambda message: None)
+    grid_masks = grid_masks or GridMasks()
+    profiler = profiler or Profiler()
+    cancelled = cancelled or (lambda: False)
+    grid_w, grid_h = grid_size
+    ppm_x, ppm_y = ppm
+
+    report('Detecting building...')
+    with profiler.span('building_mask'):
+        building_cells = grid_masks.building(cv_img, target_centers, grid_size, ppm, image_processor)
+    if not danger_zones:
+        report('Detecting danger zones...')
+        with profiler.span('danger_detection'):
+            mask = image_processor.detect_danger_zones(cv_img, ppm)
+            danger_zones = DangerZones.from_mask(mask, offset, mask_scale(mask, cv_img.shape))
+    if cancelled():
+        raise EstimationCancelled
+
+    with profiler.span('feasibility') as details:
+        danger_cells = grid_masks.danger(danger_zones, offset, target_centers, grid_size, ppm)
+        feasible_mask = building_cells & ~danger_cells
+        placements = np.flatnonzero(feasible_mask).tolist()
+        details['candidates'] = len(placements)
+    if not placements:
+        raise ValueError('No valid placement locations found in the building mask.')
+
+    report('Building coverage...')
+    ble_px = COVERAGE * ppm_x
+    with profiler.span('coverage') as details:
+        coverage, details['rows_computed'] = grid_masks.coverage(placements, target_centers, grid_size, ppm, ble_px)
+        details['kind'] = type(coverage).__name__
+    if cancelled():
+        raise EstimationCancelled
+
+    moved = 0
+    if initial:
+        with profiler.span('repair') as details:
+            initial, moved = repair_placement(initial, placements, target_centers)
+            details['moved'] = moved
+
+    report('Running solver...')
+    has_callback = hasattr(solver, 'callback')
+    if has_callback:
+        previous_callback, solver.callback = solver.callback, on_generation
+    try:
+        with profiler.span('solver', solver=type(solver).__name__) as details:
+            if initial:
+                beacon_indices = solver.run(placements, target_centers, coverage, ble_px, initial=initial)
+            else:
+                beacon_indices = solver.run(placements, target_centers, coverage, ble_px)
+            details.update(getattr(solver, 'counters', {}))
+    finally:
+        if has_callback:
+            solver.callback = previous_callback
+
+    return {
+        'feasible_mask': feasible_mask,
+        'danger_zones': danger_zones,
+        'danger_grid': danger_cells,
+        'beacon_indices': beacon_indices,
+        'stop_reason': getattr(solver, 'stop_reason', None),
+        'moved_beacons': moved,
+        'coverage': coverage_summary(solver, coverage, placements, beacon_indices),
+    }
+
+
+def coverage_summary(solver, coverage, placements, beacon_indices):
+    """
+    Fraction of the feasible cells covered by the placement. A BeaconCountSearch also
+    reports its target, the chosen beacon count and the coverage-versus-k curve.
+    """
+    candidates = np.searchsorted(placements, beacon_indices)  # placements come sorted from flatnonzero
+    summary = {'feasible_fraction': feasible_fraction(coverage, placements, candidates)}
+    if getattr(solver, 'curve', None):
+        summary.update(target=solver.target_coverage, reached=solver.reached,
+                       num_beacons=solver.num_beacons, curve=solver.curve)
+    return summary
+
+
+def build_export(image_shape, danger_cells, target_centers, grid_size, ppm, real_size, beacon_indices, coverage=None,
+                 mask_encoding=None):
+    """
+    Build the JSON document consumed by the M5Stack side. `danger_cells` comes from danger_grid().
+    `coverage` is the estimation's coverage_summary(); when given it is recorded under "coverage".
+    With a `mask_encoding` ('bits' or 'rle') the safe cells are exported as one encoded mask in
+    the compact schema (see ExportFormat) instead of a list of coordinates.
+    """
+    h, w = image_shape[:2]
+    grid_w, grid_h = grid_size
+
+    parent_devices = []
+    for idx in beacon_indices:
+        i, j = divmod(idx, grid_w)
+        px, py = target_centers[idx]
+        parent_devices.append({"grid_coords": [i, j], "pixel_coords": [int(px), int(py)]})
+
+    export = {
+        "real_world_dimensions": {"width_m": float(real_size[0]), "height_m": float(real_size[1])},
+        "pixel_dimensions": {"width_px": w, "height_px": h},
+        "pixels_per_meter": {"x": ppm[0], "y": ppm[1]},
+        "grid_dimensions": {"width": grid_w, "height": grid_h},
+        "parent_devices": parent_devices,
+    }
+    if mask_encoding is None:
+        export["safe_grid_coordinates"] = np.argwhere(~danger_cells).tolist()
+    else:
+        export = {"schema_version": SCHEMA_VERSION, **export, "safe_mask": safe_mask_header(~danger_cells, mask_encoding)}
+    if coverage is not None:
+        export["coverage"] = coverage
+    return export
+
+
+def write_json(path, export_data):
+    """Write an export document; compact ones are streamed by ExportFormat.write_compact()."""
+    if 'safe_mask' in export_data:
+        write_compact(path, export_data)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(export_data, f, indent=4)
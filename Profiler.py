@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+MAX_EVENTS = 100000
+MEMORY_SAMPLE_INTERVAL_S = 0.1
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read cheaply."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # Only the peak is available here; it is still a useful upper bound.
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    return None
+
+
+class Profiler:
+    """
+    Records timing spans and counter samples from any thread into a bounded buffer.
+
+    Spans are cheap enough to leave on permanently; `last()` feeds the status-bar summaries and
+    `write_chrome_trace()` exports everything recorded so far for chrome://tracing or Perfetto.
+    """
+    def __init__(self, max_events=MAX_EVENTS):
+        self.events = deque(maxlen=max_events)
+        self._origin = time.perf_counter()
+
+    def _now_us(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    @contextmanager
+    def span(self, name, **args):
+        start = self._now_us()
+        try:
+            yield args  # Callers may add result details to args inside the span
+        finally:
+            self.events.append({'name': name, 'ph': 'X', 'ts': start, 'dur': self._now_us() - start,
+                                'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+
+    def counter(self, name, **values):
+        self.events.append({'name': name, 'ph': 'C', 'ts': self._now_us(), 'pid': os.getpid(),
+                            'tid': threading.get_ident(), 'args': values})
+
+    def last(self, name, since=None):
+        """The most recent completed span with this name (started at or after `since` µs), or None."""
+        span = next((e for e in reversed(self.events) if e['ph'] == 'X' and e['name'] == name), None)
+        return None if span is None or (since is not None and span['ts'] < since) else span
+
+    def durations(self, names, since=None):
+        """{name: seconds} of the most recent span for each name that has one."""
+        spans = {name: self.last(name, since) for name in names}
+        return {name: span['dur'] / 1e6 for name, span in spans.items() if span is not None}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+
+
+class MemorySampler:
+    """Samples RSS on a background thread while active, recording counters and the peak."""
+    def __init__(self, profiler, interval=MEMORY_SAMPLE_INTERVAL_S):
+        self.profiler = profiler
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+            self.profiler.counter('memory', rss_mb=rss / 1024 ** 2)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
@@ -0,0 +1,171 @@
+"""Project files: a site's editing state and cached intermediate results in one .npz container.
+
+A project holds a reference to the source image (its path and a digest of the file), the
+crop rectangle and undo history, the danger zones, the grid, the last placement with its
+coverage summary, and GridMasks' cached building mask, danger mask and candidate coverage.
+A reopened project can be re-run or exported without detection or coverage construction.
+The image itself is not stored; if it has changed since saving, the cached masks are dropped
+and recomputed on the next run.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from DangerZones import DangerZones
+from ImageLoader import load_image
+
+PROJECT_FORMAT = 'ochimamo-project'
+PROJECT_VERSION = 1
+MASK_ARRAYS = ('building_cells', 'danger_cells', 'coverage_cells')
+
+
+def file_digest(path, chunk_size=1024 ** 2):
+    """BLAKE2b digest of a file's bytes."""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_project(path, state):
+    """Writes the project of `state` (an AppState with an image loaded) to `path`."""
+    if state.source_img is None or state.image_path is None:
+        raise ValueError('Open an image before saving a project.')
+
+    # Zones are referenced by identity from both the zone list and the undo history,
+    # so each one is stored once and referred to by its index.
+    arrays, zones, zone_index = {}, [], {}
+
+    def zone_ref(zone):
+        if id(zone) not in zone_index:
+            zone_index[id(zone)] = len(zones)
+            kind, data = zone
+            if kind == 'rect':
+                zones.append({'kind': 'rect', 'bounds': [int(v) for v in data]})
+            else:
+                arrays[f'zone_{len(zones)}'] = data
+                zones.append({'kind': 'polygon'})
+        return zone_index[id(zone)]
+
+    history = []
+    for command in state.history:
+        if command['kind'] == 'crop':
+            history.append({'kind': 'crop', 'rect': [int(v) for v in command['rect']]})
+        elif command['action'] == 'detect':
+            history.append({'kind': 'danger', 'action': 'detect', 'zones': [zone_ref(zone) for zone in command['zones']]})
+        else:
+            history.append({'kind': 'danger', 'action': command['action'], 'index': command.get('index'),
+                            'zone': zone_ref(command['zone'])})
+
+    project = {
+        'format': PROJECT_FORMAT,
+        'version': PROJECT_VERSION,
+        'image': {'path': os.path.abspath(state.image_path), 'digest': file_digest(state.image_path),
+                  'shape': list(state.source_img.shape)},
+        'crop_rect': [int(v) for v in state.crop_rect],
+        'danger_zones': [zone_ref(zone) for zone in state.danger_zones],
+        'zones': zones,
+        'history': history,
+        'grid': None,
+        'masks': None,
+        'beacon_indices': [int(i) for i in state.beacon_indices],
+        'coverage': state.coverage,
+    }
+
+    if state.target_centers is not None:
+        project['grid'] = {'ppm': [state.ppm_x, state.ppm_y], 'size': [state.grid_w, state.grid_h],
+                           'origin': [int(v) for v in state.grid_origin],
+                           'real_size': list(state.real_size) if state.real_size else None}
+        arrays['target_centers'] = state.target_centers
+        if state.feasible_mask is not None:
+            arrays['feasible_mask'] = state.feasible_mask
+        # Bring the danger mask up to date (incremental after zone edits) so it is saved too.
+        state.grid_masks.danger(state.danger_zones, state.crop_rect[:2], state.target_centers,
+                                (state.grid_w, state.grid_h), (state.ppm_x, state.ppm_y))
+        snapshot = state.grid_masks.snapshot(state.cv_img, state.danger_zones, state.crop_rect[:2], state.target_centers)
+        for key in MASK_ARRAYS:
+            if key in snapshot:
+                arrays[f'masks_{key}'] = snapshot.pop(key)
+        for key, array in snapshot.pop('coverage_arrays', {}).items():
+            arrays[f'coverage_{key}'] = array
+        project['masks'] = snapshot
+
+    arrays['project'] = np.frombuffer(json.dumps(project).encode('utf-8'), dtype=np.uint8)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_project(path, state, image_cache_dir=None, locate_image=None):
+    """
+    Replaces the contents of `state` with the project at `path` and returns whether the cached
+    masks were restored (False when the image file changed since the project was saved).
+
+    When the image is no longer at its saved path, `locate_image(saved_path)` is asked for the
+    new one (return None to give up). Raises ValueError if the project cannot be opened.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        project = json.loads(arrays.pop('project').tobytes().decode('utf-8'))
+    except (OSError, ValueError, KeyError) as e:
+        raise ValueError(f'Not a project file: {path} ({e})')
+    if project.get('format') != PROJECT_FORMAT:
+        raise ValueError(f'Not a project file: {path}')
+    if project['version'] > PROJECT_VERSION:
+        raise ValueError('The project was saved by a newer version of this application.')
+
+    image = project['image']
+    image_path = image['path']
+    if not os.path.exists(image_path) and locate_image is not None:
+        image_path = locate_image(image_path)
+    if not image_path or not os.path.exists(image_path):
+        raise ValueError(f'Image not found: {image["path"]}')
+    source_img = load_image(image_path, image_cache_dir)
+    if source_img is None:
+        raise ValueError(f'Could not read image: {image_path}')
+    if list(source_img.shape) != image['shape']:
+        raise ValueError('The image has a different size than when the project was saved.')
+    same_image = file_digest(image_path) == image['digest']
+
+    zones = [DangerZones.rect(*zone['bounds']) if zone['kind'] == 'rect' else DangerZones.polygon(arrays[f'zone_{n}'])
+             for n, zone in enumerate(project['zones'])]
+
+    state.reset()
+    state.source_img, state.image_path = source_img, image_path
+    state.set_crop_rect(tuple(project['crop_rect']))
+    state.danger_zones = DangerZones(zones[n] for n in project['danger_zones'])
+    for command in project['history']:
+        if command['kind'] == 'crop':
+            state.history.append({'kind': 'crop', 'rect': tuple(command['rect'])})
+            continue
+        if command['action'] == 'detect':
+            state.history.append({'kind': 'danger', 'action': 'detect', 'zones': [zones[n] for n in command['zones']]})
+            continue
+        restored = {'kind': 'danger', 'action': command['action'], 'zone': zones[command['zone']]}
+        if command['index'] is not None:
+            restored['index'] = command['index']
+        state.history.append(restored)
+
+    grid = project['grid']
+    if grid is not None:
+        state.ppm_x, state.ppm_y = grid['ppm']
+        state.grid_w, state.grid_h = grid['size']
+        state.grid_origin = tuple(grid['origin'])
+        state.real_size = tuple(grid['real_size']) if grid['real_size'] else None
+        state.target_centers = arrays['target_centers']
+        state.beacon_indices = project['beacon_indices']
+        state.coverage = project['coverage']
+        if same_image:
+            state.feasible_mask = arrays.get('feasible_mask')
+            snapshot = dict(project['masks'])
+            snapshot.update({key: arrays[f'masks_{key}'] for key in MASK_ARRAYS if f'masks_{key}' in arrays})
+            snapshot['coverage_arrays'] = {key[len('coverage_'):]: array for key, array in arrays.items()
+                                           if key.startswith('coverage_')}
+            state.grid_masks.restore(snapshot, state.cv_img, state.danger_zones, state.crop_rect[:2],
+                                     state.target_centers)
+    return same_image
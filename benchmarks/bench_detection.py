@@ -0,0 +1,117 @@
+"""Compare full-resolution and multi-scale detection on synthetic floor plans.
+
+For each plan size and cell_pixels setting this reports detection time, the IoU of the
+building and danger masks against the full-resolution result (and against the drawn ground
+truth), and the fraction of grid cells whose feasibility agrees with full resolution.
+
+Examples:
+    python benchmarks/bench_detection.py
+    python benchmarks/bench_detection.py --sizes 2000x1500 8000x6000 --cell-pixels 2 4 --json detection.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ImageProcessor import ImageProcessor  # noqa: E402
+from Pipeline import make_grid, mask_scale, sample_cells  # noqa: E402
+from synthetic import synthetic_plan  # noqa: E402
+
+REAL_SIZE = (40.0, 30.0)
+
+
+def parse_size(text):
+    w, h = text.lower().split('x')
+    return int(w), int(h)
+
+
+def iou(a, b):
+    a, b = a > 0, b > 0
+    union = np.count_nonzero(a | b)
+    return 1.0 if union == 0 else np.count_nonzero(a & b) / union
+
+
+def full_size(mask, shape):
+    """Upsample a (possibly downscaled) mask to the image size for pixel-wise comparison."""
+    if mask.shape[:2] == shape[:2]:
+        return mask
+    return cv2.resize(mask, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+
+
+def detect(processor, image, ppm, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        building = processor.detect_building_mask(image, ppm)
+        danger = processor.detect_danger_zones(image, ppm)
+        best = min(best, time.perf_counter() - start)
+    return building, danger, best
+
+
+def feasible_cells(image, building, danger, grid):
+    ppm_x, ppm_y, grid_w, grid_h, centers = grid
+    cells = sample_cells(building, centers, (grid_w, grid_h), mask_scale(building, image.shape))
+    return cells & ~sample_cells(danger, centers, (grid_w, grid_h), mask_scale(danger, image.shape))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[(2000, 1500), (4000, 3000), (8000, 6000)],
+                        metavar='WxH')
+    parser.add_argument('--cell-pixels', type=float, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--plans', type=int, default=3, help='synthetic plans per size')
+    parser.add_argument('--repeat', type=int, default=1, help='timing repetitions (best is reported)')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'size':>11} {'mode':>8} {'time s':>8} {'speedup':>8} {'bldg IoU':>9} {'dngr IoU':>9} "
+          f"{'bldg GT':>8} {'dngr GT':>8} {'cells':>7}")
+    for width, height in args.sizes:
+        for seed in range(args.plans):
+            image, true_building, true_danger = synthetic_plan(width, height, *REAL_SIZE, seed=seed)
+            grid = make_grid(image.shape, *REAL_SIZE)
+            ppm = grid[:2]
+            ref_building, ref_danger, ref_time = detect(ImageProcessor(), image, None, args.repeat)
+            ref_cells = feasible_cells(image, ref_building, ref_danger, grid)
+
+            for cell_pixels in [None] + list(args.cell_pixels):
+                if cell_pixels is None:
+                    building, danger, elapsed = ref_building, ref_danger, ref_time
+                else:
+                    processor = ImageProcessor(cell_pixels=cell_pixels)
+                    building, danger, elapsed = detect(processor, image, ppm, args.repeat)
+                up_building, up_danger = full_size(building, image.shape), full_size(danger, image.shape)
+                row = {
+                    'size': [width, height],
+                    'seed': seed,
+                    'cell_pixels': cell_pixels,
+                    'working_size': [building.shape[1], building.shape[0]],
+                    'time_s': elapsed,
+                    'speedup': ref_time / elapsed,
+                    'building_iou': iou(up_building, ref_building),
+                    'danger_iou': iou(up_danger, ref_danger),
+                    'building_iou_truth': iou(up_building, true_building),
+                    'danger_iou_truth': iou(up_danger, true_danger),
+                    'cell_agreement': float(np.mean(feasible_cells(image, building, danger, grid) == ref_cells)),
+                }
+                results.append(row)
+                mode = 'full' if cell_pixels is None else f'{cell_pixels:g} px'
+                print(f"{width:>5}x{height:<5} {mode:>8} {elapsed:8.3f} {row['speedup']:8.1f} "
+                      f"{row['building_iou']:9.4f} {row['danger_iou']:9.4f} {row['building_iou_truth']:8.4f} "
+                      f"{row['danger_iou_truth']:8.4f} {row['cell_agreement']:7.4f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'real_size_m': REAL_SIZE, 'results': results}, f, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
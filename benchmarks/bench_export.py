@@ -0,0 +1,97 @@
+"""Compare the original and compact export formats on synthetic rooftops of increasing grid size.
+
+For each format the export is built and written, then read back with json.load and decoded
+to the safe-cell mask with ExportFormat.read_safe_mask. The file size, the build+write time,
+the read+decode time and the peak traced allocation of the write are recorded, and every
+decoded mask is checked against the grid it was written from.
+
+Examples:
+    python benchmarks/bench_export.py
+    python benchmarks/bench_export.py --cells 10000 60000 250000 --danger-fraction 0.3 --json export.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DangerZones import DangerZones  # noqa: E402
+from ExportFormat import read_safe_mask  # noqa: E402
+from ImageProcessor import ImageProcessor  # noqa: E402
+from Pipeline import build_export, danger_grid, make_grid, mask_scale, write_json  # noqa: E402
+from bench_pipeline import site_size  # noqa: E402
+from synthetic import synthetic_plan  # noqa: E402
+
+FORMATS = {'json': None, 'bits': 'bits', 'rle': 'rle'}  # Name -> mask_encoding
+
+
+def run_site(cells, args, directory):
+    real_w, real_h = site_size(cells)
+    width, height = int(round(real_w * args.ppm)), int(round(real_h * args.ppm))
+    image, _, _ = synthetic_plan(width, height, real_w, real_h, seed=args.seed, danger_fraction=args.danger_fraction)
+    ppm_x, ppm_y, grid_w, grid_h, centers = make_grid(image.shape, real_w, real_h)
+    danger_mask = ImageProcessor().detect_danger_zones(image, (ppm_x, ppm_y))
+    zones = DangerZones.from_mask(danger_mask, scale=mask_scale(danger_mask, image.shape))
+    danger_cells = danger_grid(zones, (0, 0), (grid_w, grid_h), (ppm_x, ppm_y))
+    beacons = np.flatnonzero(~danger_cells.ravel())[:3].tolist()
+    result = {'cells': grid_w * grid_h, 'grid': [grid_w, grid_h], 'safe_cells': int(np.count_nonzero(~danger_cells)),
+              'formats': {}}
+
+    for name, encoding in FORMATS.items():
+        path = os.path.join(directory, f'{name}.json')
+        tracemalloc.start()
+        start = time.perf_counter()
+        export = build_export(image.shape, danger_cells, centers, (grid_w, grid_h), (ppm_x, ppm_y),
+                              (real_w, real_h), beacons, mask_encoding=encoding)
+        write_json(path, export)
+        write_s = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del export
+
+        start = time.perf_counter()
+        with open(path, encoding='utf-8') as f:
+            mask = read_safe_mask(json.load(f))
+        read_s = time.perf_counter() - start
+        if not np.array_equal(mask, ~danger_cells):
+            raise AssertionError(f'{name}: decoded mask differs from the exported grid')
+        result['formats'][name] = {'bytes': os.path.getsize(path), 'write_s': write_s, 'read_s': read_s,
+                                   'write_peak_bytes': peak}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cells', type=int, nargs='+', default=[1000, 10000, 60000, 250000],
+                        help='approximate grid sizes (cells) to benchmark')
+    parser.add_argument('--ppm', type=float, default=10.0, help='image pixels per meter of the synthetic sites')
+    parser.add_argument('--danger-fraction', type=float, default=0.1,
+                        help='fraction of the building covered by danger zones')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'cells':>7} {'safe':>7} {'format':>6} {'size KB':>9} {'write s':>8} {'read s':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for cells in args.cells:
+            result = run_site(cells, args, directory)
+            results.append(result)
+            for name, fmt in result['formats'].items():
+                print(f"{result['cells']:>7} {result['safe_cells']:>7} {name:>6} {fmt['bytes'] / 1024:9.1f} "
+                      f"{fmt['write_s']:8.3f} {fmt['read_s']:8.3f} {fmt['write_peak_bytes'] / 1024 ** 2:8.1f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
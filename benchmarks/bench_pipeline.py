@@ -0,0 +1,190 @@
+"""Time each stage of the placement pipeline on synthetic rooftops of increasing grid size.
+
+Stages: mask detection, feasibility filtering (danger vectorization, grid rasterization and
+sampling), coverage construction, and each solver on the same candidates and coverage. For every
+stage the wall time and the peak traced allocation are recorded (tracemalloc sees NumPy buffers
+but not OpenCV's; the process max RSS is reported too). Solvers are compared on the fraction of
+grid cells their placement covers.
+
+Examples:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --cells 1000 10000 100000 --danger-fraction 0.2 --json pipeline.json
+    python benchmarks/bench_pipeline.py --solvers greedy --no-memory
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Coverage import build_coverage, coverage_counts  # noqa: E402
+from DangerZones import DangerZones  # noqa: E402
+from Genetic import FITNESS_CACHE_SIZE, GeneticAlgorithm, NUM_BEACONS, NUM_GENERATIONS, POPULATION_SIZE, SEED  # noqa: E402
+from Greedy import GreedySolver  # noqa: E402
+from ImageProcessor import ImageProcessor  # noqa: E402
+from Pipeline import COVERAGE, GRID_PITCH, danger_grid, make_grid, mask_scale, sample_cells  # noqa: E402
+from synthetic import synthetic_plan  # noqa: E402
+
+ASPECT = 4 / 3  # Width / height of the synthetic rooftops
+
+
+class Stage:
+    """Context manager that records the wall time and traced peak memory of one stage."""
+    def __init__(self, record, name, trace):
+        self.record, self.name, self.trace = record, name, trace
+
+    def __enter__(self):
+        if self.trace:
+            tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record[self.name] = {'time_s': time.perf_counter() - self.start}
+        if self.trace:
+            self.record[self.name]['peak_bytes'] = tracemalloc.get_traced_memory()[1] - self.base
+        return False
+
+
+def max_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def site_size(cells):
+    """Real-world (width, height) in meters whose grid has about `cells` cells."""
+    real_h = np.sqrt(cells / ASPECT) * GRID_PITCH
+    return round(real_h * ASPECT, 1), round(real_h, 1)
+
+
+def make_solvers(args):
+    solvers = {}
+    if 'genetic' in args.solvers:
+        solvers['genetic'] = GeneticAlgorithm(num_beacons=args.beacons, population_size=args.population,
+                                              num_generations=args.generations, num_islands=args.islands,
+                                              seed=args.seed, fitness_cache_size=args.fitness_cache,
+                                              deduplicate=args.deduplicate)
+    if 'greedy' in args.solvers:
+        solvers['greedy'] = GreedySolver(args.beacons)
+    return solvers
+
+
+def run_site(cells, args, trace):
+    real_w, real_h = site_size(cells)
+    width, height = int(round(real_w * args.ppm)), int(round(real_h * args.ppm))
+    image, _, _ = synthetic_plan(width, height, real_w, real_h, seed=args.seed, danger_fraction=args.danger_fraction)
+    ppm_x, ppm_y, grid_w, grid_h, centers = make_grid(image.shape, real_w, real_h)
+    ppm = (ppm_x, ppm_y)
+    processor = ImageProcessor(cell_pixels=args.cell_pixels)
+    stages = {}
+    result = {'cells': grid_w * grid_h, 'grid': [grid_w, grid_h], 'real_size_m': [real_w, real_h],
+              'image_px': [width, height], 'stages': stages}
+
+    with Stage(stages, 'detection', trace):
+        building_mask = processor.detect_building_mask(image, ppm)
+        danger_mask = processor.detect_danger_zones(image, ppm)
+
+    with Stage(stages, 'feasibility', trace):
+        zones = DangerZones.from_mask(danger_mask, scale=mask_scale(danger_mask, image.shape))
+        danger_cells = danger_grid(zones, (0, 0), (grid_w, grid_h), ppm)
+        building_cells = sample_cells(building_mask, centers, (grid_w, grid_h), mask_scale(building_mask, image.shape))
+        placements = np.flatnonzero(building_cells & ~danger_cells).tolist()
+    result.update(candidates=len(placements), danger_zones=len(zones))
+    if not placements:
+        return result
+
+    step_x, step_y, ble_px = ppm_x * GRID_PITCH, ppm_y * GRID_PITCH, COVERAGE * ppm_x
+    with Stage(stages, 'coverage', trace):
+        coverage = build_coverage(placements, grid_w, grid_h, step_x, step_y, ble_px)
+    result['coverage_kind'] = type(coverage).__name__
+
+    result['solvers'] = {}
+    for name, solver in make_solvers(args).items():
+        solver_stages = {}
+        with Stage(solver_stages, 'solve', trace):
+            beacons = solver.run(placements, centers, coverage, ble_px)
+        counts = coverage_counts(beacons, grid_w, grid_h, step_x, step_y, ble_px)
+        result['solvers'][name] = dict(
+            solver_stages['solve'],
+            beacons=[int(b) for b in beacons],
+            coverage_fraction=float(np.count_nonzero(counts) / counts.size),
+            generations=len(getattr(solver, 'stats', [])) or None,
+            counters=solver.counters,
+        )
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cells', type=int, nargs='+', default=[1000, 3000, 10000, 30000, 100000],
+                        help='approximate grid sizes (cells) to benchmark')
+    parser.add_argument('--ppm', type=float, default=20.0, help='image pixels per meter of the synthetic sites')
+    parser.add_argument('--danger-fraction', type=float, default=0.1,
+                        help='fraction of the building covered by danger zones')
+    parser.add_argument('--solvers', nargs='+', choices=('genetic', 'greedy'), default=['genetic', 'greedy'])
+    parser.add_argument('--beacons', type=int, default=NUM_BEACONS)
+    parser.add_argument('--population', type=int, default=POPULATION_SIZE)
+    parser.add_argument('--generations', type=int, default=NUM_GENERATIONS)
+    parser.add_argument('--islands', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--fitness-cache', type=int, default=FITNESS_CACHE_SIZE, help='GA fitness cache entries (0 disables)')
+    parser.add_argument('--deduplicate', action='store_true')
+    parser.add_argument('--cell-pixels', type=float, help='use multi-scale detection (see ImageProcessor)')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, for timings without its overhead')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    trace = not args.no_memory
+    if trace:
+        tracemalloc.start()
+
+    results = []
+    print(f"{'cells':>7} {'cands':>7} {'detect s':>9} {'feasible s':>10} {'coverage s':>10} "
+          f"{'solver':>8} {'solve s':>8} {'covered':>8} {'peak MB':>8}")
+    for cells in args.cells:
+        result = run_site(cells, args, trace)
+        results.append(result)
+        stages = result['stages']
+        peaks = [s.get('peak_bytes', 0) for s in stages.values()]
+        for name, solver in result.get('solvers', {'-': {}}).items():
+            peak = max(peaks + [solver.get('peak_bytes', 0)]) / 1024 ** 2
+            print(f"{result['cells']:>7} {result['candidates']:>7} {stages['detection']['time_s']:9.3f} "
+                  f"{stages['feasibility']['time_s']:10.3f} {stages.get('coverage', {}).get('time_s', 0):10.3f} "
+                  f"{name:>8} {solver.get('time_s', 0):8.3f} {solver.get('coverage_fraction', 0):8.3f} "
+                  f"{peak if trace else float('nan'):8.1f}")
+
+    if args.json:
+        document = {
+            'environment': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'opencv': cv2.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'config': vars(args),
+            'max_rss_bytes': max_rss_bytes(),
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Synthetic rooftop floor plans with known building and danger masks, for benchmarks."""
+import cv2
+import numpy as np
+
+
+def synthetic_plan(width_px, height_px, real_w=40.0, real_h=30.0, seed=0, danger_fraction=None):
+    """
+    Draw a floor plan of width_px x height_px pixels covering real_w x real_h meters.
+
+    The building is an axis-aligned polygon (a rectangle with notches cut from its corners)
+    outlined in black, with interior walls, grey equipment blocks and red danger areas inside.
+    With danger_fraction, red areas are added until they cover that fraction of the building;
+    otherwise a handful of them are drawn.
+    Returns (image, building_mask, danger_mask); the masks are the ground truth as drawn.
+    """
+    rng = np.random.default_rng(seed)
+    ppm = min(width_px / real_w, height_px / real_h)
+    image = np.full((height_px, width_px, 3), 255, np.uint8)
+
+    margin_x, margin_y = width_px * 0.08, height_px * 0.08
+    x0, y0, x1, y1 = margin_x, margin_y, width_px - margin_x, height_px - margin_y
+    notch_w, notch_h = (x1 - x0) * rng.uniform(0.1, 0.3), (y1 - y0) * rng.uniform(0.1, 0.3)
+    outline = [(x0, y0), (x1 - notch_w, y0), (x1 - notch_w, y0 + notch_h), (x1, y0 + notch_h),
+               (x1, y1), (x0 + notch_w, y1), (x0 + notch_w, y1 - notch_h), (x0, y1 - notch_h)]
+    outline = np.round(outline).astype(np.int32)
+
+    building_mask = np.zeros((height_px, width_px), np.uint8)
+    cv2.fillPoly(building_mask, [outline], 255)
+    wall = max(1, int(round(0.15 * ppm)))
+    cv2.polylines(image, [outline], True, (0, 0, 0), wall)
+
+    for _ in range(rng.integers(2, 6)):
+        if rng.random() < 0.5:
+            x = int(rng.uniform(x0 + notch_w, x1 - notch_w))
+            cv2.line(image, (x, int(y0 + notch_h)), (x, int(y1 - notch_h)), (60, 60, 60), max(1, wall // 2))
+        else:
+            y = int(rng.uniform(y0 + notch_h, y1 - notch_h))
+            cv2.line(image, (int(x0 + notch_w), y), (int(x1 - notch_w), y), (60, 60, 60), max(1, wall // 2))
+
+    def random_rect(min_m, max_m):
+        w, h = rng.uniform(min_m, max_m, 2) * ppm
+        x = rng.uniform(x0 + notch_w, x1 - notch_w - w)
+        y = rng.uniform(y0 + notch_h, y1 - notch_h - h)
+        return (int(x), int(y)), (int(x + w), int(y + h))
+
+    for _ in range(rng.integers(3, 8)):
+        cv2.rectangle(image, *random_rect(0.5, 2.0), (150, 150, 150), -1)
+
+    danger_mask = np.zeros((height_px, width_px), np.uint8)
+    if danger_fraction is None:
+        count, target = rng.integers(2, 6), None
+    else:
+        count, target = 10000, danger_fraction * np.count_nonzero(building_mask)
+    for _ in range(count):
+        if target is not None and np.count_nonzero(danger_mask) >= target:
+            break
+        corners = random_rect(0.8, 4.0)
+        cv2.rectangle(image, *corners, (0, 0, 230), -1)
+        cv2.rectangle(danger_mask, *corners, 255, -1)
+
+    noise = rng.normal(0, 4, image.shape)
+    image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    return image, building_mask, danger_mask
@@ -0,0 +1,182 @@
+"""Headless command-line entry point: runs grid setup, estimation and JSON export without the GUI.
+
+Examples:
+    python cli.py plan.png --width 40 --height 30 --danger 100,100,300,250 -o plan.json
+    python cli.py plans/ --width 40 --height 30 --jobs 8 -o out/
+    python cli.py plan.png --width 40 --height 30 --trace   # also writes plan.trace.json
+    python cli.py plan.png --width 40 --height 30 --target-coverage 0.95   # fewest beacons reaching 95 %
+    python cli.py plan.png --width 40 --height 30 --mask-encoding bits   # compact export for large grids
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from BeaconCount import MAX_BEACONS, BeaconCountSearch
+from Genetic import FITNESS_CACHE_SIZE, GeneticAlgorithm, NUM_BEACONS, NUM_GENERATIONS, POPULATION_SIZE, SEED
+from Greedy import GreedySolver
+from ImageLoader import load_image
+from ImageProcessor import DetectionCache, ImageProcessor
+from DangerZones import DangerZones
+from Pipeline import build_export, make_grid, run_estimation, write_json
+from Profiler import MemorySampler, Profiler
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def parse_rect(text):
+    try:
+        x0, y0, x1, y1 = (float(v) for v in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected x0,y0,x1,y1 but got {text!r}')
+    return x0, y0, x1, y1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Estimate beacon placement for floor plan images without the GUI.')
+    parser.add_argument('input', help='floor plan image, or a directory of images')
+    parser.add_argument('--width', type=float, required=True, help='real-world width of the image in meters')
+    parser.add_argument('--height', type=float, required=True, help='real-world height of the image in meters')
+    parser.add_argument('--danger', type=parse_rect, action='append', default=[], metavar='X0,Y0,X1,Y1',
+                        help='danger rectangle in image pixels (repeatable)')
+    parser.add_argument('--danger-mask', help='danger mask image (non-zero pixels are dangerous)')
+    parser.add_argument('--solver', choices=('genetic', 'greedy'), default='genetic')
+    parser.add_argument('--beacons', type=int, default=NUM_BEACONS)
+    parser.add_argument('--population', type=int, default=POPULATION_SIZE)
+    parser.add_argument('--generations', type=int, default=NUM_GENERATIONS)
+    parser.add_argument('--islands', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--fitness-cache', type=int, default=FITNESS_CACHE_SIZE,
+                        help='GA fitness cache entries (0 disables the cache)')
+    parser.add_argument('--deduplicate', action='store_true', help='keep GA populations free of duplicate individuals')
+    parser.add_argument('--target-coverage', type=float,
+                        help='search for the fewest beacons covering this fraction of the feasible area (e.g. 0.95); '
+                             '--beacons is then ignored')
+    parser.add_argument('--max-beacons', type=int, default=MAX_BEACONS, help='largest beacon count tried by the search')
+    parser.add_argument('--search', choices=('sweep', 'bisect'), default='sweep', help='how the search steps through beacon counts')
+    parser.add_argument('--search-workers', type=int, default=1, help='beacon counts solved in parallel by the search')
+    parser.add_argument('--mask-encoding', choices=('bits', 'rle'),
+                        help='write the compact export (schema version 2) with the safe cells as one encoded mask')
+    parser.add_argument('--cell-pixels', type=float,
+                        help='detect on a downscaled image with about this many pixels per grid cell')
+    parser.add_argument('--cache-dir', help='directory for cached building/danger detection masks (.npz)')
+    parser.add_argument('--trace', action='store_true',
+                        help='also write a Chrome trace of the pipeline stages next to each output (<name>.trace.json)')
+    parser.add_argument('-o', '--output', help='output JSON file, or directory when the input is a directory')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='parallel processes for directory input')
+    return parser
+
+
+def validate(args):
+    """Returns an error message for numeric options no run could succeed with, or None."""
+    if args.width <= 0 or args.height <= 0:
+        return '--width and --height must be positive'
+    for name in ('beacons', 'population', 'generations', 'islands', 'max_beacons', 'search_workers', 'jobs'):
+        if getattr(args, name) < 1:
+            return f'--{name.replace("_", "-")} must be at least 1'
+    if args.fitness_cache < 0:
+        return '--fitness-cache must not be negative'
+    if args.cell_pixels is not None and args.cell_pixels <= 0:
+        return '--cell-pixels must be positive'
+    if args.target_coverage is not None and not 0 < args.target_coverage <= 1:
+        return '--target-coverage must be in (0, 1]'
+    return None
+
+
+def describe(error):
+    """ValueErrors carry user-facing messages; anything else is reported with its type."""
+    return str(error) if isinstance(error, ValueError) else f'{type(error).__name__}: {error}'
+
+
+def make_solver(args):
+    if args.solver == 'greedy':
+        solver = GreedySolver(args.beacons)
+    else:
+        solver = GeneticAlgorithm(num_beacons=args.beacons, population_size=args.population,
+                                  num_generations=args.generations, num_islands=args.islands, seed=args.seed,
+                                  fitness_cache_size=args.fitness_cache, deduplicate=args.deduplicate)
+    if args.target_coverage is None:
+        return solver
+    return BeaconCountSearch(solver, target_coverage=args.target_coverage, max_beacons=args.max_beacons,
+                             method=args.search, workers=args.search_workers)
+
+
+def make_image_processor(args):
+    cache = DetectionCache(directory=args.cache_dir) if args.cache_dir else None
+    return ImageProcessor(cache, cell_pixels=args.cell_pixels)
+
+
+def process_image(image_path, output_path, args):
+    """Run the full placement pipeline for one image and write its JSON. Returns the output path."""
+    profiler = Profiler()
+    with profiler.span('load_image'):
+        cv_img = load_image(image_path)
+    if cv_img is None:
+        raise ValueError(f'Could not read image: {image_path}')
+
+    danger_zones = DangerZones()
+    if args.danger_mask:
+        danger_mask = cv2.imread(args.danger_mask, cv2.IMREAD_GRAYSCALE)
+        if danger_mask is None:
+            raise ValueError(f'Could not read danger mask: {args.danger_mask}')
+        if danger_mask.shape[:2] != cv_img.shape[:2]:
+            danger_mask = cv2.resize(danger_mask, (cv_img.shape[1], cv_img.shape[0]))
+        danger_zones = DangerZones.from_mask(danger_mask)
+    for rect in args.danger:
+        danger_zones.add(DangerZones.rect(*rect))
+
+    ppm_x, ppm_y, grid_w, grid_h, target_centers = make_grid(cv_img.shape, args.width, args.height)
+    with MemorySampler(profiler):
+        result = run_estimation(cv_img, danger_zones, target_centers, (grid_w, grid_h), (ppm_x, ppm_y),
+                                make_image_processor(args), make_solver(args), profiler=profiler)
+    with profiler.span('export_build'):
+        export_data = build_export(cv_img.shape, result['danger_grid'], target_centers, (grid_w, grid_h),
+                                   (ppm_x, ppm_y), (args.width, args.height), result['beacon_indices'],
+                                   result['coverage'], mask_encoding=args.mask_encoding)
+    with profiler.span('export_write'):
+        write_json(output_path, export_data)
+    if args.trace:
+        profiler.write_chrome_trace(os.path.splitext(output_path)[0] + '.trace.json')
+    return output_path
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    error = validate(args)
+    if error is not None:
+        print(f'error: {error}', file=sys.stderr)
+        return 2
+
+    if not os.path.isdir(args.input):
+        output = args.output or os.path.splitext(args.input)[0] + '.json'
+        try:
+            print(process_image(args.input, output, args))
+        except Exception as e:
+            print(f'{args.input}: {describe(e)}', file=sys.stderr)
+            return 1
+        return 0
+
+    images = sorted(
+        os.path.join(args.input, name) for name in os.listdir(args.input)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    output_dir = args.output or args.input
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + '.json') for path in images]
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(process_image, path, output, args) for path, output in zip(images, outputs)]
+        for path, future in zip(images, futures):
+            try:
+                print(future.result())
+            except Exception as e:  # One bad image fails on its own instead of aborting the batch
+                failed += 1
+                print(f'{path}: {describe(e)}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
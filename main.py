@@ -1,10 +1,16 @@
+import os
 import customtkinter as ctk
 from AppState import AppState
 from Canvas import ImageCanvasView
 from ControlPanel import ControlPanel
 from Controller import AppController
-from ImageProcessor import ImageProcessor
+from ImageProcessor import DetectionCache, ImageProcessor
+from BeaconCount import BeaconCountSearch
 from Genetic import GeneticAlgorithm 
+from Greedy import GreedySolver
+from Profiler import Profiler
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ochimamo')
 
 class App(ctk.CTk):
     """The main application class that orchestrates the components."""
@@ -17,9 +23,14 @@ class App(ctk.CTk):
 
         # 1. Create the core non-UI components
         app_state = AppState()
-        image_processor = ImageProcessor()
+        profiler = Profiler()  # Shared by the controller and canvas; saved with "Save Trace..."
+        image_processor = ImageProcessor(DetectionCache(directory=os.path.join(CACHE_DIR, 'detections')))
         ga_solver = GeneticAlgorithm() # Using your provided GA class
-        controller = AppController(app_state, image_processor, ga_solver)
+        greedy_solver = GreedySolver(ga_solver.num_beacons)
+        count_search = BeaconCountSearch(ga_solver)  # Smallest beacon count reaching the target coverage
+        controller = AppController(app_state, image_processor, ga_solver, greedy_solver,
+                                   image_cache_dir=os.path.join(CACHE_DIR, 'images'), profiler=profiler,
+                                   count_search=count_search)
         self.bind("<Escape>", controller.cancel_current_mode)
 
         # 2. Configure the main window grid
@@ -28,7 +39,7 @@ class App(ctk.CTk):
         self.grid_columnconfigure(1, weight=0, minsize=250)
 
         # 3. Create the UI components (Views)
-        canvas_view = ImageCanvasView(self, app_state)
+        canvas_view = ImageCanvasView(self, app_state, profiler)
         canvas_view.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
 
         control_panel = ControlPanel(self, controller)
@@ -0,0 +1,26 @@
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+# The application modules live at the repository root rather than in a package; the
+# synthetic floor plans come from the benchmarks.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+from Coverage import build_coverage  # noqa: E402
+
+Site = namedtuple('Site', 'placement center coverage ble_px grid_w grid_h radius')
+
+
+@pytest.fixture
+def site():
+    """A 24 x 18 unit grid with every third cell a candidate; beacons reach 3 cells and keep 2 apart."""
+    grid_w, grid_h, radius = 24, 18, 3.0
+    xs, ys = np.meshgrid(np.arange(grid_w) + 0.5, np.arange(grid_h) + 0.5)
+    center = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    placement = list(range(0, grid_w * grid_h, 3))
+    coverage = build_coverage(placement, grid_w, grid_h, 1.0, 1.0, radius)
+    return Site(placement, center, coverage, 8.0, grid_w, grid_h, radius)
@@ -0,0 +1,88 @@
+import functools
+import itertools
+import operator
+
+import numpy as np
+import pytest
+
+from BeaconCount import BeaconCountSearch, well_spaced
+from Coverage import build_coverage, feasible_fraction
+from Genetic import GeneticAlgorithm
+from Greedy import GreedySolver
+
+
+def open_site(grid_w, grid_h, radius):
+    """Every cell of the grid is a candidate, so the search's coverage is the GA's fitness."""
+    xs, ys = np.meshgrid(np.arange(grid_w) + 0.5, np.arange(grid_h) + 0.5)
+    center = np.stack([xs.ravel(), ys.ravel()], axis=1)
+    placement = list(range(grid_w * grid_h))
+    return placement, center, build_coverage(placement, grid_w, grid_h, 1.0, 1.0, radius), 2.0
+
+
+def brute_force_min_k(placement, coverage, target):
+    masks = [sum(1 << int(cell) for cell in coverage.cells(i)) for i in range(len(placement))]
+    for k in itertools.count(1):
+        for solution in itertools.combinations(masks, k):
+            if bin(functools.reduce(operator.or_, solution)).count('1') >= target * len(placement):
+                return k
+
+
+@pytest.mark.parametrize('grid_w, target', [(8, 0.7), (9, 0.8)])
+def test_genetic_search_finds_the_smallest_count(grid_w, target):
+    placement, center, coverage, ble_px = open_site(grid_w, 6, 2.0)
+    greedy = BeaconCountSearch(target_coverage=target)
+    greedy.run(placement, center, coverage, ble_px)
+    ga = GeneticAlgorithm(population_size=40, num_generations=80, seed=3)
+    search = BeaconCountSearch(ga, target_coverage=target)
+    cells = search.run(placement, center, coverage, ble_px)
+
+    minimum = brute_force_min_k(placement, coverage, target)
+    assert greedy.num_beacons > minimum  # The greedy prefix alone would overshoot here
+    assert search.reached and search.num_beacons == len(cells) == minimum
+    assert well_spaced(center[placement], cells, ble_px)
+    assert search.coverage == feasible_fraction(coverage, placement, cells) >= target
+
+
+def test_greedy_search_stops_at_the_first_prefix_reaching_the_target(site):
+    search = BeaconCountSearch(target_coverage=0.8, max_beacons=30)
+    cells = search.run(site.placement, site.center, site.coverage, site.ble_px)
+    curve = {point['k']: point['coverage'] for point in search.curve}
+    assert search.reached and curve[search.num_beacons] >= 0.8
+    assert all(curve[k] < 0.8 for k in curve if k < search.num_beacons)
+    assert len(cells) == search.num_beacons and search.stop_reason == 'target'
+
+
+def test_unreachable_target_returns_the_best_count(site):
+    search = BeaconCountSearch(target_coverage=1.1, max_beacons=6)
+    search.run(site.placement, site.center, site.coverage, site.ble_px)
+    assert not search.reached and search.stop_reason == 'max_beacons'
+    assert search.coverage == max(point['coverage'] for point in search.curve)
+
+
+def test_warm_start_prefers_spaced_candidates_without_duplicates():
+    # Candidates on a line one unit apart; beacons must be at least 2 apart.
+    positions = np.stack([np.arange(6) + 0.5, np.full(6, 0.5)], axis=1)
+    coverage = build_coverage(list(range(6)), 6, 1, 1.0, 1.0, 0.0)
+    feasible = np.ones(6, dtype=bool)
+    search = BeaconCountSearch()
+    best = {1: (None, [2])}
+    warm = search._warm_start(best, 3, coverage, positions, 8.0, feasible)
+    assert warm[0] == 2 and sorted(warm[1:]) == [0, 4]
+    # Once no candidate is far enough away, the nearest ones are still new candidates.
+    warm = search._warm_start(best, 6, coverage, positions, 8.0, feasible)
+    assert sorted(warm) == list(range(6))
+
+
+def test_solutions_breaking_the_spacing_are_not_reported(site, monkeypatch):
+    # The GA returns greedy placements that ignore the spacing and so cover more than the spaced ones.
+    unspaced = lambda ga, placement, positions, coverage, ble_px, initial=None: GreedySolver(ga.num_beacons).solve(
+        coverage, positions, 0.0)
+    monkeypatch.setattr(GeneticAlgorithm, 'run', unspaced)
+    ble_px = 4 * 4.0
+    greedy = BeaconCountSearch(target_coverage=0.8)
+    expected = greedy.run(site.placement, site.center, site.coverage, ble_px)
+    search = BeaconCountSearch(GeneticAlgorithm(), target_coverage=0.8)
+    cells = search.run(site.placement, site.center, site.coverage, ble_px)
+    assert search.counters['solves'] > 0
+    assert cells == expected and search.coverage == greedy.coverage
+    assert all(point['solver'] == 'greedy' for point in search.curve)
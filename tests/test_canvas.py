@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from AppState import AppState
+from DangerZones import DangerZones
+
+Canvas = pytest.importorskip('Canvas')
+TILE = Canvas.TILE_SIZE
+
+
+@pytest.fixture
+def view():
+    """An ImageCanvasView without its Tk widgets, enough to render and cache layer tiles."""
+    state = AppState()
+    state.source_img = np.zeros((1000, 1200, 3), np.uint8)
+    state.set_crop_rect((100, 50, 1100, 950))
+    state.danger_zones = DangerZones([
+        DangerZones.rect(150, 100, 300, 200),
+        DangerZones.polygon([[700.0, 600.0], [1000.0, 650.0], [800.0, 900.0]]),
+    ])
+    view = Canvas.ImageCanvasView.__new__(Canvas.ImageCanvasView)
+    view.app_state = state
+    view._tiles, view._layer_versions, view._zone_bounds = OrderedDict(), {}, (None, None)
+    view._coverage_counts = None
+    view.rendered = []
+    render = view._render_tile
+    view._render_tile = lambda name, tx, ty, zoom, zones=(): view.rendered.append((tx, ty)) or render(name, tx, ty, zoom, zones)
+    return view
+
+
+def draw(view, zoom=1.0):
+    version = view._layer_version('danger')
+    return {(tx, ty): view._get_tile('danger', version, tx, ty, zoom) for ty in range(4) for tx in range(4)}
+
+
+@pytest.mark.parametrize('zoom', [1.0, 0.5, 1.7])
+def test_danger_tiles_match_rasterizing_all_zones(view, zoom):
+    state = view.app_state
+    ox, oy = state.crop_rect[:2]
+    h, w = state.cv_img.shape[:2]
+    for (tx, ty), tile in draw(view, zoom).items():
+        x0, y0 = tx * TILE, ty * TILE
+        mask = state.danger_zones.rasterize(ox + x0 / zoom, oy + y0 / zoom, 1 / zoom, 1 / zoom, TILE, TILE)
+        mask &= ((np.arange(y0, y0 + TILE) + 0.5) / zoom < h)[:, None] & ((np.arange(x0, x0 + TILE) + 0.5) / zoom < w)
+        np.testing.assert_array_equal(tile[..., 3] > 0, mask)
+
+
+def test_zone_edits_redraw_only_the_tiles_they_touch(view):
+    draw(view)
+    assert len(view.rendered) == 16
+    view.rendered.clear()
+    assert draw(view) and view.rendered == []
+
+    # Canvas (0..255, 0..255) is source (100..355, 50..305); this rectangle stays inside tile (0, 0).
+    zone = DangerZones.rect(200, 220, 260, 280)
+    view.app_state.danger_zones.add(zone)
+    tiles = draw(view)
+    assert view.rendered == [(0, 0)]
+    assert tiles[(0, 0)][180:220, 110:150, 3].all()
+
+    view.rendered.clear()
+    view.app_state.danger_zones.remove(zone)
+    tiles = draw(view)
+    # The tile drawn before the zone was added is still cached under the same zones.
+    assert view.rendered == [] and not tiles[(0, 0)][180:220, 110:150, 3].any()
@@ -0,0 +1,50 @@
+import json
+
+import cv2
+import pytest
+
+import cli
+from ExportFormat import read_safe_mask
+from synthetic import synthetic_plan
+
+FAST = ['--width', '40', '--height', '30', '--population', '10', '--generations', '3', '--beacons', '3']
+
+
+@pytest.mark.parametrize('option, message', [
+    (['--generations', '0'], '--generations must be at least 1'),
+    (['--jobs', '0'], '--jobs must be at least 1'),
+    (['--search-workers', '-1'], '--search-workers must be at least 1'),
+    (['--fitness-cache', '-5'], '--fitness-cache must not be negative'),
+    (['--cell-pixels', '0'], '--cell-pixels must be positive'),
+    (['--target-coverage', '1.5'], '--target-coverage must be in (0, 1]'),
+    (['--width', '0'], '--width and --height must be positive'),
+])
+def test_invalid_options_exit_with_status_2(tmp_path, capsys, option, message):
+    assert cli.main([str(tmp_path / 'plan.png')] + FAST + option) == 2
+    assert capsys.readouterr().err.strip() == f'error: {message}'
+
+
+def test_too_many_beacons_is_reported(tmp_path, capsys):
+    path = tmp_path / 'plan.png'
+    cv2.imwrite(str(path), synthetic_plan(200, 150, seed=1)[0])
+    assert cli.main([str(path)] + FAST + ['--beacons', '100000']) == 1
+    err = capsys.readouterr().err
+    assert 'beacons requested but only' in err and 'Traceback' not in err
+
+
+def test_batch_reports_a_bad_image_and_finishes_the_rest(tmp_path, capsys):
+    plans, out = tmp_path / 'plans', tmp_path / 'out'
+    plans.mkdir()
+    for seed in (1, 2):
+        cv2.imwrite(str(plans / f'site{seed}.png'), synthetic_plan(200, 150, seed=seed)[0])
+    (plans / 'broken.png').write_bytes(b'not an image')
+
+    assert cli.main([str(plans), '-o', str(out), '-j', '2', '--mask-encoding', 'rle'] + FAST) == 1
+    captured = capsys.readouterr()
+    assert 'broken.png: Could not read image' in captured.err
+    assert sorted(path.name for path in out.iterdir()) == ['site1.json', 'site2.json']
+    for path in out.iterdir():
+        with open(path, encoding='utf-8') as f:
+            export = json.load(f)
+        assert len(export['parent_devices']) == 3
+        assert read_safe_mask(export).shape == (export['grid_dimensions']['height'], export['grid_dimensions']['width'])
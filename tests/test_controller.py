@@ -0,0 +1,146 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import Controller as controller_module
+from AppState import AppState
+from Controller import AppController
+from DangerZones import DangerZones
+from Genetic import GeneticAlgorithm
+from ImageProcessor import ImageProcessor
+from synthetic import synthetic_plan
+
+
+class FakePanel:
+    """Stands in for ControlPanel; `after` callbacks are queued and run by the test."""
+    def __init__(self):
+        self.statuses, self.pending, self.zone_labels = [], [], []
+        self.grid_entries, self.selected_zone = ('40', '30'), None
+
+    def after(self, ms, callback, *args):
+        self.pending.append((callback, args))
+
+    def set_status(self, message):
+        self.statuses.append(message)
+
+    def set_danger_zones(self, labels):
+        self.zone_labels = labels
+
+    def get_grid_entries(self):
+        return self.grid_entries
+
+    def get_selected_zone(self):
+        return self.selected_zone
+
+    def clear_grid_entries(self):
+        self.grid_entries = ('', '')
+
+    def set_grid_entries(self, real_w, real_h):
+        self.grid_entries = (f'{real_w:g}', f'{real_h:g}')
+
+
+class FakeCanvas:
+    def update_display(self):
+        pass
+
+
+class SyncThread:
+    """Runs the estimation worker inline when started."""
+    def __init__(self, target, args, daemon=None):
+        self.target, self.args = target, args
+
+    def start(self):
+        self.target(*self.args)
+
+    def is_alive(self):
+        return False
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(controller_module, 'threading', SimpleNamespace(Thread=SyncThread, Event=threading.Event))
+    for name in ('showinfo', 'showwarning', 'showerror'):
+        monkeypatch.setattr(controller_module.messagebox, name, lambda *args: None)
+    image, _, _ = synthetic_plan(400, 300, 40.0, 30.0, seed=3)
+    state = AppState()
+    state.source_img = image
+    state.set_crop_rect((0, 0, image.shape[1], image.shape[0]))
+    ga = GeneticAlgorithm(num_beacons=4, population_size=16, num_generations=12)
+    app = AppController(state, ImageProcessor(), ga)
+    app.control_panel, app.canvas_view = FakePanel(), FakeCanvas()
+    app.set_grid()
+    return app
+
+
+def finish(app):
+    """Runs the queued polls until the estimation result has been applied."""
+    while app.control_panel.pending:
+        callback, args = app.control_panel.pending.pop(0)
+        callback(*args)
+
+
+def test_cancel_keeps_the_best_placement_so_far(app, monkeypatch):
+    class CancelAfterThirdGeneration(controller_module.queue.Queue):
+        def put(self, event, *args, **kwargs):
+            super().put(event, *args, **kwargs)
+            if event[0] == 'generation' and event[1] == 2:
+                app._cancel_event.set()
+
+    monkeypatch.setattr(controller_module, 'queue', SimpleNamespace(Queue=CancelAfterThirdGeneration,
+                                                                    Empty=controller_module.queue.Empty))
+    app.run_ga()
+    finish(app)
+    ga = app.ga_solver
+    assert ga.stop_reason == 'cancelled' and len(ga.stats) == 3
+    assert len(app.state.beacon_indices) == 4
+    assert app.state.coverage is not None
+    assert app.control_panel.statuses[-1].startswith('Estimation cancelled. Kept best result so far')
+
+
+def test_detected_zones_are_undoable(app):
+    assert not app.state.danger_zones
+    app.run_ga()
+    finish(app)
+    detected = list(app.state.danger_zones)
+    assert detected and app.state.history[-1] == {'kind': 'danger', 'action': 'detect', 'zones': detected}
+    assert len(app.control_panel.zone_labels) == len(detected)
+    app.undo()
+    assert not app.state.danger_zones and not app.state.history
+
+
+def test_result_is_discarded_when_zones_change_during_the_run(app):
+    app.run_ga()
+    app.state.danger_zones.add(DangerZones.rect(50, 50, 120, 100))
+    finish(app)
+    assert app.state.beacon_indices == [] and app.state.feasible_mask is None
+    assert app.control_panel.statuses[-1].endswith('result discarded.')
+
+
+def crop(app, rect):
+    app.state.crop_coords = list(rect)
+    app.apply_crop()
+
+
+def test_undoing_a_crop_clears_the_grid_set_after_it(app):
+    app.state.restore_grid_state(None)
+    crop(app, (50, 40, 250, 200))
+    app.set_grid()
+    assert app.state.target_centers is not None
+    app.undo()
+    assert app.state.cv_img.shape[:2] == (300, 400)
+    assert app.state.target_centers is None and app.state.grid_w is None and app.state.beacon_indices == []
+
+
+def test_undoing_a_crop_restores_the_grid_and_placement_from_before_it(app):
+    app.run_ga()
+    finish(app)
+    centers, beacons, grid_size = app.state.target_centers, list(app.state.beacon_indices), app.state.grid_w
+    crop(app, (50, 40, 250, 200))
+    app.control_panel.grid_entries = ('20', '16')
+    app.set_grid()
+    assert app.state.grid_w != grid_size
+    app.undo()
+    assert app.state.target_centers is centers and app.state.grid_w == grid_size
+    assert app.state.beacon_indices == beacons and app.state.real_size == (40.0, 30.0)
+    assert len(app.state.target_centers) == app.state.grid_w * app.state.grid_h
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from Coverage import BIT_COVERAGE_MAX_BYTES, BitCoverage, SparseCoverage, build_coverage, update_coverage
+from Genetic import GeneticAlgorithm
+
+GRID_W, GRID_H = 23, 17
+RADIUS = 3.5
+BLE_PX = 20.0
+
+
+def grid_fixture(num_candidates, seed=0):
+    """Candidate cells, their (x, y) positions and the cells within RADIUS of each, on a unit grid."""
+    rng = np.random.default_rng(seed)
+    candidates = np.sort(rng.choice(GRID_W * GRID_H, num_candidates, replace=False))
+    i, j = np.divmod(candidates, GRID_W)
+    positions = np.stack([j, i], axis=1).astype(float)
+    ci, cj = np.divmod(np.arange(GRID_W * GRID_H), GRID_W)
+    sets = [set(np.flatnonzero(np.hypot(cj - x, ci - y) <= RADIUS).tolist()) for x, y in positions]
+    return candidates, positions, sets
+
+
+def set_fitness(individual, sets, positions, num_cells):
+    covered = set().union(*(sets[gene] for gene in individual))
+    too_close = any(np.linalg.norm(positions[a] - positions[b]) < BLE_PX / 4
+                    for n, a in enumerate(individual) for b in individual[n + 1:])
+    return len(covered) / num_cells - (0.5 if too_close else 0)
+
+
+def random_population(num_candidates, size=40, num_beacons=4, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.choice(num_candidates, num_beacons, replace=False).tolist() for _ in range(size)]
+
+
+def test_bit_fitness_matches_set_based():
+    candidates, positions, sets = grid_fixture(120)
+    num_cells = GRID_W * GRID_H
+    coverage = BitCoverage.from_sets(sets, num_cells)
+    population = random_population(len(candidates))
+    fitness = GeneticAlgorithm(num_beacons=4)._evaluate_population(population, coverage, positions, BLE_PX)
+    expected = [set_fitness(individual, sets, positions, num_cells) for individual in population]
+    np.testing.assert_allclose(fitness, expected)
+
+
+def test_bit_coverage_covered_and_gains():
+    candidates, positions, sets = grid_fixture(60, seed=1)
+    coverage = BitCoverage.from_sets(sets, GRID_W * GRID_H)
+    individual = [3, 17, 42]
+    covered = coverage.covered(individual)
+    assert set(np.flatnonzero(covered).tolist()) == set().union(*(sets[g] for g in individual))
+    assert coverage.count(individual) == np.count_nonzero(covered)
+    gains = coverage.gains(covered)
+    assert [int(g) for g in gains] == [len(s - set(np.flatnonzero(covered).tolist())) for s in sets]
+
+
+def test_sparse_fitness_matches_set_based():
+    candidates, positions, sets = grid_fixture(120)
+    num_cells = GRID_W * GRID_H
+    coverage = build_coverage(candidates, GRID_W, GRID_H, 1.0, 1.0, RADIUS, max_bit_bytes=0)
+    assert isinstance(coverage, SparseCoverage)
+    assert [set(coverage.cells(c).tolist()) for c in range(len(coverage))] == sets
+    population = random_population(len(candidates))
+    fitness = GeneticAlgorithm(num_beacons=4)._evaluate_population(population, coverage, positions, BLE_PX)
+    expected = [set_fitness(individual, sets, positions, num_cells) for individual in population]
+    np.testing.assert_allclose(fitness, expected)
+
+
+@pytest.mark.parametrize('max_bit_bytes', [None, 0])
+def test_covered_of_empty_individual(max_bit_bytes):
+    candidates, _, _ = grid_fixture(10)
+    limit = {} if max_bit_bytes is None else {'max_bit_bytes': max_bit_bytes}
+    coverage = build_coverage(candidates, GRID_W, GRID_H, 1.0, 1.0, RADIUS, **limit)
+    for rows in (coverage, coverage.rows(0, 0)):
+        covered = rows.covered([])
+        assert covered.shape == (GRID_W * GRID_H,) and not covered.any()
+
+
+@pytest.mark.parametrize('max_bit_bytes', [BIT_COVERAGE_MAX_BYTES, 0])
+def test_update_coverage_matches_build(max_bit_bytes):
+    rng = np.random.default_rng(1)
+    limit = {'max_bit_bytes': max_bit_bytes}
+    num_cells = GRID_W * GRID_H
+    old_cells = np.sort(rng.choice(num_cells, 150, replace=False))
+    coverage = build_coverage(old_cells, GRID_W, GRID_H, 1.0, 1.0, RADIUS, **limit)
+    kept = old_cells[rng.random(len(old_cells)) < 0.7]
+    new_cells = np.union1d(kept, rng.choice(num_cells, 60, replace=False))
+
+    updated, computed = update_coverage(coverage, old_cells, new_cells, GRID_W, GRID_H, 1.0, 1.0, RADIUS, **limit)
+    built = build_coverage(new_cells, GRID_W, GRID_H, 1.0, 1.0, RADIUS, **limit)
+    assert type(updated) is type(built)
+    assert computed == len(np.setdiff1d(new_cells, old_cells))
+    for name, array in built.arrays().items():
+        np.testing.assert_array_equal(updated.arrays()[name], array)
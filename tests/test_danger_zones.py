@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from DangerZones import DangerZones
+
+
+def zones():
+    return DangerZones([
+        DangerZones.rect(10, 12, 40, 30),
+        DangerZones.polygon(np.array([[55.0, 5.0], [95.0, 20.0], [70.0, 60.0], [50.0, 35.0]])),
+        DangerZones.polygon(np.array([[5.0, 50.0], [30.0, 45.0], [20.0, 75.0]])),
+    ])
+
+
+@pytest.mark.parametrize('scale', [(1.0, 1.0), (2.5, 2.5), (0.7, 1.3)])
+def test_windowed_rasterize_matches_full(scale):
+    out_w, out_h = 60, 45
+    full = zones().rasterize(3, -2, *scale, out_w, out_h)
+    assert full.any()
+    rng = np.random.default_rng(2)
+    windows = [(0, 0, out_w, out_h), (0, 0, 1, 1), (out_w - 1, out_h - 1, out_w, out_h)]
+    for _ in range(20):
+        j0, j1 = np.sort(rng.choice(out_w + 1, 2, replace=False))
+        i0, i1 = np.sort(rng.choice(out_h + 1, 2, replace=False))
+        windows.append((int(j0), int(i0), int(j1), int(i1)))
+    for j0, i0, j1, i1 in windows:
+        window = zones().rasterize(3, -2, *scale, out_w, out_h, window=(j0, i0, j1, i1))
+        np.testing.assert_array_equal(window, full[i0:i1, j0:j1])
+
+
+def test_rasterize_without_zones_is_empty():
+    mask = DangerZones().rasterize(0, 0, 1.0, 1.0, 8, 5, window=(2, 1, 6, 4))
+    assert mask.shape == (3, 4) and not mask.any()
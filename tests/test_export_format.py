@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pytest
+
+from ExportFormat import MASK_ENCODINGS, SCHEMA_VERSION, decode_safe_mask, encode_mask, read_safe_mask, \
+    safe_mask_header, write_compact
+from Pipeline import build_export, write_json
+
+rng = np.random.default_rng(3)
+MASKS = {
+    'all_safe': np.ones((7, 9), dtype=bool),
+    'all_unsafe': np.zeros((7, 9), dtype=bool),
+    'one_safe': np.ones((1, 1), dtype=bool),
+    'one_unsafe': np.zeros((1, 1), dtype=bool),
+    'random': rng.random((31, 45)) < 0.6,
+    'long_runs': np.repeat(rng.random(12) < 0.5, 400).reshape(60, 80),
+}
+
+
+@pytest.mark.parametrize('encoding', MASK_ENCODINGS)
+@pytest.mark.parametrize('name', MASKS)
+def test_encode_decode_round_trip(name, encoding):
+    mask = MASKS[name]
+    header = safe_mask_header(mask, encoding)
+    entry = dict(header, data=''.join(encode_mask(mask, encoding)))
+    decoded = decode_safe_mask(json.loads(json.dumps(entry)))
+    assert decoded.shape == mask.shape
+    np.testing.assert_array_equal(decoded, mask)
+    assert header['safe_cells'] == np.count_nonzero(mask)
+
+
+@pytest.mark.parametrize('encoding', MASK_ENCODINGS)
+@pytest.mark.parametrize('name', MASKS)
+def test_write_compact_read_safe_mask_round_trip(tmp_path, name, encoding):
+    mask = MASKS[name]
+    path = tmp_path / 'export.json'
+    write_compact(path, {'schema_version': SCHEMA_VERSION, 'safe_mask': safe_mask_header(mask, encoding)})
+    with open(path, encoding='utf-8') as f:
+        np.testing.assert_array_equal(read_safe_mask(json.load(f)), mask)
+
+
+@pytest.mark.parametrize('encoding', [None, *MASK_ENCODINGS])
+def test_build_export_round_trip(tmp_path, encoding):
+    danger_cells = ~MASKS['random']
+    grid_h, grid_w = danger_cells.shape
+    centers = np.stack(np.meshgrid(np.arange(grid_w) * 5.0 + 2.5, np.arange(grid_h) * 5.0 + 2.5), axis=-1).reshape(-1, 2)
+    beacons = np.flatnonzero(~danger_cells.ravel())[:3].tolist()
+    export = build_export((grid_h * 5, grid_w * 5, 3), danger_cells, centers, (grid_w, grid_h), (10.0, 10.0),
+                          (grid_w / 2, grid_h / 2), beacons, mask_encoding=encoding)
+    path = tmp_path / 'export.json'
+    write_json(path, export)
+    with open(path, encoding='utf-8') as f:
+        np.testing.assert_array_equal(read_safe_mask(json.load(f)), ~danger_cells)
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        safe_mask_header(np.ones((2, 2), dtype=bool), 'png')
@@ -0,0 +1,134 @@
+import random
+
+import numpy as np
+import pytest
+
+from Genetic import GeneticAlgorithm
+
+
+def run(site, **params):
+    params = dict(dict(num_beacons=5, population_size=20, num_generations=15), **params)
+    ga = GeneticAlgorithm(**params)
+    return ga, ga.run(site.placement, site.center, site.coverage, site.ble_px)
+
+
+@pytest.mark.parametrize('num_islands', [1, 3])
+def test_same_seed_gives_same_placement(site, num_islands):
+    _, first = run(site, seed=7, num_islands=num_islands, migration_interval=5)
+    _, second = run(site, seed=7, num_islands=num_islands, migration_interval=5)
+    assert first == second
+    assert len(set(first)) == 5 and set(first) <= set(site.placement)
+
+
+def test_seed_changes_the_search(site):
+    runs = {tuple(sorted(run(site, seed=seed)[1])) for seed in range(5)}
+    assert len(runs) > 1
+
+
+def test_too_many_beacons_is_rejected(site):
+    with pytest.raises(ValueError, match='candidate cells'):
+        run(site, num_beacons=len(site.placement) + 1)
+
+
+def test_runs_all_generations_without_stop_conditions(site):
+    calls = []
+    ga, _ = run(site, callback=lambda *args: calls.append(args) and False)
+    assert ga.stop_reason is None
+    assert len(ga.stats) == len(calls) == 15
+    assert [stat['generation'] for stat in ga.stats] == list(range(15))
+    best = [stat['best_fitness'] for stat in ga.stats]
+    assert best == sorted(best)
+    generation, best_fitness, mean_fitness, cells = calls[-1]
+    assert (generation, best_fitness) == (14, ga.best_fitness) and mean_fitness <= best_fitness
+    assert len(cells) == 5 and set(cells) <= set(site.placement)
+
+
+def test_callback_returning_true_cancels(site):
+    ga, cells = run(site, callback=lambda generation, *_: generation == 3)
+    assert ga.stop_reason == 'cancelled'
+    assert len(ga.stats) == 4 and len(cells) == 5
+
+
+def test_patience_stops_after_stalled_generations(site):
+    ga, _ = run(site, num_generations=500, patience=4)
+    assert ga.stop_reason == 'patience'
+    assert len(ga.stats) == ga.best_generation + 4 + 1 < 500
+
+
+def test_target_coverage_stops_on_feasible_coverage(site):
+    ga, _ = run(site, num_generations=500, target_coverage=0.3)
+    assert ga.stop_reason == 'target'
+    coverage = [stat['best_coverage'] for stat in ga.stats]
+    assert coverage[-1] >= 0.3 and all(value < 0.3 for value in coverage[:-1])
+    # The fitness counts all grid cells, so here it passes the target generations before the coverage does.
+    assert len(ga.stats) > 1 and ga.stats[0]['best_fitness'] >= 0.3
+
+
+def test_time_limit_stops_the_run(site):
+    ga, cells = run(site, num_generations=500, time_limit=0)
+    assert ga.stop_reason == 'time'
+    assert len(ga.stats) == 1 and len(cells) == 5
+
+
+@pytest.mark.parametrize('num_islands', [1, 3])
+def test_fitness_cache_does_not_change_the_search(site, num_islands):
+    params = dict(seed=11, num_islands=num_islands, migration_interval=5)
+    cached, cached_cells = run(site, fitness_cache_size=1000, **params)
+    uncached, uncached_cells = run(site, fitness_cache_size=0, **params)
+    assert cached_cells == uncached_cells
+    assert [stat['best_fitness'] for stat in cached.stats] == [stat['best_fitness'] for stat in uncached.stats]
+    assert [stat['mean_fitness'] for stat in cached.stats] == pytest.approx(
+        [stat['mean_fitness'] for stat in uncached.stats])
+    assert cached.cache_hits > 0 and uncached.cache_hits == 0
+    assert cached.evaluations + cached.cache_hits <= uncached.evaluations
+
+
+def test_cached_fitness_matches_direct_evaluation(site):
+    ga = GeneticAlgorithm(num_beacons=4, fitness_cache_size=8)
+    positions = site.center[site.placement]
+    rng = random.Random(0)
+    pop = [rng.sample(range(len(positions)), 4) for _ in range(20)]
+    pop += [list(reversed(individual)) for individual in pop[:5]]
+    expected = ga._evaluate_population(pop, site.coverage, positions, site.ble_px)
+    for _ in range(2):
+        np.testing.assert_allclose(ga._cached_fitness(pop, site.coverage, positions, site.ble_px), expected)
+    assert len(ga._fitness_cache) == 8
+
+
+class RecordingGA(GeneticAlgorithm):
+    def _score(self, pop, coverage, positions, ble_px):
+        self.generations.append([tuple(sorted(individual)) for individual in pop])
+        return super()._score(pop, coverage, positions, ble_px)
+
+
+@pytest.mark.parametrize('deduplicate', [True, False])
+def test_deduplicated_generations_are_unique(site, deduplicate):
+    ga = RecordingGA(num_beacons=3, population_size=30, num_generations=40, mutation_rate=0.05,
+                     deduplicate=deduplicate)
+    ga.generations = []
+    ga.run(site.placement, site.center, site.coverage, site.ble_px)
+    bred = ga.generations[1:]
+    duplicates = sum(len(pop) - len(set(pop)) for pop in bred)
+    assert all(len(pop) == 30 for pop in bred)
+    if deduplicate:
+        assert duplicates == 0
+    else:
+        assert duplicates > 0  # Otherwise this setup would not exercise deduplication
+
+
+def test_warm_start_seeds_the_previous_placement(site):
+    _, previous = run(site, seed=1, num_generations=30)
+    ga = RecordingGA(num_beacons=5, population_size=20, num_generations=1, greedy_seed_rate=0, seed=2)
+    ga.generations = []
+    cells = ga.run(site.placement, site.center, site.coverage, site.ble_px, initial=previous)
+    index = {cell: i for i, cell in enumerate(site.placement)}
+    assert tuple(sorted(index[cell] for cell in previous)) in ga.generations[0]
+    assert site.coverage.count([index[cell] for cell in cells]) >= site.coverage.count([index[cell] for cell in previous])
+
+
+def test_warm_start_ignores_placements_that_do_not_fit(site):
+    ga = GeneticAlgorithm(num_beacons=3, greedy_seed_rate=0)
+    placement = site.placement
+    assert ga._seeds(placement, None, [placement[4], placement[9], placement[4]]) == []
+    assert ga._seeds(placement, None, [placement[4], placement[9], 1]) == []
+    assert ga._seeds(placement, None, [placement[4], placement[9], placement[2]]) == [([4, 9, 2], ga.warm_start_rate)]
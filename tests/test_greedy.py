@@ -0,0 +1,51 @@
+import itertools
+
+import numpy as np
+
+from Coverage import feasible_fraction
+from Genetic import GeneticAlgorithm
+from Greedy import GreedySolver
+
+
+def candidate_indices(site, cells):
+    index = {cell: i for i, cell in enumerate(site.placement)}
+    return [index[cell] for cell in cells]
+
+
+def test_greedy_keeps_minimum_spacing(site):
+    for num_beacons in (3, 8, 20):
+        cells = GreedySolver(num_beacons).run(site.placement, site.center, site.coverage, site.ble_px)
+        assert len(set(cells)) == len(cells) <= num_beacons
+        for a, b in itertools.combinations(cells, 2):
+            assert np.linalg.norm(site.center[a] - site.center[b]) >= site.ble_px / 4
+
+
+def test_lazy_greedy_matches_plain_greedy(site):
+    positions = site.center[site.placement]
+    chosen = GreedySolver(6).solve(site.coverage, positions, site.ble_px)
+    covered, expected = np.zeros(site.coverage.num_cells, dtype=bool), []
+    for _ in range(6):
+        gains = site.coverage.gains(covered).astype(float)
+        for candidate in range(len(positions)):
+            if expected and np.linalg.norm(positions[expected] - positions[candidate], axis=1).min() < site.ble_px / 4:
+                gains[candidate] = -1
+        expected.append(int(np.argmax(gains)))
+        covered |= site.coverage.covered([expected[-1]])
+    assert site.coverage.count(chosen) == site.coverage.count(expected)
+
+
+def test_greedy_covers_at_least_as_much_as_a_short_ga(site):
+    greedy = GreedySolver(5).run(site.placement, site.center, site.coverage, site.ble_px)
+    ga = GeneticAlgorithm(num_beacons=5, population_size=20, num_generations=20)
+    genetic = ga.run(site.placement, site.center, site.coverage, site.ble_px)
+    fraction = lambda cells: feasible_fraction(site.coverage, site.placement, candidate_indices(site, cells))
+    assert fraction(greedy) >= fraction(genetic)
+
+
+def test_greedy_seed_is_in_the_initial_population(site):
+    positions = site.center[site.placement]
+    greedy = GreedySolver(5).solve(site.coverage, positions, site.ble_px)
+    ga = GeneticAlgorithm(num_beacons=5, population_size=20, greedy_seed_rate=0.1)
+    seeds = ga._seeds(site.placement, ga._greedy_seed(site.coverage, positions, site.ble_px), None)
+    assert seeds == [(greedy, 0.1)]
+    assert greedy in ga._initial_population(len(site.placement), seeds)
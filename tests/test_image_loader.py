@@ -0,0 +1,50 @@
+import os
+
+import cv2
+import numpy as np
+
+from ImageLoader import MAX_CACHED_IMAGES, load_image
+from synthetic import synthetic_plan
+
+
+def write_plan(tmp_path, name='plan.png', seed=0):
+    path = str(tmp_path / name)
+    cv2.imwrite(path, synthetic_plan(320, 240, seed=seed)[0])
+    return path
+
+
+def test_memmapped_load_equals_decode(tmp_path):
+    path = write_plan(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    decoded = cv2.imread(path)
+    first = load_image(path, cache_dir, memmap_threshold=0)
+    again = load_image(path, cache_dir, memmap_threshold=0)
+    for image in (first, again):
+        assert isinstance(image, np.memmap)
+        assert not image.flags.writeable
+        np.testing.assert_array_equal(image, decoded)
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_small_images_are_not_cached(tmp_path):
+    path = write_plan(tmp_path)
+    cache_dir = str(tmp_path / 'cache')
+    image = load_image(path, cache_dir)
+    assert not isinstance(image, np.memmap)
+    np.testing.assert_array_equal(image, cv2.imread(path))
+    assert not os.path.exists(cache_dir)
+
+
+def test_cache_keeps_most_recent_images(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    for seed in range(MAX_CACHED_IMAGES + 2):
+        load_image(write_plan(tmp_path, f'plan{seed}.png', seed), cache_dir, memmap_threshold=0)
+    assert len(os.listdir(cache_dir)) == MAX_CACHED_IMAGES
+
+
+def test_unreadable_image_returns_none(tmp_path):
+    path = str(tmp_path / 'broken.png')
+    with open(path, 'wb') as f:
+        f.write(b'not an image')
+    assert load_image(path) is None
+    assert load_image(path, str(tmp_path / 'cache'), memmap_threshold=0) is None
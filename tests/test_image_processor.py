@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+
+from ImageProcessor import DetectionCache, ImageProcessor
+from Pipeline import make_grid
+from synthetic import synthetic_plan
+
+
+def red_blobs(seed, shape=(200, 260)):
+    rng = np.random.default_rng(seed)
+    image = np.full(shape + (3,), 255, np.uint8)
+    for _ in range(10):
+        center = tuple(int(v) for v in rng.integers(0, shape[1], 2))
+        cv2.circle(image, center, int(rng.integers(2, 20)), (0, 0, 230), -1)
+    return image
+
+
+def test_same_content_is_a_cache_hit():
+    image = synthetic_plan(300, 225, seed=4)[0]
+    processor = ImageProcessor(DetectionCache())
+    first = processor.detect_building_mask(image)
+    second = processor.detect_building_mask(image.copy())
+    assert second is first
+    assert (processor.cache.hits, processor.cache.misses) == (1, 1)
+    changed = image.copy()
+    changed[0, 0] = 0
+    processor.detect_building_mask(changed)
+    assert processor.cache.misses == 2
+
+
+def test_disk_cache_survives_a_new_process(tmp_path):
+    image = synthetic_plan(300, 225, seed=5)[0]
+    expected = ImageProcessor(DetectionCache(directory=tmp_path)).detect_danger_zones(image)
+    processor = ImageProcessor(DetectionCache(directory=tmp_path))
+    np.testing.assert_array_equal(processor.detect_danger_zones(image), expected)
+    assert processor.cache.hits == 1
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_crop_detection_with_the_parent_cached_equals_detection_on_the_crop(seed, monkeypatch):
+    image = red_blobs(seed)
+    processor = ImageProcessor(DetectionCache())
+    processor.detect_danger_zones(image)
+
+    rng = np.random.default_rng(seed)
+    x0, y0 = (int(v) for v in rng.integers(0, 100, 2))
+    crop = image[y0:y0 + int(rng.integers(10, 100)), x0:x0 + int(rng.integers(10, 150))]
+    expected = ImageProcessor._danger_mask(crop)
+
+    calls = []
+    red_mask = ImageProcessor._red_mask
+    monkeypatch.setattr(ImageProcessor, '_red_mask', staticmethod(lambda img: calls.append(img) or red_mask(img)))
+    np.testing.assert_array_equal(processor.detect_danger_zones(crop), expected)
+    assert calls == []  # The colour threshold was sliced from the parent's
+
+
+def test_building_mask_of_a_crop_is_detected_on_the_crop():
+    image = synthetic_plan(300, 225, seed=6)[0]
+    processor = ImageProcessor(DetectionCache())
+    processor.detect_building_mask(image)
+    crop = image[20:200, 30:260]
+    np.testing.assert_array_equal(processor.detect_building_mask(crop), ImageProcessor().detect_building_mask(crop))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_multi_scale_masks_agree_with_full_resolution(seed):
+    real_size = (40.0, 30.0)
+    image = synthetic_plan(1200, 900, *real_size, seed=seed)[0]
+    ppm = make_grid(image.shape, *real_size)[:2]
+    full = ImageProcessor()
+    reduced = ImageProcessor(cell_pixels=4)
+    for name in ('detect_building_mask', 'detect_danger_zones'):
+        expected = getattr(full, name)(image) > 0
+        mask = getattr(reduced, name)(image, ppm)
+        assert mask.shape[0] < image.shape[0]
+        mask = cv2.resize(mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST) > 0
+        assert np.count_nonzero(mask != expected) / np.count_nonzero(mask | expected) < 0.1
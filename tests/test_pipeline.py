@@ -0,0 +1,30 @@
+import numpy as np
+
+from Pipeline import repair_placement
+
+
+def line_centers(count):
+    return np.stack([np.arange(count) + 0.5, np.full(count, 0.5)], axis=1)
+
+
+def test_feasible_placement_is_kept():
+    cells, moved = repair_placement([8, 2, 5], [1, 2, 5, 8, 9], line_centers(10))
+    assert (cells, moved) == ([8, 2, 5], 0)
+
+
+def test_infeasible_and_duplicate_beacons_move_to_nearest_free_candidate():
+    placements = [0, 3, 4, 7, 9]
+    cells, moved = repair_placement([3, 6, 3, 4], placements, line_centers(10))
+    # 6 is no longer a candidate and moves to 7; the duplicate 3 takes the nearest free cell, 0.
+    assert (cells, moved) == ([3, 7, 0, 4], 2)
+    assert len(set(cells)) == len(cells) and set(cells) <= set(placements)
+
+
+def test_beacons_beyond_a_shrunken_grid_use_the_last_cell():
+    cells, moved = repair_placement([1, 40], [0, 1, 2, 5], line_centers(6))
+    assert (cells, moved) == ([1, 5], 1)
+
+
+def test_placement_larger_than_the_candidates_drops_the_rest():
+    cells, moved = repair_placement([0, 1, 2, 3], [1, 2], line_centers(4))
+    assert sorted(cells) == [1, 2] and moved == 0
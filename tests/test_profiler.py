@@ -0,0 +1,63 @@
+import json
+import threading
+
+from Profiler import MemorySampler, Profiler
+
+
+def test_chrome_trace_shape(tmp_path):
+    profiler = Profiler()
+    with profiler.span('detect', kind='danger') as args:
+        args['cells'] = 12
+        with profiler.span('inner'):
+            pass
+    def work():
+        with profiler.span('worker'):
+            pass
+
+    worker = threading.Thread(target=work)
+    work()
+    worker.start()
+    worker.join()
+    profiler.counter('memory', rss_mb=1.5)
+
+    path = tmp_path / 'trace.json'
+    profiler.write_chrome_trace(str(path))
+    trace = json.loads(path.read_text(encoding='utf-8'))
+    assert trace['displayTimeUnit'] == 'ms'
+    events = trace['traceEvents']
+    assert [e['name'] for e in events] == ['inner', 'detect', 'worker', 'worker', 'memory']
+    for event in events:
+        assert {'name', 'ph', 'ts', 'pid', 'tid', 'args'} <= event.keys()
+    spans = [e for e in events if e['ph'] == 'X']
+    assert all(e['dur'] >= 0 for e in spans)
+    inner, outer = spans[:2]
+    assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+    assert outer['args'] == {'kind': 'danger', 'cells': 12}
+    assert spans[2]['tid'] != spans[3]['tid']
+    assert events[-1] == {**events[-1], 'ph': 'C', 'args': {'rss_mb': 1.5}}
+
+
+def test_last_and_durations():
+    profiler = Profiler(max_events=3)
+    for _ in range(2):
+        with profiler.span('a'):
+            pass
+    since = profiler._now_us()
+    with profiler.span('b'):
+        pass
+    assert profiler.last('a') is profiler.events[1]
+    assert profiler.last('a', since) is None
+    assert set(profiler.durations(['a', 'b', 'c'])) == {'a', 'b'}
+    with profiler.span('c'):
+        pass
+    assert len(profiler.events) == 3
+
+
+def test_memory_sampler_records_peak():
+    profiler = Profiler()
+    with MemorySampler(profiler, interval=0.01) as sampler:
+        pass
+    if sampler.peak is not None:
+        assert sampler.peak > 0
+        assert len(profiler.events) >= 2
+        assert all(e['name'] == 'memory' and e['args']['rss_mb'] > 0 for e in profiler.events)
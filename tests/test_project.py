@@ -0,0 +1,118 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import Controller as controller_module
+from AppState import AppState
+from Controller import AppController
+from DangerZones import DangerZones
+from Project import load_project, save_project
+from test_controller import app, crop, finish  # noqa: F401
+
+
+class NoDetection:
+    """An image processor for states whose masks must come from the project."""
+    def detect_building_mask(self, *args):
+        raise AssertionError('building detection should have been restored')
+
+    def detect_danger_zones(self, *args):
+        raise AssertionError('danger detection should have been restored')
+
+
+@pytest.fixture
+def saved(app, tmp_path):
+    """A project with a crop, detected and drawn zones and a placement, saved next to its image."""
+    image_path = str(tmp_path / 'plan.png')
+    cv2.imwrite(image_path, app.state.source_img)
+    app.state.image_path = image_path
+    crop(app, (20, 10, 380, 290))
+    app.set_grid()
+    app.run_ga()
+    finish(app)
+    zone = DangerZones.rect(40, 40, 90, 80)
+    app.state.danger_zones.add(zone)
+    app.state.push_history({'kind': 'danger', 'action': 'add', 'zone': zone})
+    path = str(tmp_path / 'site.npz')
+    save_project(path, app.state)
+    return path, app.state
+
+
+def assert_same_site(state, saved_state):
+    assert state.crop_rect == saved_state.crop_rect
+    np.testing.assert_array_equal(state.cv_img, saved_state.cv_img)
+    assert [DangerZones.bounds(zone) for zone in state.danger_zones] == \
+           [DangerZones.bounds(zone) for zone in saved_state.danger_zones]
+    assert [(c['kind'], c.get('action')) for c in state.history] == \
+           [(c['kind'], c.get('action')) for c in saved_state.history]
+    # History commands refer to the same zone objects as the zone list, so undo can find them.
+    detect = next(c for c in state.history if c.get('action') == 'detect')
+    assert all(any(zone is other for other in state.danger_zones) for zone in detect['zones'])
+    for name in ('ppm_x', 'ppm_y', 'grid_w', 'grid_h', 'grid_origin', 'real_size', 'beacon_indices', 'coverage'):
+        assert getattr(state, name) == getattr(saved_state, name), name
+    np.testing.assert_array_equal(state.target_centers, saved_state.target_centers)
+
+
+def test_round_trip_restores_the_site_and_its_masks(saved):
+    path, saved_state = saved
+    state = AppState()
+    assert load_project(path, state) is True
+    assert_same_site(state, saved_state)
+    np.testing.assert_array_equal(state.feasible_mask, saved_state.feasible_mask)
+    grid = ((state.grid_w, state.grid_h), (state.ppm_x, state.ppm_y))
+    np.testing.assert_array_equal(
+        state.grid_masks.building(state.cv_img, state.target_centers, *grid, NoDetection()),
+        saved_state.grid_masks.building(saved_state.cv_img, saved_state.target_centers, *grid, NoDetection()))
+
+
+def test_reopened_project_re_runs_without_detection(saved, app, monkeypatch):
+    path, saved_state = saved
+    errors = []
+    monkeypatch.setattr(controller_module.messagebox, 'showerror', lambda *args: errors.append(args))
+    state = AppState()
+    load_project(path, state)
+    reopened = AppController(state, NoDetection(), app.ga_solver)
+    reopened.control_panel, reopened.canvas_view = app.control_panel, app.canvas_view
+    reopened.run_ga()
+    finish(reopened)
+    assert errors == []
+    assert len(state.beacon_indices) == len(saved_state.beacon_indices)
+
+
+def test_moved_image_is_located(saved, tmp_path):
+    path, saved_state = saved
+    moved = str(tmp_path / 'moved.png')
+    os.replace(saved_state.image_path, moved)
+    with pytest.raises(ValueError, match='Image not found'):
+        load_project(path, AppState())
+    asked = []
+    state = AppState()
+    assert load_project(path, state, locate_image=lambda missing: asked.append(missing) or moved) is True
+    assert asked == [saved_state.image_path] and state.image_path == moved
+    assert_same_site(state, saved_state)
+    with pytest.raises(ValueError, match='Image not found'):
+        load_project(path, AppState(), locate_image=lambda missing: None)
+
+
+def test_changed_image_drops_the_cached_masks(saved):
+    path, saved_state = saved
+    image = cv2.imread(saved_state.image_path)
+    image[0, 0] = 255 - image[0, 0]
+    cv2.imwrite(saved_state.image_path, image)
+    state = AppState()
+    assert load_project(path, state) is False
+    assert state.crop_rect == saved_state.crop_rect and state.feasible_mask is None
+    assert state.beacon_indices == saved_state.beacon_indices
+    with pytest.raises(AssertionError, match='building detection'):
+        state.grid_masks.building(state.cv_img, state.target_centers, (state.grid_w, state.grid_h),
+                                  (state.ppm_x, state.ppm_y), NoDetection())
+
+
+def test_files_that_are_not_projects_are_rejected(tmp_path):
+    path = tmp_path / 'other.npz'
+    np.savez(path, values=np.arange(3))
+    with pytest.raises(ValueError, match='Not a project file'):
+        load_project(str(path), AppState())
+    with pytest.raises(ValueError):
+        save_project(str(tmp_path / 'empty.npz'), AppState())